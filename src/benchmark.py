@@ -0,0 +1,194 @@
+""" Benchmarks for generation, classification and output.
+
+Run from src as a script or module:
+
+    python benchmark.py [--output results.json] [--baseline old.json]
+                        [--threshold 0.2] [--only name ...]
+
+Each benchmark is called repeatedly for at least MIN_TIME seconds and
+the best of REPEATS such runs is kept, which gives ops/sec. Peak memory
+is measured separately, on one call with tracemalloc running, as
+tracemalloc slows everything down. Benchmarks that make worlds also
+report the cost per world.
+
+With --baseline, every benchmark that runs more than threshold (as a
+fraction) slower than in the baseline is listed and the exit status is
+1, so the suite can gate changes. """
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import dice
+import space
+import system
+import trade_codes
+import uwp
+import uwp_generator
+
+MIN_TIME = 0.2
+REPEATS = 3
+
+def _roll():
+    dice.roll(2, 6)
+    return 0
+
+def _generate_uwp():
+    uwp_generator.generate_uwp()
+    return 1
+
+_sample_uwp = "A788899-C"
+
+def _parse_uwp():
+    uwp.Uwp(_sample_uwp)
+    return 1
+
+def _new_uwp():
+    uwp.Uwp()
+    return 1
+
+def _get_trade_codes():
+    trade_codes.get_trade_codes(_sample_uwp)
+    return 0
+
+def _generate_system():
+    system.System("Bench", (1, 1)).generate("Standard", None)
+    return 1
+
+def _generate_space(space_class):
+    def generate_and_format():
+        s = space_class("Bench")
+        s.generate()
+        str(s)
+        return sum(len(leaf.table) for leaf in s.leaves())
+    return generate_and_format
+
+""" Name and function. Each function does one op and returns how many
+worlds it made, 0 for benchmarks that don't make worlds. """
+benchmarks = [
+        ("dice.roll", _roll),
+        ("uwp_generator.generate_uwp", _generate_uwp),
+        ("Uwp(string)", _parse_uwp),
+        ("Uwp()", _new_uwp),
+        ("trade_codes.get_trade_codes", _get_trade_codes),
+        ("System.generate", _generate_system),
+        ("Subsector generate+str", _generate_space(space.Subsector)),
+        ("Sector generate+str", _generate_space(space.Sector)),
+        ("Domain generate+str", _generate_space(space.Domain))
+        ]
+
+def time_benchmark(function, min_time = MIN_TIME, repeats = REPEATS):
+    """ (seconds per op, worlds per op) of the best of repeats runs """
+    best = None
+    for repeat in range(repeats):
+        ops = 0
+        worlds = 0
+        start = time.perf_counter()
+        while True:
+            worlds += function()
+            ops += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        if best is None or elapsed / ops < best[0]:
+            best = (elapsed / ops, worlds / ops)
+    return best
+
+def peak_memory(function):
+    """ Peak bytes allocated during one call """
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run(names = None, min_time = MIN_TIME, repeats = REPEATS):
+    """ Runs the benchmarks (all, or those named) and returns results in
+    the form saved as JSON """
+    results = {}
+    for name, function in benchmarks:
+        if names and name not in names:
+            continue
+        seconds, worlds = time_benchmark(function, min_time, repeats)
+        result = {
+                "ops_per_sec": 1 / seconds,
+                "seconds_per_op": seconds,
+                "peak_bytes": peak_memory(function)
+                }
+        if worlds:
+            result["worlds_per_op"] = worlds
+            result["seconds_per_world"] = seconds / worlds
+        results[name] = result
+    return {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results
+            }
+
+def compare(results, baseline, threshold):
+    """ (name, baseline ops/sec, ops/sec) for every benchmark more than
+    threshold slower than in baseline """
+    regressions = []
+    for name, result in results["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        if result["ops_per_sec"] < old["ops_per_sec"] * (1 - threshold):
+            regressions.append((name, old["ops_per_sec"],
+                                result["ops_per_sec"]))
+    return regressions
+
+def format_results(results, baseline = None):
+    lines = [f"{'benchmark':<28}{'ops/sec':>12}{'per world':>12}"
+             f"{'peak KiB':>10}{'vs base':>9}"]
+    for name, result in results["results"].items():
+        per_world = result.get("seconds_per_world")
+        per_world = f"{per_world * 1e6:.1f}us" if per_world else ""
+        change = ""
+        if baseline and name in baseline["results"]:
+            ratio = result["ops_per_sec"] / \
+                    baseline["results"][name]["ops_per_sec"]
+            change = f"{(ratio - 1) * 100:+.0f}%"
+        lines.append(f"{name:<28}{result['ops_per_sec']:>12.1f}"
+                     f"{per_world:>12}{result['peak_bytes'] / 1024:>10.0f}"
+                     f"{change:>9}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = __doc__.splitlines()[0])
+    parser.add_argument("--output", default = None,
+                        help = "Save the results as JSON to this file")
+    parser.add_argument("--baseline", default = None,
+                        help = "JSON results to compare against")
+    parser.add_argument("--threshold", type = float, default = 0.2,
+                        help = "Fraction slower than the baseline that "
+                        "counts as a regression")
+    parser.add_argument("--only", nargs = "+", default = None,
+                        metavar = "NAME", help = "Only run these benchmarks")
+    parser.add_argument("--min-time", type = float, default = MIN_TIME,
+                        help = "Seconds to run each benchmark for")
+    parser.add_argument("--repeats", type = int, default = REPEATS)
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+
+    results = run(args.only, args.min_time, args.repeats)
+    print(format_results(results, baseline))
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent = 4)
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for name, old, new in regressions:
+            print(f"Regression: {name} {old:.1f} -> {new:.1f} ops/sec")
+        if regressions:
+            sys.exit(1)
@@ -7,15 +7,278 @@ When used as a standalone script, it expects 0, 1, or 2 arguments.
 """
 
 
-from random import randint
+import random
+from array import array
+from bisect import bisect
+from contextlib import contextmanager
+from itertools import accumulate
+
+""" Where rolls come from. Anything with the randint() and choices()
+of the random module will do: the module itself, a random.Random, a
+HexStream, or one of the sources below. A source can also have its own
+roll(num_dice, sides) and roll_many(count, num_dice, sides), which are
+then used in place of the ones here. """
+_source = random
+_source_roll = None
+_source_roll_many = None
+
+def get_source():
+    return _source
+
+def set_source(source):
+    """ Sets where all subsequent rolls come from, returning the old one """
+    global _source, _source_roll, _source_roll_many
+    previous = _source
+    _source = source
+    _source_roll = getattr(source, "roll", None)
+    _source_roll_many = getattr(source, "roll_many", None)
+    return previous
+
+@contextmanager
+def rolling_with(source):
+    """ Takes rolls from source for the duration of a with block """
+    previous = set_source(source)
+    try:
+        yield source
+    finally:
+        set_source(previous)
 
 def roll(num_dice=1, sides=6):
     """ Simple function for rolling N dice of M sides """
+    if _source_roll is not None:
+        return _source_roll(num_dice, sides)
     total = 0
+    randint = _source.randint
     for die in range(num_dice):
         total += randint(1, sides)
     return total
 
+_sum_tables = {}
+
+def _get_sum_table(num_dice, sides):
+    """ Possible totals of NdM and their cumulative weights, e.g. for 2d6
+    totals 2..12 with cumulative weights 1, 3, 6 ... 36 """
+    key = (num_dice, sides)
+    if key not in _sum_tables:
+        weights = [1]
+        for die in range(num_dice):
+            convolved = [0] * (len(weights) + sides - 1)
+            for total, weight in enumerate(weights):
+                for face in range(sides):
+                    convolved[total + face] += weight
+            weights = convolved
+        totals = range(num_dice, num_dice * sides + 1)
+        cum_weights = []
+        running = 0
+        for weight in weights[:len(totals)]:
+            running += weight
+            cum_weights.append(running)
+        _sum_tables[key] = (totals, cum_weights)
+    return _sum_tables[key]
+
+def _typecode(num_dice, sides):
+    """ The array typecode big enough for totals of NdM """
+    return 'H' if num_dice * sides < 1 << 16 else 'I'
+
+def roll_many(count, num_dice=1, sides=6):
+    """ Rolls NdM count times, returning an array of totals.
+
+    Rather than rolling every die we draw each total directly from
+    the distribution of NdM, which has the same odds as roll() but
+    costs one draw per result. """
+    if _source_roll_many is not None:
+        return _source_roll_many(count, num_dice, sides)
+    return roll_many_from(_source, count, num_dice, sides)
+
+def roll_many_from(source, count, num_dice=1, sides=6):
+    """ roll_many() drawing from source rather than the current source """
+    roll_many = getattr(source, "roll_many", None)
+    if roll_many is not None:
+        return roll_many(count, num_dice, sides)
+    if num_dice == 1:
+        totals = source.choices(range(1, sides + 1), k=count)
+    else:
+        totals, cum_weights = _get_sum_table(num_dice, sides)
+        totals = source.choices(totals, cum_weights=cum_weights, k=count)
+    return array(_typecode(num_dice, sides), totals)
+
+class PooledSource:
+    """ Hands out rolls from pools of pre-rolled totals.
+
+    Each NdM asked for gets its own pool, refilled pool_size rolls at a
+    time with roll_many_from(source), so a roll() costs a list pop rather
+    than a randint per die. Everything else goes straight to source. """
+
+    def __init__(self, source=random, pool_size=4096):
+        self.source = source
+        self.pool_size = pool_size
+        self.pools = {}
+
+    def roll(self, num_dice=1, sides=6):
+        pool = self.pools.get((num_dice, sides))
+        if not pool:
+            pool = self.pools[(num_dice, sides)] = list(
+                    roll_many_from(self.source, self.pool_size,
+                                   num_dice, sides))
+        return pool.pop()
+
+    def roll_many(self, count, num_dice=1, sides=6):
+        return roll_many_from(self.source, count, num_dice, sides)
+
+    def randint(self, a, b):
+        return self.source.randint(a, b)
+
+    def choices(self, population, weights=None, *, cum_weights=None, k=1):
+        return self.source.choices(population, weights,
+                                   cum_weights=cum_weights, k=k)
+
+    def reseed(self):
+        self.pools = {}
+        reseed_source(self.source)
+
+class NumpySource:
+    """ Rolls from a NumPy Generator, whole batches at a time. NumPy is
+    only needed if one of these is made. """
+
+    def __init__(self, seed=None):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("NumpySource needs numpy installed") from None
+        self.numpy = numpy
+        self.generator = numpy.random.default_rng(seed)
+
+    def randint(self, a, b):
+        return int(self.generator.integers(a, b + 1))
+
+    def choices(self, population, weights=None, *, cum_weights=None, k=1):
+        n = len(population)
+        if cum_weights is None and weights is None:
+            indices = self.generator.integers(0, n, size=k)
+        else:
+            if cum_weights is None:
+                cum_weights = list(accumulate(weights))
+            cum_weights = self.numpy.asarray(cum_weights, dtype=float)
+            indices = self.numpy.searchsorted(
+                    cum_weights, self.generator.random(k) * cum_weights[-1],
+                    side="right")
+            indices = self.numpy.minimum(indices, n - 1)
+        return [population[i] for i in indices.tolist()]
+
+    def roll(self, num_dice=1, sides=6):
+        return int(self.generator.integers(1, sides + 1, size=num_dice).sum())
+
+    def roll_many(self, count, num_dice=1, sides=6):
+        typecode = _typecode(num_dice, sides)
+        totals = self.generator.integers(
+                1, sides + 1, size=(count, num_dice)).sum(axis=1)
+        return array(typecode, totals.astype(
+            self.numpy.uint16 if typecode == 'H' else self.numpy.uint32
+            ).tobytes())
+
+    def reseed(self):
+        self.generator = self.numpy.random.default_rng()
+
+def reseed_source(source=None):
+    """ Gives a source (by default the current one) fresh entropy, e.g.
+    in a forked process that would otherwise repeat its parent's rolls.
+    Deterministic sources such as HexStream are left alone. """
+    if source is None:
+        source = _source
+    if hasattr(source, "reseed"):
+        source.reseed()
+    elif hasattr(source, "seed"):
+        source.seed()
+
+""" Sources by name, for command lines """
+source_names = ["random", "pool", "numpy"]
+
+def create_source(name, seed=None):
+    """ A new source: 'random' is a random.Random, 'pool' a PooledSource
+    over one and 'numpy' a NumpySource """
+    if name == "random":
+        return random.Random(seed)
+    if name == "pool":
+        return PooledSource(random.Random(seed))
+    if name == "numpy":
+        return NumpySource(seed)
+    raise ValueError(f"Unknown dice source '{name}'")
+
+def source_name(source=None):
+    """ The name create_source() makes a source like source (by default
+    the current one) under, or None for one it can't make, such as a
+    HexStream. Worker processes are given the name, as a source can't
+    follow them there. """
+    if source is None:
+        source = _source
+    if isinstance(source, PooledSource):
+        return "pool"
+    if isinstance(source, NumpySource):
+        return "numpy"
+    if source is random or type(source) is random.Random:
+        return "random"
+    return None
+
+""" Deterministic, counter based rolls.
+
+Roll number i of a HexStream is a pure function of (seed, coordinates,
+stream id, i): the inputs are hashed into a key, and each roll is the
+SplitMix64 output for key + i. Nothing is carried between hexes, so any
+hex can be rolled on its own, in any order, on any process, and always
+gets the same results. The stream id keeps the separate rolls made for
+one hex (e.g. the occupancy check and the system itself) independent. """
+
+OCCUPANCY_STREAM = 0
+SYSTEM_STREAM = 1
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+def _splitmix64(x):
+    x = (x + _GOLDEN_GAMMA) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+def hex_key(seed, coordinates, stream=0):
+    key = _splitmix64(seed & _MASK64)
+    key = _splitmix64(key ^ (coordinates[0] & _MASK64))
+    key = _splitmix64(key ^ (coordinates[1] & _MASK64))
+    return _splitmix64(key ^ stream)
+
+class HexStream:
+    """ The rolls for one hex, see above """
+
+    def __init__(self, seed, coordinates, stream=0):
+        self.key = hex_key(seed, coordinates, stream)
+        self.counter = 0
+
+    def next64(self):
+        """ The next raw 64 bit value """
+        value = _splitmix64((self.key + self.counter * _GOLDEN_GAMMA) & _MASK64)
+        self.counter += 1
+        return value
+
+    def random(self):
+        """ Float in [0, 1) """
+        return (self.next64() >> 11) * (1.0 / (1 << 53))
+
+    def randint(self, a, b):
+        """ Int in [a, b], scaling the 64 bit value rather than using
+        modulo (the bias is below 2**-58 for any die we roll) """
+        return a + ((self.next64() * (b - a + 1)) >> 64)
+
+    def choices(self, population, weights=None, *, cum_weights=None, k=1):
+        """ As random.choices, drawing from this stream """
+        n = len(population)
+        if cum_weights is None:
+            if weights is None:
+                return [population[self.randint(0, n - 1)] for i in range(k)]
+            cum_weights = list(accumulate(weights))
+        total = cum_weights[-1]
+        return [population[bisect(cum_weights, self.random() * total, 0, n - 1)]
+                for i in range(k)]
+
 def usage():
     """ Explain usage to user. Displayed on usage error. """
     print("Usage: dice.py [number of dice] [number of sides]")
@@ -0,0 +1,245 @@
+""" Exact odds of UWP generation outcomes.
+
+Rather than rolling generate_uwp many times and counting, this walks the
+dice through the same _*_from_roll rules of uwp_generator. Each step
+takes every state reached so far (the values of the fields still
+needed, with their weights) and branches it on each total of that step's
+dice. Fields that nothing later needs are dropped after each step, so
+states that differ only in them merge, and the tech level DM and the
+trade code mask are carried along as running totals instead of the six
+fields they depend on. The outcomes of one step for one set of inputs
+are cached, as are whole results.
+
+Weights are integers: every 2d6 step multiplies them all by 36 and the
+tech level step by 60, which every die size it can roll divides, so
+results can be given exactly as Fractions as well as floats. """
+
+from fractions import Fraction
+from functools import lru_cache
+
+import dice
+import ehex
+import trade_codes
+import uwp_generator as generator
+
+""" Slots of a state. temperature only feeds hydrosphere; tech_dm and
+trade_codes are running totals. """
+_slots = ["size", "atmosphere", "temperature", "hydrosphere",
+          "population", "government", "law_level", "starport",
+          "tech_level", "tech_dm", "trade_codes"]
+_slot = {name: i for i, name in enumerate(_slots)}
+
+""" Fields that can be asked for, in UWP order """
+uwp_fields = ["starport", "size", "atmosphere", "hydrosphere",
+              "population", "government", "law_level", "tech_level"]
+outcome_fields = uwp_fields + ["temperature", "trade_codes"]
+
+""" Steps in generation order: the field set and the fields it reads """
+_steps = [
+        ("size", []),
+        ("atmosphere", ["size"]),
+        ("temperature", ["atmosphere"]),
+        ("hydrosphere", ["size", "atmosphere", "temperature"]),
+        ("population", ["size", "atmosphere"]),
+        ("government", ["population"]),
+        ("law_level", ["population", "government"]),
+        ("starport", ["population"]),
+        ("tech_level", ["population", "tech_dm"])
+        ]
+
+""" How each field adds to the tech level DM and the trade code mask """
+_tech_dms = {
+        "starport": generator._get_starport_tech_dm,
+        "size": generator._get_size_tech_dm,
+        "atmosphere": generator._get_atmosphere_tech_dm,
+        "hydrosphere": generator._get_hydrosphere_tech_dm,
+        "population": generator._get_population_tech_dm,
+        "government": generator._get_government_tech_dm
+        }
+_trade_code_fields = {
+        "size": trade_codes.SIZE,
+        "atmosphere": trade_codes.ATMO,
+        "hydrosphere": trade_codes.HYDRO,
+        "population": trade_codes.POP,
+        "government": trade_codes.GOV,
+        "law_level": trade_codes.LAW,
+        "tech_level": trade_codes.TECH
+        }
+
+TWO_D6 = 36
+TECH_DIE = 60
+
+def dice_weights(num_dice, sides):
+    """ (total, weight) for each total of NdM, weights summing to
+    sides ** num_dice """
+    totals, cum_weights = dice._get_sum_table(num_dice, sides)
+    previous = 0
+    weights = []
+    for total, cum_weight in zip(totals, cum_weights):
+        weights.append((total, cum_weight - previous))
+        previous = cum_weight
+    return weights
+
+def _branch(rule, *inputs):
+    """ (value, weight) for each value of rule(2d6 roll, *inputs) """
+    weights = {}
+    for roll, weight in dice_weights(2, 6):
+        value = rule(roll, *inputs)
+        weights[value] = weights.get(value, 0) + weight
+    return list(weights.items())
+
+@lru_cache(maxsize=None)
+def _outcomes(field, inputs, settings):
+    """ (value, weight) for each way field can come out given the values
+    of the fields it reads. Weights sum to TWO_D6, or TECH_DIE for the
+    tech level. """
+    space_opera, hard_science, maturity, tech_cap = settings
+    if field == "size":
+        return _branch(generator._size_from_roll)
+    if field == "atmosphere":
+        return _branch(generator._atmosphere_from_roll, *inputs, space_opera)
+    if field == "temperature":
+        return _branch(generator._temperature_from_roll, *inputs)
+    if field == "hydrosphere":
+        return _branch(generator._hydrosphere_from_roll, *inputs, space_opera)
+    if field == "population":
+        return _branch(generator._population_from_roll, *inputs, hard_science)
+    if field == "government":
+        return _branch(generator._government_from_roll, *inputs)
+    if field == "law_level":
+        return _branch(generator._law_level_from_roll, *inputs)
+    if field == "starport":
+        return _branch(generator._starport_from_roll, *inputs,
+                       hard_science, maturity)
+
+    population, dm = inputs
+    if population == 0:
+        return [(0, TECH_DIE)]
+    sides = generator._get_tech_die(dm, tech_cap)
+    if not sides:
+        return [(generator._tech_level_from_roll(0, dm, sides), TECH_DIE)]
+    weights = {}
+    for roll in range(1, sides + 1):
+        value = generator._tech_level_from_roll(roll, dm, sides)
+        weights[value] = weights.get(value, 0) + TECH_DIE // sides
+    return list(weights.items())
+
+def _plan(fields):
+    """ The steps needed for fields, as (field, reads, slots to drop once
+    done, whether it adds to the tech DM, whether to the trade code
+    mask). Steps nothing wanted depends on are left out: whatever they
+    roll, their weights sum to the same, so they don't change the odds. """
+    track_mask = "trade_codes" in fields
+    required = set(fields)
+    needed = []
+    for field, reads in reversed(_steps):
+        if field in required or \
+                (track_mask and field in _trade_code_fields) or \
+                ("tech_dm" in required and field in _tech_dms):
+            needed.append((field, reads))
+            required.update(reads)
+    needed.reverse()
+
+    plan = []
+    for i, (field, reads) in enumerate(needed):
+        kept = set(fields)
+        for later, later_reads in needed[i + 1:]:
+            kept.update(later_reads)
+        drop = [_slot[name] for name in _slots if name not in kept]
+        plan.append((field, reads, drop,
+                     "tech_dm" in required and field in _tech_dms,
+                     track_mask and field in _trade_code_fields))
+    return plan
+
+@lru_cache(maxsize=64)
+def _weights(fields, settings):
+    """ Integer weights of each combination of fields, and their total """
+    start = [None] * len(_slots)
+    start[_slot["tech_dm"]] = 0
+    start[_slot["trade_codes"]] = trade_codes.ALL_CODES
+    states = {tuple(start): 1}
+    total = 1
+    tech_dm_slot = _slot["tech_dm"]
+    mask_slot = _slot["trade_codes"]
+    for field, reads, drop, adds_tech_dm, adds_mask in _plan(fields):
+        slot = _slot[field]
+        read_slots = [_slot[name] for name in reads]
+        tech_dm = _tech_dms.get(field)
+        if adds_mask:
+            masks = trade_codes.field_masks[_trade_code_fields[field]]
+        new_states = {}
+        for state, weight in states.items():
+            inputs = tuple(state[s] for s in read_slots)
+            for value, value_weight in _outcomes(field, inputs, settings):
+                new_state = list(state)
+                new_state[slot] = value
+                if adds_tech_dm:
+                    new_state[tech_dm_slot] += tech_dm(value)
+                if adds_mask:
+                    new_state[mask_slot] &= masks[value]
+                for s in drop:
+                    new_state[s] = None
+                key = tuple(new_state)
+                new_states[key] = new_states.get(key, 0) + \
+                        weight * value_weight
+        states = new_states
+        total *= TECH_DIE if field == "tech_level" else TWO_D6
+
+    slots = [_slot[field] for field in fields]
+    weights = {}
+    for state, weight in states.items():
+        key = tuple(state[s] for s in slots)
+        weights[key] = weights.get(key, 0) + weight
+    return weights, total
+
+def joint(fields, space_opera = True, hard_science = True,
+          maturity = "Standard", tech_cap = None, exact = False):
+    """ The probability of each combination of values of fields, e.g.
+    joint(["population", "starport"]) gives {(7, 'C'): 0.05..., ...}.
+    Fields are any of outcome_fields; trade_codes is a trade code mask.
+    Probabilities are Fractions if exact, otherwise floats. """
+    fields = tuple(fields)
+    for field in fields:
+        if field not in outcome_fields:
+            raise ValueError(f"Unknown field '{field}'")
+    weights, total = _weights(fields, (space_opera, hard_science,
+                                       maturity, tech_cap))
+    if exact:
+        return {key: Fraction(weight, total)
+                for key, weight in weights.items()}
+    return {key: weight / total for key, weight in weights.items()}
+
+def marginal(field, space_opera = True, hard_science = True,
+             maturity = "Standard", tech_cap = None, exact = False):
+    """ The probability of each value of one field """
+    return {key[0]: p for key, p in
+            joint([field], space_opera, hard_science, maturity, tech_cap,
+                  exact).items()}
+
+def trade_code_probabilities(space_opera = True, hard_science = True,
+                             maturity = "Standard", tech_cap = None,
+                             exact = False):
+    """ The probability of a world having each trade code """
+    masks = marginal("trade_codes", space_opera, hard_science, maturity,
+                     tech_cap, exact)
+    probabilities = {}
+    for bit, code in enumerate(trade_codes.codes):
+        probabilities[code] = sum(p for mask, p in masks.items()
+                                  if mask & (1 << bit))
+    return probabilities
+
+if __name__ == "__main__":
+    import sys
+    maturity = sys.argv[1] if len(sys.argv) > 1 else "Standard"
+    tech_cap = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    for field in uwp_fields:
+        distribution = marginal(field, maturity = maturity,
+                                tech_cap = tech_cap)
+        print(field)
+        for value in sorted(distribution, key = ehex.hex_to_int
+                            if field == "starport" else None):
+            print(f"  {value:>2}  {distribution[value]:.4f}")
+    print("trade codes")
+    for code, p in trade_code_probabilities(
+            maturity = maturity, tech_cap = tech_cap).items():
+        print(f"  {code}  {p:.4f}")
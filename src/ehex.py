@@ -8,10 +8,13 @@ hex_table = [
     'U', 'V', 'W', 'X', 'Y', 'Z'
     ]
 
+# Reverse of hex_table, so lookups don't have to search the list
+hex_values = {hex_value: value for value, hex_value in enumerate(hex_table)}
+
 def hex_to_int(hex_value):
     """ Converts a string 'hex' value into an int. """
-    if hex_value in hex_table:
-        return hex_table.index(hex_value)
+    if hex_value in hex_values:
+        return hex_values[hex_value]
     else:
         raise ValueError
 
@@ -35,6 +38,6 @@ def less_than_or_equal_to(a, b):
     return hex_to_int(a) <= hex_to_int(b)
 
 def is_valid(a):
-    if a in hex_table:
+    if a in hex_values:
         return True
     return False
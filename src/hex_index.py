@@ -0,0 +1,133 @@
+""" Hex geometry and a spatial index over the systems of a space.
+
+Coordinates are the (x, y) offset coordinates used everywhere else,
+x being the column. As on Traveller maps, even columns sit half a hex
+lower than odd ones, so 0201 touches 0101 and 0102. For distances these
+are converted to cube coordinates (q, r, s), in which the distance
+between two hexes is the largest of the three differences. """
+
+from functools import lru_cache
+
+def offset_to_cube(coordinates):
+    x, y = coordinates
+    q = x
+    r = y - (x + (x & 1)) // 2
+    return (q, r, -q - r)
+
+def cube_to_offset(cube):
+    q, r, s = cube
+    return (q, r + (q + (q & 1)) // 2)
+
+def distance(a, b):
+    """ Distance in parsecs (hexes) between two offset coordinates """
+    aq, ar, a_s = offset_to_cube(a)
+    bq, br, bs = offset_to_cube(b)
+    return max(abs(aq - bq), abs(ar - br), abs(a_s - bs))
+
+@lru_cache(maxsize=None)
+def _deltas_within(radius, odd_column):
+    """ (dx, dy, distance) to every hex within radius of a hex in an odd
+    or even column, nearest first. The shape only depends on the column's
+    parity, so this is worked out once per radius and parity. """
+    x = 1 if odd_column else 2
+    centre = offset_to_cube((x, 0))
+    deltas = []
+    for dq in range(-radius, radius + 1):
+        for dr in range(max(-radius, -dq - radius),
+                        min(radius, -dq + radius) + 1):
+            cube = (centre[0] + dq, centre[1] + dr, centre[2] - dq - dr)
+            hx, hy = cube_to_offset(cube)
+            deltas.append((hx - x, hy, max(abs(dq), abs(dr), abs(dq + dr))))
+    deltas.sort(key = lambda delta: delta[2])
+    return tuple(deltas)
+
+def hexes_within(centre, radius):
+    """ Offset coordinates of every hex within radius of centre """
+    x, y = centre
+    return [(x + dx, y + dy)
+            for dx, dy, d in _deltas_within(radius, x & 1 == 1)]
+
+class HexIndex:
+    """ Finds systems by hex. Row i of the index is the system at
+    coordinates[i], so when built from a SystemTable rows are rows of
+    that table.
+
+    Lookups by hex are a dict lookup. Radius queries up to
+    ENUMERATE_RADIUS check every hex in range; beyond that they check
+    the systems in the grid buckets the circle overlaps. """
+
+    BUCKET_SIZE = 8
+    ENUMERATE_RADIUS = 10
+
+    def __init__(self, coordinates, table = None):
+        self.table = table
+        self.coordinates = [tuple(c) for c in coordinates]
+        self.rows = {}
+        self.buckets = {}
+        for row, (x, y) in enumerate(self.coordinates):
+            self.rows[(x, y)] = row
+            key = (x // self.BUCKET_SIZE, y // self.BUCKET_SIZE)
+            self.buckets.setdefault(key, []).append(row)
+        xs = [x for x, y in self.coordinates] or [0]
+        ys = [y for x, y in self.coordinates] or [0]
+        self.bounds = (min(xs), min(ys), max(xs), max(ys))
+
+    @classmethod
+    def from_table(cls, table):
+        return cls(zip(table.x, table.y), table)
+
+    @classmethod
+    def from_space(cls, space):
+        """ An index over every system of a space and its subspaces """
+        return cls.from_table(space.table)
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    def at(self, coordinates):
+        """ The row of the system at coordinates, or None """
+        return self.rows.get(tuple(coordinates))
+
+    def get_system(self, row):
+        return self.table.get_system(row)
+
+    def within(self, centre, radius):
+        """ (distance, row) for every system within radius of centre,
+        nearest first """
+        x, y = centre
+        if radius <= self.ENUMERATE_RADIUS:
+            rows = self.rows
+            found = []
+            for dx, dy, d in _deltas_within(radius, x & 1 == 1):
+                row = rows.get((x + dx, y + dy))
+                if row is not None:
+                    found.append((d, row))
+            return found
+
+        found = []
+        size = self.BUCKET_SIZE
+        for bx in range((x - radius) // size, (x + radius) // size + 1):
+            for by in range((y - radius - 1) // size,
+                            (y + radius + 1) // size + 1):
+                for row in self.buckets.get((bx, by), ()):
+                    d = distance(centre, self.coordinates[row])
+                    if d <= radius:
+                        found.append((d, row))
+        found.sort()
+        return found
+
+    def nearest(self, centre, k = 1, max_radius = None):
+        """ (distance, row) for the k systems nearest centre, not
+        counting one at centre itself. Searches out to max_radius, by
+        default far enough to cover every system. """
+        if max_radius is None:
+            # No hex is further away than the walk along x then y
+            min_x, min_y, max_x, max_y = self.bounds
+            max_radius = max(abs(centre[0] - min_x), abs(centre[0] - max_x)) + \
+                    max(abs(centre[1] - min_y), abs(centre[1] - max_y))
+        radius = 1
+        while True:
+            found = [(d, row) for d, row in self.within(centre, radius) if d]
+            if len(found) >= k or radius >= max_radius:
+                return found[:k]
+            radius = min(radius * 2, max_radius)
@@ -0,0 +1,201 @@
+""" Opt-in counters and timers for the generation pipeline.
+
+Nothing here is paid for unless it is switched on: enable() swaps the
+functions listed in stages for wrappers that count and time their
+calls, and disable() puts the originals back. The pipeline itself has
+no instrumentation checks in it.
+
+Times are cumulative, so a stage's time includes any stages it calls
+(generate_uwp includes _generate_size, and nearly everything includes
+dice.roll). Seeded spaces generate world by world, through the
+_generate_* stages, and unseeded ones a column at a time, through
+generate_uwp_batch and its _*_column stages, so which of the two sets
+has counts depends on the space. Dice are counted as well as calls:
+roll(2, 6) is two dice and roll_many(n, 2, 6) is 2n. Every leaf space
+generated is timed on its own.
+
+Only this process is instrumented: leaves generated by worker processes
+(Space.generate with workers) are not seen. """
+
+import json
+import time
+from contextlib import contextmanager
+
+import dice
+import system
+import system_table
+import trade_codes
+import uwp
+import uwp_generator
+
+""" (name, owner, attribute) of everything timed """
+stages = [
+        ("dice.roll", dice, "roll"),
+        ("dice.roll_many", dice, "roll_many"),
+        ("uwp_generator.generate_uwp", uwp_generator, "generate_uwp"),
+        ("uwp_generator.generate_uwp_batch", uwp_generator,
+         "generate_uwp_batch"),
+        ("uwp_generator._generate_size", uwp_generator, "_generate_size"),
+        ("uwp_generator._generate_atmosphere", uwp_generator,
+         "_generate_atmosphere"),
+        ("uwp_generator._generate_temperature", uwp_generator,
+         "_generate_temperature"),
+        ("uwp_generator._generate_hydrosphere", uwp_generator,
+         "_generate_hydrosphere"),
+        ("uwp_generator._generate_population", uwp_generator,
+         "_generate_population"),
+        ("uwp_generator._generate_government", uwp_generator,
+         "_generate_government"),
+        ("uwp_generator._generate_law_level", uwp_generator,
+         "_generate_law_level"),
+        ("uwp_generator._generate_starport", uwp_generator,
+         "_generate_starport"),
+        ("uwp_generator._generate_tech_level", uwp_generator,
+         "_generate_tech_level"),
+        ("uwp_generator._size_column", uwp_generator, "_size_column"),
+        ("uwp_generator._atmosphere_column", uwp_generator,
+         "_atmosphere_column"),
+        ("uwp_generator._temperature_column", uwp_generator,
+         "_temperature_column"),
+        ("uwp_generator._hydrosphere_column", uwp_generator,
+         "_hydrosphere_column"),
+        ("uwp_generator._population_column", uwp_generator,
+         "_population_column"),
+        ("uwp_generator._government_column", uwp_generator,
+         "_government_column"),
+        ("uwp_generator._law_level_column", uwp_generator,
+         "_law_level_column"),
+        ("uwp_generator._starport_column", uwp_generator, "_starport_column"),
+        ("uwp_generator._tech_level_column", uwp_generator,
+         "_tech_level_column"),
+        ("uwp.check_is_uwp_string_valid", uwp, "check_is_uwp_string_valid"),
+        ("Uwp.__init__", uwp.Uwp, "__init__"),
+        ("trade_codes.get_trade_codes", trade_codes, "get_trade_codes"),
+        ("trade_codes.get_trade_code_mask", trade_codes,
+         "get_trade_code_mask"),
+        ("trade_codes.get_trade_code_mask_from_fields", trade_codes,
+         "get_trade_code_mask_from_fields"),
+        ("trade_codes.mask_to_str", trade_codes, "mask_to_str"),
+        ("system.roll_bases", system, "roll_bases"),
+        ("system.roll_pbg", system, "roll_pbg"),
+        ("System.generate", system.System, "generate"),
+        ("System.__str__", system.System, "__str__"),
+        ("SystemTable.format_row", system_table.SystemTable, "format_row")
+        ]
+
+class Report:
+    """ What was counted while instrumentation was on """
+
+    def __init__(self):
+        self.calls = {}
+        self.seconds = {}
+        self.dice = 0
+        self.leaves = []
+
+    def record(self, name, seconds):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def to_dict(self):
+        return {
+                "stages": {name: {"calls": self.calls[name],
+                                  "seconds": self.seconds[name]}
+                           for name in self.calls},
+                "dice": self.dice,
+                "leaves": self.leaves
+                }
+
+    def write_json(self, fp):
+        json.dump(self.to_dict(), fp, indent = 4)
+
+    def __str__(self):
+        lines = [f"{'stage':<46}{'calls':>10}{'seconds':>10}"]
+        for name in sorted(self.seconds, key = self.seconds.get,
+                           reverse = True):
+            lines.append(f"{name:<46}{self.calls[name]:>10}"
+                         f"{self.seconds[name]:>10.3f}")
+        lines.append(f"{self.dice} dice rolled, "
+                     f"{len(self.leaves)} leaves generated")
+        return "\n".join(lines)
+
+_report = None
+_originals = []
+
+def _timed(name, function):
+    perf_counter = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _report.record(name, perf_counter() - start)
+    return wrapper
+
+def _counting_roll(function):
+    def roll(num_dice = 1, sides = 6):
+        _report.dice += num_dice
+        return function(num_dice, sides)
+    return roll
+
+def _counting_roll_many(function):
+    def roll_many(count, num_dice = 1, sides = 6):
+        _report.dice += count * num_dice
+        return function(count, num_dice, sides)
+    return roll_many
+
+def _timed_leaf(function):
+    perf_counter = time.perf_counter
+
+    def generate(self):
+        start = perf_counter()
+        function(self)
+        _report.leaves.append({"name": self.name,
+                               "origin": list(self.origin),
+                               "seconds": perf_counter() - start,
+                               "systems": len(self.table)})
+    return generate
+
+def _patch(owner, attribute, replacement):
+    _originals.append((owner, attribute, owner.__dict__[attribute]))
+    setattr(owner, attribute, replacement)
+
+def enable(space_class = None):
+    """ Starts counting into a new Report, which is returned. Leaves are
+    timed through space_class.generate, by default space.Space; pass the
+    class in when space.py is being run as a script. """
+    global _report
+    if _report is not None:
+        raise RuntimeError("Instrumentation is already enabled")
+    if space_class is None:
+        import space
+        space_class = space.Space
+    _report = Report()
+    _patch(space_class, "generate", _timed_leaf(space_class.generate))
+    for name, owner, attribute in stages:
+        function = getattr(owner, attribute)
+        if name == "dice.roll":
+            function = _counting_roll(function)
+        elif name == "dice.roll_many":
+            function = _counting_roll_many(function)
+        _patch(owner, attribute, _timed(name, function))
+    return _report
+
+def disable():
+    """ Puts back every original function, returning the Report """
+    global _report
+    while _originals:
+        owner, attribute, original = _originals.pop()
+        setattr(owner, attribute, original)
+    report = _report
+    _report = None
+    return report
+
+@contextmanager
+def instrumented(space_class = None):
+    """ Counts for the duration of a with block, giving the Report """
+    report = enable(space_class)
+    try:
+        yield report
+    finally:
+        disable()
@@ -0,0 +1,212 @@
+""" Jump routes between the systems of a space.
+
+A ship with jump rating J can go from a system to any other within J
+parsecs in one jump. Routes are found over that graph, either in the
+fewest jumps or the fewest parsecs. With refuel set, every stop along
+the way must be able to refuel: a starport of A to D, or a gas giant to
+skim. The origin and destination themselves can be anywhere.
+
+Route queries are answered by a Dijkstra search from the origin, and
+that search is kept (in a bounded LRU cache) rather than thrown away.
+A later query from the same origin picks the search up where it
+stopped, and once a destination is settled its route is just read back
+from the search. Repeated and batched queries across a Domain are
+therefore mostly table lookups. astar() is there for one-off queries,
+which it answers without keeping anything. """
+
+from collections import OrderedDict
+from heapq import heappop, heappush
+
+import hex_index
+
+# ehex values of starports that sell fuel
+_refuel_starports = {0xA, 0xB, 0xC, 0xD}
+
+class _Search:
+    """ A Dijkstra search from one origin that can be resumed """
+
+    def __init__(self, routes, origin):
+        self.routes = routes
+        self.origin = origin
+        self.costs = {origin: 0}
+        self.previous = {origin: None}
+        self.frontier = [(0, origin)]
+        self.settled = set()
+
+    def settle(self, target):
+        """ Continues the search until target is settled (or can't be
+        reached), returning whether it was reached """
+        routes = self.routes
+        costs = self.costs
+        while target not in self.settled and self.frontier:
+            cost, row = heappop(self.frontier)
+            if row in self.settled:
+                continue
+            self.settled.add(row)
+            if row != self.origin and not routes.can_pass(row):
+                continue
+            for d, neighbour in routes.neighbours(row):
+                new_cost = cost + routes.weight(d)
+                if new_cost < costs.get(neighbour, new_cost + 1):
+                    costs[neighbour] = new_cost
+                    self.previous[neighbour] = row
+                    heappush(self.frontier, (new_cost, neighbour))
+        return target in self.settled
+
+    def path(self, target):
+        rows = []
+        while target is not None:
+            rows.append(target)
+            target = self.previous[target]
+        rows.reverse()
+        return rows
+
+class JumpRoutes:
+    """ Routes over a HexIndex for one jump rating.
+
+    cost is "jumps" to minimise the number of jumps or "parsecs" to
+    minimise the distance travelled. cache_size is how many origins'
+    searches are kept. """
+
+    def __init__(self, index, jump, refuel = False, cost = "jumps",
+                 cache_size = 256):
+        if cost not in ("jumps", "parsecs"):
+            raise ValueError(f"Unknown route cost '{cost}'")
+        self.index = index
+        self.jump = jump
+        self.refuel = refuel
+        self.cost = cost
+        self.cache_size = cache_size
+        self.searches = OrderedDict()
+        self._neighbours = {}
+
+    @classmethod
+    def from_space(cls, space, jump, **options):
+        return cls(hex_index.HexIndex.from_space(space), jump, **options)
+
+    def weight(self, d):
+        return 1 if self.cost == "jumps" else d
+
+    def can_refuel(self, row):
+        table = self.index.table
+        return table.starport[row] in _refuel_starports or \
+                table.pbg[row] % 10 > 0
+
+    def can_pass(self, row):
+        """ Whether a route may carry on from this system """
+        return not self.refuel or self.can_refuel(row)
+
+    def neighbours(self, row):
+        """ (distance, row) of every system one jump from row """
+        if row not in self._neighbours:
+            self._neighbours[row] = [
+                    (d, other) for d, other in
+                    self.index.within(self.index.coordinates[row], self.jump)
+                    if d]
+        return self._neighbours[row]
+
+    def _row(self, coordinates):
+        row = self.index.at(coordinates)
+        if row is None:
+            raise KeyError(f"No system at {coordinates}")
+        return row
+
+    def _search(self, origin):
+        search = self.searches.get(origin)
+        if search is None:
+            search = _Search(self, origin)
+            self.searches[origin] = search
+            if len(self.searches) > self.cache_size:
+                self.searches.popitem(last = False)
+        else:
+            self.searches.move_to_end(origin)
+        return search
+
+    def _settled(self, origin, destination):
+        """ A search that has settled the route between origin and
+        destination, and the row to read it back from, or (None, None)
+        if there is no route. Routes can be flown either way, so a search
+        already made from the destination will do. """
+        start = self._row(origin)
+        target = self._row(destination)
+        reverse = self.searches.get(target)
+        if start not in self.searches and reverse is not None and \
+                start in reverse.settled:
+            self.searches.move_to_end(target)
+            return reverse, start
+        search = self._search(start)
+        if not search.settle(target):
+            return None, None
+        return search, target
+
+    def route(self, origin, destination):
+        """ The coordinates of every stop from origin to destination,
+        both included, or None if there is no route """
+        search, target = self._settled(origin, destination)
+        if search is None:
+            return None
+        rows = search.path(target)
+        if rows[0] != self._row(origin):
+            rows.reverse()
+        return [self.index.coordinates[row] for row in rows]
+
+    def route_cost(self, origin, destination):
+        """ Jumps (or parsecs) of the best route, or None """
+        search, target = self._settled(origin, destination)
+        if search is None:
+            return None
+        return search.costs[target]
+
+    def routes(self, pairs):
+        """ route() for many (origin, destination) pairs. Pairs are
+        worked through grouped by origin, so each origin is searched
+        once however many destinations it has. """
+        results = [None] * len(pairs)
+        by_origin = {}
+        for i, (origin, destination) in enumerate(pairs):
+            by_origin.setdefault(tuple(origin), []).append((i, destination))
+        for origin, destinations in by_origin.items():
+            for i, destination in destinations:
+                results[i] = self.route(origin, destination)
+        return results
+
+    def astar(self, origin, destination):
+        """ route() by A* search, guided by the straight line distance
+        to the destination. Nothing is cached. """
+        start = self._row(origin)
+        target = self._row(destination)
+        goal = self.index.coordinates[target]
+        coordinates = self.index.coordinates
+
+        def estimate(row):
+            d = hex_index.distance(coordinates[row], goal)
+            if self.cost == "jumps":
+                return -(-d // self.jump)
+            return d
+
+        costs = {start: 0}
+        previous = {start: None}
+        frontier = [(estimate(start), start)]
+        settled = set()
+        while frontier:
+            priority, row = heappop(frontier)
+            if row == target:
+                rows = []
+                while row is not None:
+                    rows.append(coordinates[row])
+                    row = previous[row]
+                rows.reverse()
+                return rows
+            if row in settled:
+                continue
+            settled.add(row)
+            if row != start and not self.can_pass(row):
+                continue
+            for d, neighbour in self.neighbours(row):
+                new_cost = costs[row] + self.weight(d)
+                if new_cost < costs.get(neighbour, new_cost + 1):
+                    costs[neighbour] = new_cost
+                    previous[neighbour] = row
+                    heappush(frontier,
+                             (new_cost + estimate(neighbour), neighbour))
+        return None
@@ -0,0 +1,210 @@
+""" Reading .sec files back in.
+
+Lines are read one at a time, so files of any size can be streamed.
+System lines in the fixed column layout written by System.__str__ are
+sliced apart directly; anything else (long names pushing the columns
+along, hand edited spacing) falls back to a regular expression. Header
+comments such as "# Subsector 'X' at '0,0'" are recognised and every
+other comment is skipped.
+
+UWPs are validated as uwp.check_is_uwp_string_valid would, but bad
+lines raise ValueError (or are collected, see iter_sec) instead of
+printing. """
+
+import re
+from collections import namedtuple
+
+import system
+import system_table
+import uwp
+
+""" Sizes of the spaces named in .sec headers """
+header_sizes = {
+        "Subsector": (8, 10),
+        "Quadrant": (16, 20),
+        "Sector": (32, 40),
+        "Domain": (64, 80)
+        }
+
+Header = namedtuple("Header", ["kind", "name", "origin", "line"])
+
+""" A system line parses to a row:
+(name, coordinates, uwp string, naval, scout,
+ population multiplier, belts, gas giants) """
+
+_header_pattern = re.compile(r"# (\w+) '(.*)' at '(-?\d+),(-?\d+)'\s*$")
+_system_pattern = re.compile(
+        r"(?P<name>.*?)\s*(?P<x>\d\d)(?P<y>\d\d) (?P<uwp>\S{9}) +"
+        r"(?P<base>[NSB])?\s+(?P<codes>.*?) *(?P<pbg>\d{3}) *$")
+_uwp_pattern = re.compile(r"[ABCDEX][0-9A-Z]{6}-[0-9A-Z]")
+
+def _check_uwp(uwp_string):
+    if not _uwp_pattern.fullmatch(uwp_string):
+        raise ValueError(uwp.get_uwp_string_error(uwp_string) or
+                         f"Invalid UWP '{uwp_string}'")
+
+def parse_system_line(line):
+    """ Parses one system line into a row, raising ValueError if it
+    isn't one """
+    line = line.rstrip()
+    pbg = line[-3:]
+    # Fast path: exactly the columns System.__str__ writes
+    if len(line) >= 40 and line[24] == ' ' and line[34:36] == '  ' and \
+            line[37] == ' ' and line[20:24].isdigit() and pbg.isdigit():
+        uwp_string = line[25:34]
+        _check_uwp(uwp_string)
+        base = line[36]
+        return (line[:20].rstrip(), (int(line[20:22]), int(line[22:24])),
+                uwp_string, base in "NB", base in "SB",
+                int(pbg[0]), int(pbg[1]), int(pbg[2]))
+
+    match = _system_pattern.match(line)
+    if not match:
+        raise ValueError(f"Not a system: '{line}'")
+    _check_uwp(match["uwp"])
+    base = match["base"] or " "
+    pbg = match["pbg"]
+    return (match["name"], (int(match["x"]), int(match["y"])),
+            match["uwp"], base in "NB", base in "SB",
+            int(pbg[0]), int(pbg[1]), int(pbg[2]))
+
+def parse_header_line(line):
+    """ A Header for a space header comment, or None for any other line """
+    match = _header_pattern.match(line)
+    if not match:
+        return None
+    kind, name, x, y = match.groups()
+    return Header(kind, name, (int(x), int(y)), line.rstrip())
+
+def iter_sec(fp, errors = None):
+    """ Yields a Header or a system row for each meaningful line of fp.
+
+    Bad lines raise ValueError with the line number, unless errors is
+    a list, in which case (line number, message) is appended to it and
+    the line skipped. """
+    for number, line in enumerate(fp, 1):
+        if line.startswith("#"):
+            header = parse_header_line(line)
+            if header:
+                yield header
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield parse_system_line(line)
+        except ValueError as e:
+            if errors is None:
+                raise ValueError(f"Line {number}: {e}") from None
+            errors.append((number, str(e)))
+
+def row_to_system(row):
+    name, coordinates, uwp_string, naval, scout, \
+            population_multiplier, belts, gas_giants = row
+    s = system.System(name, coordinates, uwp.Uwp(uwp_string), naval, scout)
+    s.population_multiplier = population_multiplier
+    s.belts = belts
+    s.gas_giants = gas_giants
+    return s
+
+def row_to_table_row(row):
+    """ A row as the arguments of SystemTable.append """
+    return row[:2] + uwp.unpack(uwp.pack_string(row[2])) + row[3:]
+
+""" Rows are added to tables this many at a time """
+CHUNK_SIZE = 4096
+
+def iter_systems(fp, errors = None):
+    """ Yields a System for each system line of fp """
+    for item in iter_sec(fp, errors):
+        if not isinstance(item, Header):
+            yield row_to_system(item)
+
+def read_table(fp, errors = None):
+    """ Reads every system of fp into one SystemTable, without making
+    System objects """
+    table = system_table.SystemTable()
+    table.names = []
+    chunk = []
+    for item in iter_sec(fp, errors):
+        if not isinstance(item, Header):
+            chunk.append(row_to_table_row(item))
+            if len(chunk) == CHUNK_SIZE:
+                table.extend(chunk)
+                chunk = []
+    table.extend(chunk)
+    return table
+
+def _leaves(hierarchy):
+    if hierarchy.get("subspaces"):
+        leaves = []
+        for subspace in hierarchy["subspaces"]:
+            leaves += _leaves(subspace)
+        return leaves
+    return [hierarchy]
+
+def _contains(outer, inner):
+    return outer["size"][0] > inner["size"][0] and \
+            outer["origin"][0] <= inner["origin"][0] < \
+            outer["origin"][0] + outer["size"][0] and \
+            outer["origin"][1] <= inner["origin"][1] < \
+            outer["origin"][1] + outer["size"][1]
+
+def read_sec(fp, errors = None):
+    """ Reads a .sec file into (hierarchy, leaf tables), the hierarchy
+    being in the form of Space.describe(). Headers are nested by where
+    their spaces lie. A file without headers is read as one space just
+    big enough for its systems. """
+    roots = []
+    stack = []
+    tables = {}
+    for item in iter_sec(fp, errors):
+        if isinstance(item, Header):
+            if item.kind not in header_sizes:
+                raise ValueError(f"Unknown space '{item.kind}' in "
+                                 f"'{item.line}'")
+            node = {"header": item.line, "name": item.name,
+                    "origin": list(item.origin),
+                    "size": list(header_sizes[item.kind])}
+            while stack and not _contains(stack[-1], node):
+                stack.pop()
+            if stack:
+                stack[-1].setdefault("subspaces", []).append(node)
+            else:
+                roots.append(node)
+            stack.append(node)
+            continue
+        leaf = stack[-1] if stack else None
+        if id(leaf) not in tables:
+            tables[id(leaf)] = system_table.SystemTable(
+                    leaf["name"] if leaf else "")
+        tables[id(leaf)].append(*row_to_table_row(item))
+
+    if not roots:
+        # No headers: one space around the systems
+        table = tables.get(id(None), system_table.SystemTable(""))
+        xs = list(table.x) or [1]
+        ys = list(table.y) or [1]
+        roots = [{"header": None, "name": "",
+                  "origin": [min(xs) - 1, min(ys) - 1],
+                  "size": [max(xs) - min(xs) + 1, max(ys) - min(ys) + 1]}]
+        tables = {id(roots[0]): table}
+    if len(roots) > 1:
+        raise ValueError("A .sec file must describe one space")
+
+    return roots[0], [tables.get(id(leaf), system_table.SystemTable(leaf["name"]))
+                      for leaf in _leaves(roots[0])]
+
+if __name__ == "__main__":
+    import sys
+    import time
+    if len(sys.argv) != 2:
+        print("Usage: sec_parser.py file.sec")
+        sys.exit(1)
+    start = time.perf_counter()
+    errors = []
+    with open(sys.argv[1]) as fp:
+        table = read_table(fp, errors)
+    elapsed = time.perf_counter() - start
+    print(f"{len(table)} systems in {elapsed:.3f}s, {len(errors)} bad lines")
+    for number, message in errors[:10]:
+        print(f"  line {number}: {message}")
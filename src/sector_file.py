@@ -0,0 +1,217 @@
+""" Binary sector files.
+
+A .sec file has to be parsed in full to find anything in it. A sector
+file instead has one fixed size record for every hex of the space, in
+coordinate order, so the record for any hex is found by arithmetic and
+read straight out of an mmap without loading the rest of the file.
+
+Layout, all little-endian:
+    file header     magic, version, record size, origin, width, height,
+                    hierarchy length, names offset, records offset
+    hierarchy       JSON from Space.describe(): headers, names, origins
+                    and sizes of every space in the file
+    names table     count, count + 1 offsets into the blob, utf-8 blob
+    records         width * height records, x-major: the record for
+                    (x, y) is number (x - origin x - 1) * height
+                    + (y - origin y - 1)
+
+A record is flags (occupied, naval base, scout base), the packed UWP
+as 8 bytes (see uwp.pack), population multiplier, belts, gas giants,
+trade code mask and the index of the system's name. """
+
+import json
+import mmap
+import struct
+
+import sec_parser
+import system
+import system_table
+import uwp
+
+MAGIC = b"UWPS"
+VERSION = 1
+
+FILE_HEADER = struct.Struct("<4sHHiiIIQQQ")
+RECORD = struct.Struct("<B8sBBBII")
+COUNT = struct.Struct("<I")
+
+OCCUPIED = 1
+NAVAL = 2
+SCOUT = 4
+
+def write_sector_file(path, hierarchy, leaf_tables):
+    """ Writes a sector file for the space described by hierarchy (as
+    from Space.describe()) whose leaves hold leaf_tables, in order """
+    origin_x, origin_y = hierarchy["origin"]
+    width, height = hierarchy["size"]
+
+    names = []
+    records = bytearray(width * height * RECORD.size)
+    for table in leaf_tables:
+        for i in range(len(table)):
+            x = table.x[i] - origin_x - 1
+            y = table.y[i] - origin_y - 1
+            if not (0 <= x < width and 0 <= y < height):
+                raise ValueError(f"System '{table.get_name(i)}' at "
+                                 f"{table.x[i]},{table.y[i]} is outside "
+                                 "the space")
+            bases = table.bases[i]
+            flags = OCCUPIED
+            if bases & system_table.NAVAL:
+                flags |= NAVAL
+            if bases & system_table.SCOUT:
+                flags |= SCOUT
+            uwp_bytes = bytes((table.starport[i], table.size[i],
+                               table.atmosphere[i], table.hydrosphere[i],
+                               table.population[i], table.government[i],
+                               table.law_level[i], table.tech_level[i]))
+            pbg = table.pbg[i]
+            RECORD.pack_into(records, (x * height + y) * RECORD.size,
+                             flags, uwp_bytes,
+                             pbg // 100, pbg // 10 % 10, pbg % 10,
+                             table.trade_codes[i], len(names))
+            names.append(table.get_name(i))
+
+    hierarchy_bytes = json.dumps(hierarchy).encode("utf-8")
+    blob = b"".join(name.encode("utf-8") for name in names)
+    offsets = [0]
+    for name in names:
+        offsets.append(offsets[-1] + len(name.encode("utf-8")))
+    names_table = COUNT.pack(len(names)) + \
+            struct.pack(f"<{len(offsets)}I", *offsets) + blob
+
+    names_offset = FILE_HEADER.size + len(hierarchy_bytes)
+    records_offset = names_offset + len(names_table)
+    padding = -records_offset % 8
+    records_offset += padding
+
+    with open(path, "wb") as fp:
+        fp.write(FILE_HEADER.pack(MAGIC, VERSION, RECORD.size,
+                                  origin_x, origin_y, width, height,
+                                  len(hierarchy_bytes), names_offset,
+                                  records_offset))
+        fp.write(hierarchy_bytes)
+        fp.write(names_table)
+        fp.write(bytes(padding))
+        fp.write(records)
+
+def save_space(space, path):
+    """ Writes a generated space to a sector file """
+    write_sector_file(path, space.describe(),
+                      [leaf.table for leaf in space.leaves()])
+
+class SectorFile:
+    """ A sector file opened with mmap. Use as a context manager, or
+    call close() when done. """
+
+    def __init__(self, path):
+        self.fp = open(path, "rb")
+        self.data = mmap.mmap(self.fp.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, record_size, self.origin_x, self.origin_y, \
+                self.width, self.height, hierarchy_length, \
+                self.names_offset, self.records_offset = \
+                FILE_HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION or \
+                record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"'{path}' is not a version {VERSION} "
+                             "sector file")
+        self.hierarchy = json.loads(
+                self.data[FILE_HEADER.size:FILE_HEADER.size + hierarchy_length])
+        self.name_count, = COUNT.unpack_from(self.data, self.names_offset)
+        self.blob_offset = self.names_offset + COUNT.size + \
+                4 * (self.name_count + 1)
+
+    def close(self):
+        self.data.close()
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get_name(self, index):
+        start, end = struct.unpack_from(
+                "<2I", self.data, self.names_offset + COUNT.size + 4 * index)
+        return self.data[self.blob_offset + start:
+                         self.blob_offset + end].decode("utf-8")
+
+    def get_record(self, coordinates):
+        """ The raw record tuple for the hex at absolute coordinates, or
+        None if the hex is empty """
+        x = coordinates[0] - self.origin_x - 1
+        y = coordinates[1] - self.origin_y - 1
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise KeyError(f"{coordinates} is outside the space")
+        record = RECORD.unpack_from(
+                self.data, self.records_offset + (x * self.height + y) * RECORD.size)
+        if not record[0] & OCCUPIED:
+            return None
+        return record
+
+    def get_system(self, coordinates):
+        """ The System at absolute coordinates, or None """
+        record = self.get_record(coordinates)
+        if record is None:
+            return None
+        flags, uwp_bytes, population_multiplier, belts, gas_giants, \
+                mask, name_index = record
+        s = system.System(
+                self.get_name(name_index), tuple(coordinates),
+                uwp.Uwp.from_packed(int.from_bytes(uwp_bytes, "big")),
+                bool(flags & NAVAL), bool(flags & SCOUT))
+        s.population_multiplier = population_multiplier
+        s.belts = belts
+        s.gas_giants = gas_giants
+        return s
+
+    def read_leaf_table(self, leaf):
+        """ The systems of one leaf of the hierarchy as a SystemTable """
+        table = system_table.SystemTable(leaf["name"])
+        origin_x, origin_y = leaf["origin"]
+        width, height = leaf["size"]
+        for x in range(origin_x + 1, origin_x + width + 1):
+            for y in range(origin_y + 1, origin_y + height + 1):
+                record = self.get_record((x, y))
+                if record is None:
+                    continue
+                flags, uwp_bytes, population_multiplier, belts, \
+                        gas_giants, mask, name_index = record
+                table.append(self.get_name(name_index), (x, y),
+                             uwp.unpack(int.from_bytes(uwp_bytes, "big"))[0],
+                             *uwp_bytes[1:],
+                             bool(flags & NAVAL), bool(flags & SCOUT),
+                             population_multiplier, belts, gas_giants)
+        return table
+
+    def iter_sec_lines(self, hierarchy = None):
+        """ The .sec file lines for the whole space """
+        if hierarchy is None:
+            hierarchy = self.hierarchy
+        if hierarchy["header"]:
+            yield hierarchy["header"]
+        if hierarchy.get("subspaces"):
+            for subspace in hierarchy["subspaces"]:
+                yield from self.iter_sec_lines(subspace)
+        else:
+            yield from self.read_leaf_table(hierarchy).iter_sec_lines()
+
+def sec_to_sector_file(sec_path, path):
+    with open(sec_path) as fp:
+        hierarchy, tables = sec_parser.read_sec(fp)
+    write_sector_file(path, hierarchy, tables)
+
+def sector_file_to_sec(path, sec_path):
+    with SectorFile(path) as sector_file, open(sec_path, "w") as fp:
+        fp.writelines(line + "\n" for line in sector_file.iter_sec_lines())
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) == 3 and sys.argv[1].endswith(".sec"):
+        sec_to_sector_file(sys.argv[1], sys.argv[2])
+    elif len(sys.argv) == 3:
+        sector_file_to_sec(sys.argv[1], sys.argv[2])
+    else:
+        print("Usage: sector_file.py in.sec out.bin | in.bin out.sec")
@@ -0,0 +1,239 @@
+""" A local HTTP service for generating spaces.
+
+Run from src:
+
+    python service.py [--host 127.0.0.1] [--port 8080] [--workers N]
+                      [--cache-size 128]
+
+Requests carry the same JSON descriptors as space.py reads, as the
+request body:
+
+    POST /space?format=sec          the whole space as a .sec file
+    POST /space?format=json         the same as JSON
+    POST /subsector?index=3         only leaf 3 (counting from 0) of the
+                                    space, .sec or JSON as above
+    GET  /stats                     cache and request counts
+
+Generation runs in a pool of worker processes, so the event loop keeps
+serving while spaces are generated. Results are cached, least recently
+used first out, keyed by the descriptor (its "Seed" included), the leaf
+and the format. Identical requests that arrive while one is being
+generated wait for that one rather than starting their own.
+
+Give descriptors a "Seed" for results that don't depend on the cache: a
+seeded leaf comes out the same on its own as within its space. """
+
+import argparse
+import asyncio
+import json
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import dice
+import space
+import system_table
+import trade_codes
+
+formats = {
+        "sec": "text/plain; charset=utf-8",
+        "json": "application/json"
+        }
+
+class RequestError(Exception):
+    """ A request that can't be served, with the HTTP status to send """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _table_to_json(table):
+    systems = []
+    for row in range(len(table)):
+        pbg = table.pbg[row]
+        systems.append({
+                "name": table.get_name(row),
+                "coordinates": [table.x[row], table.y[row]],
+                "uwp": table.get_uwp_string(row),
+                "naval_base": bool(table.bases[row] & system_table.NAVAL),
+                "scout_base": bool(table.bases[row] & system_table.SCOUT),
+                "trade_codes": list(trade_codes.mask_to_codes(
+                    table.trade_codes[row])),
+                "pbg": f"{pbg:03d}"
+                })
+    return systems
+
+def generate(descriptor, leaf_index, output_format):
+    """ Worker: generates the space (or one leaf of it) described and
+    returns it formatted """
+    s = space.create_space_from_dict(descriptor)
+    if s is None:
+        raise ValueError(f"Unknown space size '{descriptor.get('Size')}'")
+    if leaf_index is not None:
+        leaves = s.leaves()
+        if not 0 <= leaf_index < len(leaves):
+            raise IndexError(f"No leaf {leaf_index}, the space has "
+                             f"{len(leaves)}")
+        s = leaves[leaf_index]
+        s.generate()
+        description = s.describe()
+        tables = [s.table]
+    else:
+        s.generate()
+        description = s.describe()
+        tables = [leaf.table for leaf in s.leaves()]
+
+    if output_format == "sec":
+        return "".join(line + "\n" for line in s.iter_sec_lines())
+    systems = []
+    for table in tables:
+        systems += _table_to_json(table)
+    return json.dumps({"space": description, "systems": systems})
+
+class GenerationService:
+
+    def __init__(self, workers = None, cache_size = 128):
+        self.executor = ProcessPoolExecutor(
+                max_workers = workers, initializer = space._reseed_worker,
+                initargs = (dice.source_name(),))
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.stats = {"requests": 0, "hits": 0, "coalesced": 0,
+                      "generated": 0}
+
+    async def get(self, descriptor, leaf_index, output_format):
+        """ The output for a request, from the cache, from a matching
+        request already being generated, or newly generated """
+        key = json.dumps([descriptor, leaf_index, output_format],
+                         sort_keys = True)
+        if key in self.cache:
+            self.stats["hits"] += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        if key in self.pending:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(self.pending[key])
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, generate, descriptor,
+                                      leaf_index, output_format)
+        self.pending[key] = future
+        try:
+            # Shielded so one client going away doesn't cancel the
+            # generation for everyone waiting on it
+            result = await asyncio.shield(future)
+        finally:
+            del self.pending[key]
+        self.stats["generated"] += 1
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last = False)
+        return result
+
+    async def respond(self, method, target, body):
+        """ (status, content type, content) for a request """
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path == "/stats":
+            if method != "GET":
+                raise RequestError(405, "Use GET for /stats")
+            stats = dict(self.stats, cached = len(self.cache),
+                         pending = len(self.pending))
+            return 200, formats["json"], json.dumps(stats)
+
+        if url.path not in ("/space", "/subsector"):
+            raise RequestError(404, f"Nothing at '{url.path}'")
+        if method != "POST":
+            raise RequestError(405, f"POST a descriptor to '{url.path}'")
+        output_format = query.get("format", ["sec"])[0]
+        if output_format not in formats:
+            raise RequestError(400, f"Unknown format '{output_format}'")
+        leaf_index = None
+        if url.path == "/subsector":
+            try:
+                leaf_index = int(query["index"][0])
+            except (KeyError, ValueError):
+                raise RequestError(400, "/subsector needs ?index=N") from None
+        try:
+            descriptor = json.loads(body)
+        except ValueError as e:
+            raise RequestError(400, f"Bad JSON: {e}") from None
+        if not isinstance(descriptor, dict):
+            raise RequestError(400, "The descriptor must be a JSON object")
+
+        try:
+            content = await self.get(descriptor, leaf_index, output_format)
+        except IndexError as e:
+            raise RequestError(404, str(e)) from None
+        except (KeyError, ValueError, TypeError) as e:
+            raise RequestError(400, f"Bad descriptor: {e!r}") from None
+        return 200, formats[output_format], content
+
+    async def handle(self, reader, writer):
+        """ Serves one HTTP/1.1 request per connection """
+        try:
+            try:
+                request_line = await reader.readline()
+                method, target, version = \
+                        request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(
+                        int(headers.get("content-length", 0)))
+            except (ValueError, asyncio.IncompleteReadError):
+                raise RequestError(400, "Malformed request") from None
+            self.stats["requests"] += 1
+            status, content_type, content = \
+                    await self.respond(method, target, body)
+        except RequestError as e:
+            status, content_type, content = \
+                    e.status, formats["sec"], str(e) + "\n"
+        except Exception as e:
+            status, content_type, content = \
+                    500, formats["sec"], f"{e!r}\n"
+
+        content = content.encode("utf-8")
+        reasons = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                   405: "Method Not Allowed", 500: "Internal Server Error"}
+        writer.write(f"HTTP/1.1 {status} {reasons[status]}\r\n"
+                     f"Content-Type: {content_type}\r\n"
+                     f"Content-Length: {len(content)}\r\n"
+                     "Connection: close\r\n\r\n".encode("latin-1") + content)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+            description = "Serve generated spaces over HTTP")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 8080)
+    parser.add_argument("--workers", type = int, default = None,
+                        help = "Generate in this many processes")
+    parser.add_argument("--cache-size", type = int, default = 128,
+                        help = "Number of results to keep")
+    args = parser.parse_args()
+
+    service = GenerationService(args.workers, args.cache_size)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
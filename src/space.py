@@ -3,11 +3,18 @@
 Spaces include simple spaces such as Subsectors and more complex
 spaces such as Sectors and Domains which contain other spaces. """
 
+import argparse
 import dice
 import json
+import random
 import sys
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import sec_parser
 import system
-import uwp
+import system_table
+import uwp_generator
 
 density_dm = {
             "Rift": -2,
@@ -16,54 +23,330 @@ density_dm = {
             "Dense": +1
         }
 
+""" Header kinds by the size of space they head """
+_kinds = {tuple(size): kind for kind, size in sec_parser.header_sizes.items()}
+
 class Space:
     """ A space is a 2D hexagonal grid that contains systems """
 
     def __init__(self, name, size = (8,10), origin = (0,0), density = "Standard",
-                 maturity = "Standard", tech_cap = None):
+                 maturity = "Standard", tech_cap = None, seed = None):
+        """ seed: None to use the global random number generator, or an
+        int. With a seed every roll for a hex comes from a stream keyed by
+        the seed and the hex's absolute coordinates, so the same seed
+        always gives the same space whatever order it is generated in. """
         self.name = name
         self.size = size
         self.origin = origin
         self.density = density
         self.maturity = maturity
         self.tech_cap = tech_cap
+        self.seed = seed
         self.systems = []
-
-    def generate(self):
-        """ Generates a new space with new systems """
-        self.systems = []
-        systems = 0
+        self.dirty = True
+        self._occupied_before = None
+
+    """ A space keeps its systems in a SystemTable. Existing code that
+    wants System objects can still use self.systems: the table is turned
+    into a list of Systems on first use, and from then on that list is
+    the space's copy of its systems, so edits to it are kept. Asking for
+    self.table packs the list back into a table. Containers give the
+    Systems of all their leaves the same way. """
+
+    @property
+    def systems(self):
+        if self._systems is None:
+            self._systems = self._table.to_systems()
+            self._table = None
+            self._rendered = None
+            self._rows = None
+        return self._systems
+
+    @systems.setter
+    def systems(self, systems):
+        self._systems = systems
+        self._table = None
+        self._rendered = None
+        self._rows = None
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = system_table.SystemTable.from_systems(
+                    self._systems, self.name)
+            self._systems = None
+            self._rendered = None
+            self._rows = None
+        return self._table
+
+    @table.setter
+    def table(self, table):
+        self._table = table
+        self._systems = None
+        self._rendered = None
+        self._rows = None
+
+    """ A space is dirty when the systems it holds no longer match its
+    parameters: before it is first generated, after reconfigure()
+    changes them and after invalidate(). Generating it makes it clean.
+    generate() always generates everything anew, while
+    regenerate_dirty() only generates the dirty leaves. """
+
+    def reconfigure(self, density, maturity, tech_cap):
+        """ Sets new parameters, marking the space dirty if any changed """
+        if (density, maturity, tech_cap) != \
+                (self.density, self.maturity, self.tech_cap):
+            self.density = density
+            self.maturity = maturity
+            self.tech_cap = tech_cap
+            self.dirty = True
+
+    def invalidate(self):
+        """ Marks the space to be generated again """
+        self.dirty = True
+
+    def dirty_leaves(self):
+        return [self] if self.dirty else []
+
+    def regenerate_dirty(self):
+        """ Generates the space if it is dirty, else keeps its systems """
+        if self.dirty:
+            self.generate()
+
+    def hexes(self):
+        """ Absolute coordinates of every hex, in generation order """
+        hexes = []
         for row in range(1, self.size[0]+1):
             for column in range(1, self.size[1]+1):
-                if dice.roll(1, 6) + density_dm[self.density] >= 4:
-                    systems += 1
-                    s = system.System(
-                            name = f"{self.name} {systems}",
-                            coordinates = (row + self.origin[0], 
-                                           column + self.origin[1]))
-                    s.generate(self.maturity, self.tech_cap)
-                    self.systems.append(s)
+                hexes.append((row + self.origin[0], column + self.origin[1]))
+        return hexes
+
+    def generate(self):
+        """ Generates a new space with new systems
+
+        The occupancy check for every hex and the UWPs for every occupied
+        hex are each rolled in one batch. Seeded spaces are instead rolled
+        hex by hex from each hex's own stream. """
+        if self.seed is not None:
+            self.generate_seeded()
+        else:
+            self.generate_unseeded()
+        self.dirty = False
+
+    def generate_unseeded(self):
+        hexes = self.hexes()
+        dm = density_dm[self.density]
+        occupied = []
+        for coordinates, roll in zip(hexes, dice.roll_many(len(hexes), 1, 6)):
+            if roll + dm >= 4:
+                occupied.append(coordinates)
+
+        columns = uwp_generator.generate_uwp_batch(
+                len(occupied), maturity = self.maturity,
+                tech_cap = self.tech_cap)
+
+        table = system_table.SystemTable(self.name)
+        for row in zip(occupied,
+                       columns["starport"],
+                       columns["size"],
+                       columns["atmosphere"],
+                       columns["hydrosphere"],
+                       columns["population"],
+                       columns["government"],
+                       columns["law_level"],
+                       columns["tech_level"]):
+            naval, scout = system.roll_bases(row[1])
+            table.append(f"{self.name} {len(table) + 1}", *row,
+                         naval, scout, *system.roll_pbg())
+        self.table = table
+
+    def generate_seeded(self):
+        table = system_table.SystemTable(self.name)
+        for coordinates in self.hexes():
+            if self.is_occupied(coordinates):
+                table.append_system(self.generate_system(
+                    coordinates, len(table) + 1))
+        self.table = table
+
+    def is_occupied(self, coordinates):
+        """ The occupancy check for one hex of a seeded space """
+        stream = dice.HexStream(self.seed, coordinates, dice.OCCUPANCY_STREAM)
+        with dice.rolling_with(stream):
+            return dice.roll(1, 6) + density_dm[self.density] >= 4
+
+    def generate_system(self, coordinates, number):
+        """ Generates the system at one hex of a seeded space. number is
+        its position among the occupied hexes, used for its name. """
+        s = system.System(name = f"{self.name} {number}",
+                          coordinates = coordinates)
+        s.generate(self.maturity, self.tech_cap, self.seed)
+        return s
+
+    def generate_hex(self, coordinates):
+        """ Regenerates the system at one hex of a seeded space without
+        generating the rest, returning None if the hex is empty. The
+        result is identical to what generate() puts there. """
+        if self.seed is None:
+            raise ValueError("Only seeded spaces can regenerate single hexes")
+        if not self.is_occupied(coordinates):
+            return None
+        return self.generate_system(coordinates,
+                                    self.occupied_before(coordinates) + 1)
+
+    def occupied_before(self, coordinates):
+        """ How many hexes before coordinates, in generation order, are
+        occupied in a seeded space. The count for every hex is worked
+        out on first use, and again only if the seed or density
+        changes. """
+        number = self.hex_number(coordinates)
+        key = (self.seed, self.density)
+        if self._occupied_before is None or \
+                self._occupied_before[0] != key:
+            counts = array('H')
+            count = 0
+            for earlier in self.hexes():
+                counts.append(count)
+                if self.is_occupied(earlier):
+                    count += 1
+            self._occupied_before = (key, counts)
+        return self._occupied_before[1][number]
+
+    def hex_number(self, coordinates):
+        """ The position of absolute coordinates in hexes() """
+        x = coordinates[0] - self.origin[0] - 1
+        y = coordinates[1] - self.origin[1] - 1
+        if not (0 <= x < self.size[0] and 0 <= y < self.size[1]):
+            raise KeyError(f"{coordinates} is outside '{self.name}'")
+        return x * self.size[1] + y
+
+    def leaf_at(self, coordinates):
+        """ The leaf holding absolute coordinates: this space """
+        self.hex_number(coordinates)
+        return self
+
+    def get_system(self, coordinates):
+        """ The System at absolute coordinates, or None if the hex is
+        empty. Rows are found through an index by hex, made on first use
+        and again whenever the table changes. """
+        table = self.table
+        if self._rows is None or self._rows[0] != table.version:
+            rows = array('i', [-1]) * (self.size[0] * self.size[1])
+            for row, hex_coordinates in enumerate(zip(table.x, table.y)):
+                rows[self.hex_number(hex_coordinates)] = row
+            self._rows = (table.version, rows)
+        row = self._rows[1][self.hex_number(coordinates)]
+        if row < 0:
+            return None
+        return table.get_system(row)
+
+    def get_parameters(self):
+        """ Everything needed to recreate this space, ungenerated """
+        return {
+                "name": self.name,
+                "size": self.size,
+                "origin": self.origin,
+                "density": self.density,
+                "maturity": self.maturity,
+                "tech_cap": self.tech_cap,
+                "seed": self.seed
+                }
+
+    def leaves(self):
+        """ The spaces that actually hold systems: just this one """
+        return [self]
+
+    def describe(self):
+        """ The shape of this space and its subspaces as plain data """
+        return {
+                "header": self.get_header(),
+                "name": self.name,
+                "origin": list(self.origin),
+                "size": list(self.size)
+                }
+
+    def get_header(self):
+        """ The comment line introducing this space in a .sec file """
+        return None
 
+    def iter_sec_lines(self):
+        """ Yields the lines of a .sec file for this space, without
+        newlines, so large spaces never have to be built as one string """
+        header = self.get_header()
+        if header:
+            yield header
+        if self._systems is None:
+            yield from self._table.iter_sec_lines()
+        else:
+            for system in self._systems:
+                yield system.__str__()
+
+    """ Rendered text is as big again as the table, so by default it is
+    made afresh every time. With keep_rendered set, a space holding a
+    table keeps its text along with the table's version, and reuses it
+    until the table is replaced or edited (see SystemTable.set_field()).
+    Systems can be edited at any time without the space knowing, so
+    while self.systems is in use nothing is kept. """
+
+    keep_rendered = False
+
+    def render_systems(self):
+        """ The .sec lines of the systems, newlines included """
+        if self._systems is not None:
+            return "".join(system.__str__() + "\n"
+                           for system in self._systems)
+        if not self.keep_rendered:
+            self._rendered = None
+            return "".join(
+                    line + "\n" for line in self._table.iter_sec_lines())
+        version = self._table.version
+        if self._rendered is None or self._rendered[0] != version:
+            self._rendered = (version, "".join(
+                    line + "\n" for line in self._table.iter_sec_lines()))
+        return self._rendered[1]
+
+    def render(self):
+        """ The .sec file contents """
+        header = self.get_header()
+        if header:
+            return header + "\n" + self.render_systems()
+        return self.render_systems()
+
+    def write_sec(self, fp):
+        """ Writes the .sec file contents to fp """
+        fp.write(self.render())
+
+    def generate_and_write(self, fp):
+        """ Generates the space, writes it to fp and then drops its
+        systems again, so only one leaf is held in memory at a time """
+        self.write_generated(fp, self.iter_generated())
+
+    def iter_generated(self):
+        """ Yields (leaf, table) for each leaf as it is generated """
+        self.generate()
+        yield self, self.table
+
+    def write_generated(self, fp, generated):
+        """ Writes the next leaf's systems from generated """
+        leaf, self.table = next(generated)
+        self.write_sec(fp)
+        self.systems = []
+        self.dirty = True
 
     def __str__(self):
         """ Prints out a .sec file contents """
-        ret = ""
-        for system in self.systems:
-            ret += system.__str__() + "\n"
-        return ret
+        return self.render()
 
 
 class Subsector(Space):
     """ A Subsector is 8x10 hexes """
 
     def __init__(self, name, origin = (0, 0), density = "Standard",
-                 maturity = "Standard", tech_cap = None):
-        super().__init__(name, (8, 10), origin, density, maturity, tech_cap)
+                 maturity = "Standard", tech_cap = None, seed = None):
+        super().__init__(name, (8, 10), origin, density, maturity, tech_cap,
+                         seed)
 
-    def __str__(self):
-        ret = f"# Subsector '{self.name}' at '{self.origin[0]},{self.origin[1]}'\n"
-        ret += super().__str__()
-        return ret
+    def get_header(self):
+        return f"# Subsector '{self.name}' at '{self.origin[0]},{self.origin[1]}'"
 
 
 class ContainerOfSpaces(Space):
@@ -100,6 +383,9 @@ class ContainerOfSpaces(Space):
 
     tech_cap is like density, but with an Integer or None instead of a string
 
+    seed is passed unchanged to every subspace. Streams are keyed by
+    absolute coordinates, so subspaces never share rolls.
+
     subspace_names will either be empty, which will prompt the container
     to create generic versions, or a list. This is somewhat complicated by
     notions like Domains, which contains further subspaces. These will have
@@ -115,10 +401,11 @@ class ContainerOfSpaces(Space):
 
     def __init__(self, name, base, origin = (0, 0), subspace_size = (8, 10),
                  density = "Standard", maturity = "Standard", tech_cap = None,
-                 subspace_names = []):
+                 subspace_names = [], seed = None):
         self.name = name
         self.base = base
         self.origin = origin
+        self.seed = seed
         self.n_subspaces = base ** 2
         self.subspace_size = subspace_size
         self.size = (subspace_size[0] * base, subspace_size[1] * base)
@@ -176,68 +463,311 @@ class ContainerOfSpaces(Space):
                         origin = origin,
                         density = self.density[i],
                         maturity = self.maturity[i],
-                        tech_cap = self.tech_cap[i]
+                        tech_cap = self.tech_cap[i],
+                        seed = self.seed
                         )
                 self.subspaces.append(subspace)
 
-    def create_subspace(self, name, size, origin, density, maturity, tech_cap):
-        return Space(name, size, origin, density, maturity, tech_cap)
+    def create_subspace(self, name, size, origin, density, maturity, tech_cap,
+                        seed = None):
+        return Space(name, size, origin, density, maturity, tech_cap, seed)
 
-    def generate(self):
-        """ Generates each subspace in turn """
+    def describe(self):
+        description = super().describe()
+        description["subspaces"] = [subspace.describe()
+                                    for subspace in self.subspaces]
+        return description
+
+    def leaves(self):
+        """ The spaces that actually hold systems, in order """
+        leaves = []
         for subspace in self.subspaces:
-            subspace.generate()
+            leaves += subspace.leaves()
+        return leaves
+
+    def chunks(self, chunk):
+        """ Groups leaves into units of parallel work.
+        'subsector': every leaf on its own
+        'sector': the leaves of each lowest level container together """
+        if chunk == "subsector":
+            return [[leaf] for leaf in self.leaves()]
+        if chunk != "sector":
+            raise ValueError(f"Unknown chunk size '{chunk}'")
+        if all(not isinstance(subspace, ContainerOfSpaces)
+               for subspace in self.subspaces):
+            return [self.leaves()]
+        chunks = []
+        for subspace in self.subspaces:
+            chunks += subspace.chunks(chunk)
+        return chunks
 
-    def __str__(self):
-        ret = ""
+    def reconfigure(self, density, maturity, tech_cap):
+        """ Sets new parameters, in any of the forms __init__ takes.
+        Only the leaves whose own parameters change become dirty. """
+        self.density = self.setup_subspace_fields(density)
+        self.maturity = self.setup_subspace_fields(maturity)
+        self.tech_cap = self.setup_subspace_fields(tech_cap)
+        for i, subspace in enumerate(self.subspaces):
+            subspace.reconfigure(self.density[i], self.maturity[i],
+                                 self.tech_cap[i])
+
+    def invalidate(self):
+        for subspace in self.subspaces:
+            subspace.invalidate()
+
+    def dirty_leaves(self):
+        leaves = []
         for subspace in self.subspaces:
-            ret += subspace.__str__()
-        return ret
+            leaves += subspace.dirty_leaves()
+        return leaves
+
+    def generate(self, workers = None, chunk = "subsector"):
+        """ Generates every leaf anew, in turn.
+
+        If workers is given, leaves are generated in that many processes
+        instead, chunk deciding how they are grouped (see chunks()).
+        Workers send back each leaf's SystemTable, which pickles as a
+        handful of arrays, and these are put back into the existing
+        leaves, so the structure and order of the space are the same
+        either way. """
+        self.invalidate()
+        self.regenerate_dirty(workers, chunk)
+
+    def regenerate_dirty(self, workers = None, chunk = "subsector"):
+        """ Generates only the dirty leaves, as generate() does. The
+        first time that is every leaf; afterwards only those
+        reconfigured or invalidated are generated again, and the rest
+        keep their systems (edits included). """
+        if workers is None:
+            for leaf in self.dirty_leaves():
+                leaf.generate()
+            return
+
+        chunks = []
+        for leaves in self.chunks(chunk):
+            leaves = [leaf for leaf in leaves if leaf.dirty]
+            if leaves:
+                chunks.append(leaves)
+        for leaf, table in _generate_in_workers(chunks, workers):
+            leaf.table = table
+            leaf.dirty = False
+
+    def iter_generated(self, workers = None, chunk = "subsector"):
+        """ Yields (leaf, table) for each leaf in order as it is
+        generated, without storing the systems in the leaf. Every leaf
+        is generated, and is left dirty afterwards as it holds nothing. """
+        if workers is None:
+            for leaf in self.leaves():
+                leaf.generate()
+                yield leaf, leaf.table
+                leaf.systems = []
+                leaf.dirty = True
+            return
+
+        yield from _generate_in_workers(self.chunks(chunk), workers)
+
+    def generate_and_write(self, fp, workers = None, chunk = "subsector"):
+        """ Generates the space a leaf at a time, writing each leaf to fp
+        as soon as it is ready and then dropping it """
+        self.write_generated(fp, self.iter_generated(workers, chunk))
+
+    def write_generated(self, fp, generated):
+        header = self.get_header()
+        if header:
+            fp.write(header + "\n")
+        for subspace in self.subspaces:
+            subspace.write_generated(fp, generated)
+
+    def iter_sec_lines(self):
+        header = self.get_header()
+        if header:
+            yield header
+        for subspace in self.subspaces:
+            yield from subspace.iter_sec_lines()
+
+    @property
+    def keep_rendered(self):
+        return all(leaf.keep_rendered for leaf in self.leaves())
+
+    @keep_rendered.setter
+    def keep_rendered(self, keep):
+        """ Sets keep_rendered on every leaf, so rendering again only
+        formats the leaves that have changed """
+        for leaf in self.leaves():
+            leaf.keep_rendered = keep
+
+    def render_systems(self):
+        """ The .sec text of every subspace """
+        return "".join(subspace.render() for subspace in self.subspaces)
+
+    def write_sec(self, fp):
+        """ Writes the .sec file contents to fp a leaf at a time """
+        header = self.get_header()
+        if header:
+            fp.write(header + "\n")
+        for subspace in self.subspaces:
+            subspace.write_sec(fp)
+
+    @property
+    def systems(self):
+        """ The Systems of every leaf, in order. The list is made anew
+        each time, but the Systems in it are the leaves' own, so edits
+        to them are kept. """
+        systems = []
+        for leaf in self.leaves():
+            systems += leaf.systems
+        return systems
+
+    @property
+    def table(self):
+        """ The systems of every leaf in one SystemTable, in order """
+        return system_table.SystemTable.concatenate(
+                [leaf.table for leaf in self.leaves()])
+
+    def leaf_at(self, coordinates):
+        """ The leaf holding absolute coordinates """
+        i = (coordinates[0] - self.origin[0] - 1) // self.subspace_size[0]
+        j = (coordinates[1] - self.origin[1] - 1) // self.subspace_size[1]
+        if not (0 <= i < self.base and 0 <= j < self.base):
+            raise KeyError(f"{coordinates} is outside '{self.name}'")
+        return self.subspaces[i * self.base + j].leaf_at(coordinates)
+
+    """ Lazy mode, for spaces too big to generate whole. After
+    make_lazy(), nothing is generated up front: a leaf is generated when
+    get_leaf() or leaves_in() first asks for it, and at most capacity
+    leaves are held, the least recently used having its systems dropped
+    first. Lazy spaces are seeded (make_lazy() picks a seed if there is
+    none), so a leaf that is dropped and asked for again comes back the
+    same, edits aside. The leaves themselves always exist, with their
+    names and parameters; only their systems come and go.
+
+        region = Region("R", [16, 4], seed = 1)
+        region.make_lazy(capacity = 32)
+        lines = region.iter_sec_lines_in((128, 160), (32, 40))
+
+    generate() and the other whole-space methods still cover every
+    leaf, as they do for any container. """
+
+    capacity = None
+
+    def make_lazy(self, capacity = 64):
+        if self.seed is None:
+            self.seed = random.getrandbits(64)
+            for leaf in self.leaves():
+                leaf.seed = self.seed
+                leaf.invalidate()
+        self.capacity = capacity
+        self.held = OrderedDict()
+        self.generated = 0
+
+    def hold(self, leaf):
+        """ Generates leaf unless it is held and clean, and makes it the
+        most recently used """
+        if leaf in self.held and not leaf.dirty:
+            self.held.move_to_end(leaf)
+            return
+        leaf.generate()
+        self.generated += 1
+        self.held[leaf] = None
+        self.held.move_to_end(leaf)
+        if len(self.held) > self.capacity:
+            dropped, _ = self.held.popitem(last = False)
+            dropped.systems = []
+            dropped.dirty = True
+
+    def get_leaf(self, coordinates):
+        """ The leaf holding absolute coordinates, held if lazy """
+        leaf = self.leaf_at(coordinates)
+        if self.capacity is not None:
+            self.hold(leaf)
+        return leaf
+
+    def get_system(self, coordinates):
+        """ The System at absolute coordinates, or None if the hex is
+        empty. A lazy container that isn't holding the hex's leaf
+        generates just that hex (see Space.generate_hex()). """
+        leaf = self.leaf_at(coordinates)
+        if self.capacity is not None and \
+                (leaf not in self.held or leaf.dirty):
+            return leaf.generate_hex(coordinates)
+        return leaf.get_system(coordinates)
+
+    def leaves_in(self, origin, size):
+        """ The leaves overlapping the rectangle of hexes from origin +
+        (1, 1) to origin + size, as when viewing part of the space. A
+        lazy container holds them all, so raises ValueError if there are
+        more than capacity; iter_sec_lines_in() has no such limit. """
+        leaves = self._leaves_overlapping(origin, size)
+        if self.capacity is not None:
+            if len(leaves) > self.capacity:
+                raise ValueError(f"{len(leaves)} leaves are in view but "
+                                 f"only {self.capacity} can be held")
+            for leaf in leaves:
+                self.hold(leaf)
+        return leaves
+
+    def _leaves_overlapping(self, origin, size):
+        first = [max(origin[axis], self.origin[axis]) + 1
+                 for axis in (0, 1)]
+        last = [min(origin[axis] + size[axis],
+                    self.origin[axis] + self.size[axis]) for axis in (0, 1)]
+        if first[0] > last[0] or first[1] > last[1]:
+            return []
+        # Every leaf is the same size, so step from the first leaf's corner
+        corner = self.leaf_at(first)
+        return [self.leaf_at((x, y))
+                for x in range(corner.origin[0] + 1, last[0] + 1,
+                               corner.size[0])
+                for y in range(corner.origin[1] + 1, last[1] + 1,
+                               corner.size[1])]
+
+    def iter_sec_lines_in(self, origin, size):
+        """ .sec file lines for the leaves overlapping a rectangle. A
+        lazy container holds each leaf only while its lines are being
+        yielded, so views of any size can be written. """
+        for leaf in self._leaves_overlapping(origin, size):
+            if self.capacity is not None:
+                self.hold(leaf)
+            yield from leaf.iter_sec_lines()
 
 
 class ContainerOfSubsectors(ContainerOfSpaces):
     """ A Space that will contain Subsectors """
 
     def __init__(Self, name, base, origin = (0, 0), density = "Standard", 
-                 maturity = "Standard", tech_cap = None, subspace_names = []):
+                 maturity = "Standard", tech_cap = None, subspace_names = [],
+                 seed = None):
         super().__init__(name, base, origin, (8, 10),
-                         density, maturity, tech_cap, subspace_names)
+                         density, maturity, tech_cap, subspace_names, seed)
 
-    def create_subspace(self, name, size, origin, density, maturity, tech_cap):
+    def create_subspace(self, name, size, origin, density, maturity, tech_cap,
+                        seed = None):
         """ We ignore size, all subsectors are 8x10 """
-        return Subsector(name, origin, density, maturity, tech_cap)
+        return Subsector(name, origin, density, maturity, tech_cap, seed)
 
 
 class Quadrant(ContainerOfSubsectors):
     """ A Quadrant is 2x2 Subsectors """
     def __init__(self, name, origin = (0, 0), density = "Standard", 
-                 maturity = "Standard", tech_cap = None, subspace_names = []):
+                 maturity = "Standard", tech_cap = None, subspace_names = [],
+                 seed = None):
         super().__init__(name, 2, origin, density, 
-                         maturity, tech_cap, subspace_names)
+                         maturity, tech_cap, subspace_names, seed)
 
-    def __str__(self):
-        ret = f"# Quadrant '{self.name}' at '{self.origin[0]},{self.origin[1]}'\n"
-        ret += super().__str__()
-        return ret
+    def get_header(self):
+        return f"# Quadrant '{self.name}' at '{self.origin[0]},{self.origin[1]}'"
 
 
 class Sector(ContainerOfSubsectors):
     """ A Sector is 4x4 Subsectors """
     def __init__(self, name, origin = (0, 0), density = "Standard",
-                 maturity = "Standard", tech_cap = None, subspace_names = []):
-
-        print("Sector Density:\n", density)
-        print("\nSector Subspace Names:\n", subspace_names)
-
-
+                 maturity = "Standard", tech_cap = None, subspace_names = [],
+                 seed = None):
         super().__init__(name, 4, origin, density, 
-                         maturity, tech_cap, subspace_names)
+                         maturity, tech_cap, subspace_names, seed)
 
-    def __str__(self):
-        ret = f"# Sector '{self.name}'\n"
-        ret = f"# Sector '{self.name}' at '{self.origin[0]},{self.origin[1]}'\n"
-        ret += super().__str__()
-        return ret
+    def get_header(self):
+        return f"# Sector '{self.name}' at '{self.origin[0]},{self.origin[1]}'"
 
 
 class ContainerOfSectors(ContainerOfSpaces):
@@ -246,9 +776,10 @@ class ContainerOfSectors(ContainerOfSpaces):
     But we might extend this with a 4x4 sector space."""
 
     def __init__(self, name, base, origin = (0, 0), density = "Standard", 
-                 maturity = "Standard", tech_cap = None, subspace_names = []):
+                 maturity = "Standard", tech_cap = None, subspace_names = [],
+                 seed = None):
         super().__init__(name, base, origin, (32, 40),
-                         density, maturity, tech_cap, subspace_names)
+                         density, maturity, tech_cap, subspace_names, seed)
     
     def setup_subspace_fields(self, field):
         """ Case 1: 'Standard' Single field for whole domain """
@@ -303,6 +834,9 @@ class ContainerOfSectors(ContainerOfSpaces):
         of subsector names.
         """
 
+        # Filled in below, so copied to leave the caller's list (or the
+        # shared default) alone
+        subspace_names = list(subspace_names)
         if not subspace_names:
             """ Case 1 """
             """ We're just going to do sector names here """
@@ -362,32 +896,311 @@ class ContainerOfSectors(ContainerOfSpaces):
                         density = self.density[i],
                         maturity = self.maturity[i],
                         tech_cap = self.tech_cap[i],
-                        subspace_names = self.subspace_names[i][1]
+                        subspace_names = self.subspace_names[i][1],
+                        seed = self.seed
                         )
                 self.subspaces.append(subspace)
 
     def create_subspace(self, name, size, origin, 
-                        density, maturity, tech_cap, subspace_names):
+                        density, maturity, tech_cap, subspace_names,
+                        seed = None):
         return Sector(name, origin,
-                      density, maturity, tech_cap, subspace_names)
+                      density, maturity, tech_cap, subspace_names, seed)
 
 
 class Domain(ContainerOfSectors):
     """ A Domain is 2x2 Sectors """
     def __init__(self, name, origin = (0, 0), density = "Standard", 
-                 maturity = "Standard", tech_cap = None, subspace_names = []):
+                 maturity = "Standard", tech_cap = None, subspace_names = [],
+                 seed = None):
+        super().__init__(name, 2, origin, density,
+                         maturity, tech_cap, subspace_names, seed)
+
+    def get_header(self):
+        return f"# Domain '{self.name}' at '{self.origin[0]},{self.origin[1]}'"
+
+class Region(ContainerOfSpaces):
+    """ A space of any number of levels, each any base.
+
+    bases lists, from the top down, how many subspaces across each level
+    has: Region("R", [2, 4]) is laid out as a Domain, 2x2 Sectors of 4x4
+    Subsectors, and Region("R", [32, 4]) is 32x32 Sectors. Only the
+    leaves are objects. The levels between exist only as arithmetic on
+    leaf numbers, so a region holds no more objects for being deep.
+
+    Leaves are numbered depth first, as ContainerOfSpaces.leaves()
+    orders them, and everything per leaf is kept in flat lists indexed
+    by leaf number. density, maturity and tech_cap each take a single
+    value, one value per leaf, or lists nested as the levels are (as for
+    a Domain: a value or a list for each Sector), and are broadcast to
+    one value per leaf once, up front. leaf_names is a list of a name
+    for every leaf, or empty to name them as Domains do, by a label per
+    level.
+
+    leaf_at() finds the leaf holding any hex with a single lookup in a
+    grid of leaf numbers.
+
+    Spaces and levels the size of a Subsector, Quadrant, Sector or Domain
+    get that header in .sec output, others none. .sec coordinates only
+    have room for two digits each, so use sector_file, or the tables,
+    for anything bigger than a Domain. """
+
+    def __init__(self, name, bases, origin = (0, 0), leaf_size = (8, 10),
+                 density = "Standard", maturity = "Standard",
+                 tech_cap = None, leaf_names = [], seed = None):
+        self.name = name
+        self.bases = list(bases)
+        self.base = self.bases[0]
+        self.origin = origin
+        self.seed = seed
+        self.leaf_size = leaf_size
+
+        # spans[k]: leaves, along each side, of a level k space
+        self.spans = [1]
+        for base in reversed(self.bases):
+            self.spans.insert(0, self.spans[0] * base)
+        self.size = (leaf_size[0] * self.spans[0],
+                     leaf_size[1] * self.spans[0])
+        self.subspace_size = leaf_size
+        self.n_subspaces = self.spans[0] ** 2
+        self.setup_levels()
 
-        print("Domain Density:\n", density)
-        print("\nDomain Subspace Names:\n", subspace_names)
-    
+        self.density = self.setup_subspace_fields(density)
+        self.maturity = self.setup_subspace_fields(maturity)
+        self.tech_cap = self.setup_subspace_fields(tech_cap)
 
-        super().__init__(name, 2, origin, density,
-                         maturity, tech_cap, subspace_names)
+        self.setup_subspace_names(leaf_names)
 
-    def __str__(self):
-        ret = f"# Domain '{self.name}' at '{self.origin[0]},{self.origin[1]}'\n"
-        ret += super().__str__()
-        return ret
+        self.create_subspaces()
+
+    def setup_levels(self):
+        """ Works out, for every level below the top, the name and grid
+        position of each of its spaces in depth first order, and the
+        grid of leaf numbers """
+        names = [self.name]
+        positions = [(0, 0)]
+        self.level_names = [names]
+        self.level_positions = [positions]
+        for base in self.bases:
+            labels = [self.label(base, row, column)
+                      for row in range(base) for column in range(base)]
+            offsets = [(row, column)
+                       for row in range(base) for column in range(base)]
+            names = [name + " " + label
+                     for name in names for label in labels]
+            positions = [(i * base + row, j * base + column)
+                         for i, j in positions for row, column in offsets]
+            self.level_names.append(names)
+            self.level_positions.append(positions)
+
+        span = self.spans[0]
+        self.grid = array('I', bytes(4 * span * span))
+        for number, (i, j) in enumerate(positions):
+            self.grid[i * span + j] = number
+
+    @staticmethod
+    def label(base, row, column):
+        if base <= 4:
+            return ContainerOfSpaces.subspace_labels[row * base + column]
+        return f"{row + 1}-{column + 1}"
+
+    def setup_subspace_fields(self, field):
+        return self.broadcast(field, 0)
+
+    def broadcast(self, field, level):
+        """ field as one value for each leaf under a level space """
+        count = self.spans[level] ** 2
+        if type(field) != list:
+            return [field] * count
+        if len(field) == count:
+            return list(field)
+        if level < len(self.bases) and len(field) == self.bases[level] ** 2:
+            values = []
+            for entry in field:
+                values += self.broadcast(entry, level + 1)
+            return values
+        raise ValueError(f"Got {len(field)} values for a level {level} "
+                         f"space of {count} leaves in Region")
+
+    def setup_subspace_names(self, leaf_names):
+        if not leaf_names:
+            self.subspace_names = self.level_names[-1]
+        elif len(leaf_names) != self.n_subspaces:
+            raise ValueError(f"Only {len(leaf_names)} leaf names given of "
+                             f"{self.n_subspaces} required")
+        else:
+            self.subspace_names = list(leaf_names)
+
+    def create_subspaces(self):
+        self.subspaces = []
+        for i, (x, y) in enumerate(self.level_positions[-1]):
+            origin = (self.origin[0] + x * self.leaf_size[0],
+                      self.origin[1] + y * self.leaf_size[1])
+            self.subspaces.append(self.create_subspace(
+                    self.subspace_names[i], self.leaf_size, origin,
+                    self.density[i], self.maturity[i], self.tech_cap[i],
+                    self.seed))
+
+    def create_subspace(self, name, size, origin, density, maturity, tech_cap,
+                        seed = None):
+        if tuple(size) == (8, 10):
+            return Subsector(name, origin, density, maturity, tech_cap, seed)
+        return Space(name, size, origin, density, maturity, tech_cap, seed)
+
+    def leaf_number(self, coordinates):
+        """ The number of the leaf holding absolute coordinates """
+        i = (coordinates[0] - self.origin[0] - 1) // self.leaf_size[0]
+        j = (coordinates[1] - self.origin[1] - 1) // self.leaf_size[1]
+        span = self.spans[0]
+        if not (0 <= i < span and 0 <= j < span):
+            raise KeyError(f"{coordinates} is outside '{self.name}'")
+        return self.grid[i * span + j]
+
+    def leaf_at(self, coordinates):
+        return self.subspaces[self.leaf_number(coordinates)]
+
+    def level_header(self, level, index):
+        """ The .sec header of space index of a level, or None """
+        kind = _kinds.get(self.level_size(level))
+        if kind is None:
+            return None
+        x, y = self.level_origin(level, index)
+        return f"# {kind} '{self.level_names[level][index]}' at '{x},{y}'"
+
+    def level_size(self, level):
+        return (self.leaf_size[0] * self.spans[level],
+                self.leaf_size[1] * self.spans[level])
+
+    def level_origin(self, level, index):
+        """ The origin of space index of a level. Positions count spaces
+        of that level. """
+        i, j = self.level_positions[level][index]
+        width, height = self.level_size(level)
+        return (self.origin[0] + i * width, self.origin[1] + j * height)
+
+    def get_header(self):
+        return self.level_header(0, 0)
+
+    def headers_before(self, number):
+        """ Headers of the levels between the top and the leaves that
+        start at leaf number """
+        headers = []
+        for level in range(1, len(self.bases)):
+            leaves = self.spans[level] ** 2
+            if number % leaves == 0:
+                header = self.level_header(level, number // leaves)
+                if header:
+                    headers.append(header)
+        return headers
+
+    def iter_sec_lines(self):
+        header = self.get_header()
+        if header:
+            yield header
+        for number, leaf in enumerate(self.subspaces):
+            yield from self.headers_before(number)
+            yield from leaf.iter_sec_lines()
+
+    def render_systems(self):
+        parts = []
+        for number, leaf in enumerate(self.subspaces):
+            parts += [header + "\n" for header in self.headers_before(number)]
+            parts.append(leaf.render())
+        return "".join(parts)
+
+    def write_sec(self, fp):
+        header = self.get_header()
+        if header:
+            fp.write(header + "\n")
+        for number, leaf in enumerate(self.subspaces):
+            fp.writelines(header + "\n"
+                          for header in self.headers_before(number))
+            leaf.write_sec(fp)
+
+    def write_generated(self, fp, generated):
+        header = self.get_header()
+        if header:
+            fp.write(header + "\n")
+        for number, leaf in enumerate(self.subspaces):
+            fp.writelines(header + "\n"
+                          for header in self.headers_before(number))
+            leaf.write_generated(fp, generated)
+
+    def describe(self):
+        """ As ContainerOfSpaces.describe(), with every level """
+        def node(level, index):
+            if level == len(self.bases):
+                return self.subspaces[index].describe()
+            children = self.bases[level] ** 2
+            return {
+                    "header": self.level_header(level, index),
+                    "name": self.level_names[level][index],
+                    "origin": list(self.level_origin(level, index)),
+                    "size": list(self.level_size(level)),
+                    "subspaces": [node(level + 1, index * children + child)
+                                  for child in range(children)]
+                    }
+        return node(0, 0)
+
+    def chunks(self, chunk):
+        """ As ContainerOfSpaces.chunks(): 'sector' groups the leaves of
+        each space of the level above the leaves """
+        if chunk == "subsector":
+            return [[leaf] for leaf in self.subspaces]
+        if chunk != "sector":
+            raise ValueError(f"Unknown chunk size '{chunk}'")
+        group = self.bases[-1] ** 2
+        return [self.subspaces[start:start + group]
+                for start in range(0, len(self.subspaces), group)]
+
+def _reseed_worker(source_name = None):
+    """ Forked workers inherit the parent's random state and would all
+    roll the same numbers, and spawned ones start out rolling with the
+    random module whatever the parent used. So each worker is given a
+    new dice source of the parent's kind (source_name, see
+    dice.source_name()), or else has the one it has reseeded. Seeded
+    spaces roll from their own streams and are unaffected. """
+    random.seed()
+    if source_name is not None:
+        dice.set_source(dice.create_source(source_name))
+    else:
+        dice.reseed_source()
+
+def _generate_in_workers(chunks, workers):
+    """ Yields (leaf, table) for every leaf of chunks, a list of lists of
+    leaves, generating each list of leaves in one of workers processes.
+    Only about two chunks per worker are submitted ahead of the one being
+    yielded, so a stream holds that many results however big the space. """
+    chunks = iter(chunks)
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers = workers,
+                             initializer = _reseed_worker,
+                             initargs = (dice.source_name(),)) as executor:
+        def submit():
+            leaves = next(chunks, None)
+            if leaves is not None:
+                in_flight.append((leaves, executor.submit(
+                        _generate_leaves,
+                        [leaf.get_parameters() for leaf in leaves])))
+
+        for i in range(2 * workers):
+            submit()
+        while in_flight:
+            leaves, future = in_flight.popleft()
+            results = future.result()
+            submit()
+            for leaf, table in zip(leaves, results):
+                yield leaf, table
+
+def _generate_leaves(leaf_parameters):
+    """ Worker for ContainerOfSpaces.generate: generates each leaf and
+    returns its SystemTable """
+    results = []
+    for parameters in leaf_parameters:
+        leaf = Space(**parameters)
+        leaf.generate()
+        results.append(leaf.table)
+    return results
 
 def create_subsector_from_dict(descriptor):
     subsector = Subsector(
@@ -395,7 +1208,8 @@ def create_subsector_from_dict(descriptor):
             origin = tuple(descriptor["Origin"]),
             density = descriptor["Density"],
             maturity = descriptor["Maturity"],
-            tech_cap = descriptor["Tech cap"]
+            tech_cap = descriptor["Tech cap"],
+            seed = descriptor.get("Seed")
             )
     return subsector
 
@@ -406,7 +1220,8 @@ def create_quadrant_from_dict(descriptor):
             density = descriptor["Density"],
             maturity = descriptor["Maturity"],
             tech_cap = descriptor["Tech cap"],
-            subspace_names = descriptor["Subspace names"]
+            subspace_names = descriptor["Subspace names"],
+            seed = descriptor.get("Seed")
             )
     return quadrant
 
@@ -417,7 +1232,8 @@ def create_sector_from_dict(descriptor):
             density = descriptor["Density"],
             maturity = descriptor["Maturity"],
             tech_cap = descriptor["Tech cap"],
-            subspace_names = descriptor["Subspace names"]
+            subspace_names = descriptor["Subspace names"],
+            seed = descriptor.get("Seed")
             )
     return sector
 
@@ -428,17 +1244,39 @@ def create_domain_from_dict(descriptor):
             density = descriptor["Density"],
             maturity = descriptor["Maturity"],
             tech_cap = descriptor["Tech cap"],
-            subspace_names = descriptor["Subspace names"]
+            subspace_names = descriptor["Subspace names"],
+            seed = descriptor.get("Seed")
             )
     return domain
 
+def create_region_from_dict(descriptor):
+    region = Region(
+            name = descriptor["Name"],
+            bases = descriptor["Bases"],
+            origin = tuple(descriptor["Origin"]),
+            leaf_size = tuple(descriptor.get("Leaf size", (8, 10))),
+            density = descriptor["Density"],
+            maturity = descriptor["Maturity"],
+            tech_cap = descriptor["Tech cap"],
+            leaf_names = descriptor.get("Subspace names", []),
+            seed = descriptor.get("Seed")
+            )
+    return region
+
+def reconfigure_from_dict(space, descriptor):
+    """ Updates a space created from an earlier version of descriptor,
+    so that regenerate_dirty() only regenerates what the changes touch """
+    space.reconfigure(descriptor["Density"], descriptor["Maturity"],
+                      descriptor["Tech cap"])
+
 def create_space_from_dict(descriptor):
     size = descriptor["Size"]
     space_creators = {
             "Subsector": create_subsector_from_dict,
             "Quadrant": create_quadrant_from_dict,
             "Sector": create_sector_from_dict,
-            "Domain": create_domain_from_dict
+            "Domain": create_domain_from_dict,
+            "Region": create_region_from_dict
             }
     if size in space_creators:
         return space_creators[size](descriptor)
@@ -447,17 +1285,92 @@ def create_space_from_dict(descriptor):
         return None
 
 if __name__ == "__main__":
-    if len(sys.argv) == 2:
-        filename = sys.argv[1]
-        try:
-            with open(filename) as fp:
-                desc = json.load(fp)
-                s = create_space_from_dict(desc)
-                s.generate()
-                print(s)
-        except IOError:
-            print(f"Could not open '{filename}'")
+    parser = argparse.ArgumentParser(
+            description = "Generate a space described by a JSON file")
+    parser.add_argument("filename",
+                        help = "JSON file to determine space parameters")
+    parser.add_argument("--seed", type = int, default = None,
+                        help = "Seed for reproducible output. Overrides "
+                        "any 'Seed' in the file")
+    parser.add_argument("--workers", type = int, default = None,
+                        help = "Generate in this many processes")
+    parser.add_argument("--chunk", choices = ["subsector", "sector"],
+                        default = "subsector",
+                        help = "Unit of work for each process")
+    parser.add_argument("--stream", action = "store_true",
+                        help = "Write each subsector as soon as it is "
+                        "generated instead of holding the whole space")
+    parser.add_argument("--output", default = None,
+                        help = "File to write the .sec output to, "
+                        "instead of stdout")
+    parser.add_argument("--cache", default = None, metavar = "DIRECTORY",
+                        help = "Keep generated subsectors of seeded spaces "
+                        "here and load them instead of generating them "
+                        "again")
+    parser.add_argument("--cache-size", type = int, default = 256,
+                        metavar = "MB", help = "Size to keep the cache to")
+    parser.add_argument("--dice", choices = dice.source_names,
+                        default = None,
+                        help = "Where unseeded rolls come from, in "
+                        "workers too. Seeded spaces roll from their own "
+                        "streams, keyed by hex, and ignore it")
+    parser.add_argument("--report", default = None,
+                        help = "Count and time each generation stage and "
+                        "leaf, saving the report as JSON to this file")
+    parser.add_argument("--profile", default = None,
+                        help = "Run under cProfile, saving stats to this "
+                        "file for pstats or snakeviz")
+    args = parser.parse_args()
+    if args.cache and args.stream:
+        parser.error("--cache can't be used with --stream")
+
+    filename = args.filename
+    try:
+        with open(filename) as fp:
+            desc = json.load(fp)
+    except IOError:
+        print(f"Could not open '{filename}'")
+        sys.exit(1)
+    if args.seed is not None:
+        desc["Seed"] = args.seed
+    if args.dice:
+        dice.set_source(dice.create_source(args.dice))
+    s = create_space_from_dict(desc)
+    out = open(args.output, "w") if args.output else sys.stdout
+    if isinstance(s, ContainerOfSpaces):
+        options = {"workers": args.workers, "chunk": args.chunk}
+    else:
+        options = {}
+
+    if args.cache:
+        import space_cache
+        cache = space_cache.SpaceCache(args.cache, args.cache_size * 2**20)
+
+    def run():
+        if args.stream:
+            s.generate_and_write(out, **options)
+        elif args.cache:
+            cache.generate(s, **options)
+            s.write_sec(out)
+        else:
+            s.generate(**options)
+            s.write_sec(out)
+
+    if args.report:
+        import instrumentation
+        report = instrumentation.enable(Space)
+    if args.profile:
+        import cProfile
+        profile = cProfile.Profile()
+        profile.runcall(run)
+        profile.dump_stats(args.profile)
     else:
-        print("I expect a file to determine space parameters")
+        run()
+    if args.report:
+        instrumentation.disable()
+        with open(args.report, "w") as fp:
+            report.write_json(fp)
+    if args.output:
+        out.close()
      
     
@@ -0,0 +1,190 @@
+""" An on-disk cache of generated leaf spaces.
+
+A seeded leaf always comes out the same, so once generated its systems
+can be kept and loaded the next time instead of being rolled again.
+Each leaf is stored in its own file, named by a hash of everything that
+decides its systems: its parameters (see Space.get_parameters()) and
+the source of the modules that do the generating, so editing the rules
+never serves stale systems. A Domain is 64 files, and changing one
+subsector of its descriptor only misses on that one.
+
+    cache = SpaceCache("~/.cache/uwp")
+    cache.generate(domain)      # loads what it can, generates the rest
+
+Unseeded leaves are never cached: they are meant to differ every time.
+
+Files hold the SystemTable columns as raw little-endian arrays behind a
+short JSON header. Each is written to a temporary file in the same
+directory and renamed into place, so processes sharing a cache
+directory only ever see whole files. Loading a file touches it, and
+when the cache grows beyond max_bytes the least recently used files are
+removed. """
+
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from functools import lru_cache
+
+import system_table
+
+MAGIC = b"UWPC"
+FORMAT = 1
+SUFFIX = ".table"
+
+HEADER = struct.Struct("<4sHI")
+
+""" Source files whose contents decide what a seed generates """
+rule_files = ["dice.py", "ehex.py", "space.py", "system.py",
+              "system_table.py", "trade_codes.py", "uwp.py",
+              "uwp_generator.py"]
+
+@lru_cache(maxsize = None)
+def rules_version():
+    """ A hash of the rule_files, standing for this version of the rules """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for name in rule_files:
+        with open(os.path.join(directory, name), "rb") as fp:
+            digest.update(fp.read())
+    return digest.hexdigest()
+
+def table_to_bytes(table):
+    header = json.dumps({"name_prefix": table.name_prefix,
+                         "names": table.names,
+                         "rows": len(table)}).encode("utf-8")
+    parts = [HEADER.pack(MAGIC, FORMAT, len(header)), header]
+    for name, typecode in system_table.columns:
+        column = getattr(table, name)
+        if sys.byteorder == "big":
+            column = array(typecode, column)
+            column.byteswap()
+        parts.append(column.tobytes())
+    return b"".join(parts)
+
+def table_from_bytes(data):
+    """ The SystemTable in data, raising ValueError if data isn't one
+    whole table """
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated table")
+    magic, version, header_length = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT:
+        raise ValueError(f"Not a version {FORMAT} table")
+    offset = HEADER.size + header_length
+    header = json.loads(data[HEADER.size:offset])
+    rows = header["rows"]
+    table = system_table.SystemTable(header["name_prefix"])
+    table.names = header["names"]
+    for name, typecode in system_table.columns:
+        column = getattr(table, name)
+        end = offset + rows * column.itemsize
+        if end > len(data):
+            raise ValueError("Truncated table")
+        column.frombytes(data[offset:end])
+        if sys.byteorder == "big":
+            column.byteswap()
+        offset = end
+    if offset != len(data):
+        raise ValueError("Table has trailing bytes")
+    return table
+
+class SpaceCache:
+    """ Generated leaves kept in directory, up to about max_bytes """
+
+    def __init__(self, directory, max_bytes = 256 * 2**20):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok = True)
+
+    def key(self, leaf):
+        """ The hash naming a leaf's file """
+        parameters = json.dumps([rules_version(), leaf.get_parameters()],
+                                sort_keys = True)
+        return hashlib.sha256(parameters.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def load(self, leaf):
+        """ The cached SystemTable for leaf, or None """
+        if leaf.seed is None:
+            return None
+        path = self.path(self.key(leaf))
+        try:
+            with open(path, "rb") as fp:
+                table = table_from_bytes(fp.read())
+            os.utime(path)
+        except (OSError, ValueError):
+            # Missing, evicted meanwhile, or not a table: regenerate
+            return None
+        return table
+
+    def store(self, leaf, table):
+        """ Saves a leaf's table, replacing any file already there """
+        if leaf.seed is None:
+            return
+        fd, temporary = tempfile.mkstemp(dir = self.directory,
+                                         suffix = ".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(table_to_bytes(table))
+            os.replace(temporary, self.path(self.key(leaf)))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def entries(self):
+        """ (last used, bytes, path) of every file, oldest first """
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        return entries
+
+    def size(self):
+        return sum(size for used, size, path in self.entries())
+
+    def evict(self):
+        """ Removes the least recently used files until the cache is no
+        bigger than max_bytes """
+        entries = self.entries()
+        total = sum(size for used, size, path in entries)
+        for used, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Another process got there first
+                pass
+            total -= size
+
+    def generate(self, space, **options):
+        """ Generates the dirty leaves of space (see
+        Space.regenerate_dirty(), which is passed options), loading those
+        in the cache and storing the rest """
+        for leaf in space.dirty_leaves():
+            table = self.load(leaf)
+            if table is not None:
+                leaf.table = table
+                leaf.dirty = False
+                self.hits += 1
+        missed = space.dirty_leaves()
+        self.misses += len(missed)
+        if missed:
+            space.regenerate_dirty(**options)
+            for leaf in missed:
+                self.store(leaf, leaf.table)
+        self.evict()
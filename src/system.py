@@ -4,11 +4,70 @@ That is: System coordinates, system name, and various extended features
 such as bases, gas giants, planetoid belts. """
 
 import dice
+import trade_codes
 import uwp
 
+""" The rolls behind System.generate_bases and System.generate_pbg,
+usable without a System, e.g. when filling a SystemTable """
+
+def roll_bases(starport):
+    """ Returns (naval base, scout base) for a system with this starport """
+    if starport in ['A', 'B'] and dice.roll(2, 6) >= 8:
+        naval_base = True
+    else:
+        naval_base = False
+
+    scout_dm = 0
+    if starport == 'C':
+        scout_dm = -1
+    elif starport == 'B':
+        scout_dm = -2
+    elif starport == 'A':
+        scout_dm = -3
+
+    if starport in ['A', 'B', 'C', 'D'] and \
+        (dice.roll(2, 6) + scout_dm) >= 7:
+        scout_base = True
+    else:
+        scout_base = False
+    return naval_base, scout_base
+
+# MT has '13' be 3 belts, but gives no DMs. How do we get to 13?
+belt_quantity_table = [
+    #   0  1  2  3  4  5  6  7  8  9  10 11 12 13
+        0, 0, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 3
+        ]
+
+gas_giant_quantity_table = [
+    #   0  1  2  3  4  5  6  7  8  9  10 11 12
+        0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 4, 5, 5
+        ]
+
+def roll_pbg():
+    """ Returns (population multiplier, belts, gas giants) """
+
+    # Population multiplier
+    population_multiplier = dice.roll(1, 9)
+
+    # Planetoid belts. Using MegaTraveller rules.
+    if dice.roll(2, 6) >= 8:
+        belts = belt_quantity_table[dice.roll(2, 6)]
+    else:
+        belts = 0
+
+    # Gas Giants. Again using MegaTraveller rules.
+    if dice.roll(2, 6) >= 5:
+        gas_giants = gas_giant_quantity_table[dice.roll(2, 6)]
+    else:
+        gas_giants = 0
+    return population_multiplier, belts, gas_giants
+
 class System:
     """ Base Class of System being that presented in Classic Traveller """
 
+    __slots__ = ("name", "coordinates", "uwp", "naval_base", "scout_base",
+                 "gas_giants", "belts", "population_multiplier")
+
     def __init__(self, name, coordinates, uwp = None,
                  naval = False, scout = False, gas = False):
         self.name = name
@@ -33,56 +92,24 @@ class System:
 
     def generate_bases(self):
         """ Note that this requires the system to have a valid UWP """
-        if self.uwp.starport in ['A', 'B'] and dice.roll(2, 6) >= 8:
-            self.naval_base = True
-        else:
-            self.naval_base = False
-
-        scout_dm = 0
-        if self.uwp.starport == 'C':
-            scout_dm = -1
-        elif self.uwp.starport == 'B':
-            scout_dm = -2
-        elif self.uwp.starport == 'A':
-            scout_dm = -3
-
-        if self.uwp.starport in ['A', 'B', 'C', 'D'] and \
-            (dice.roll(2, 6) + scout_dm) >= 7:
-            self.scout_base = True
-        else:
-            self.scout_base = False
+        self.naval_base, self.scout_base = roll_bases(self.uwp.starport)
 
     def generate_pbg(self):
         """ P = Population Multiplier
             B = Belts (i.e. Planetoid Belts)
             G = Gas Giants """
-
-        # Population multiplier
-        self.population_multiplier = dice.roll(1, 9)
-
-        # Planetoid belts. Using MegaTraveller rules.
-        if dice.roll(2, 6) >= 8:
-            # MT has '13' be 3 belts, but gives no DMs. How do we get to 13?
-            belt_quantity_table = [
-                #   0  1  2  3  4  5  6  7  8  9  10 11 12 13
-                    0, 0, 1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2, 3
-                    ]
-            self.belts = belt_quantity_table[dice.roll(2, 6)]
-        else:
-            self.belts = 0
-
-        # Gas Giants. Again using MegaTraveller rules.
-        if dice.roll(2, 6) >= 5:
-            gas_giant_quantity_table = [
-                #   0  1  2  3  4  5  6  7  8  9  10 11 12
-                    0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 4, 5, 5
-                    ]
-            self.gas_giants = gas_giant_quantity_table[dice.roll(2, 6)]
-        else:
-            self.gas_giants = 0
-
-    def generate(self, maturity, tech_cap):
-        """ Generates all system details"""
+        self.population_multiplier, self.belts, self.gas_giants = roll_pbg()
+
+    def generate(self, maturity, tech_cap, seed = None):
+        """ Generates all system details
+
+        With a seed, every roll comes from this system's own stream,
+        keyed by the seed and its coordinates. """
+        if seed is not None:
+            stream = dice.HexStream(seed, self.coordinates, dice.SYSTEM_STREAM)
+            with dice.rolling_with(stream):
+                self.generate(maturity, tech_cap)
+            return
         self.generate_uwp(maturity, tech_cap)
         self.generate_bases()
         self.generate_pbg()
@@ -97,8 +124,7 @@ class System:
         return ' '
 
     def get_trade_codes_str(self):
-        trade_codes = sorted(self.uwp.get_trade_codes())
-        return " ".join(trade_codes)
+        return trade_codes.mask_to_str(self.uwp.trade_code_mask)
 
     def get_pbg_str(self):
         """ Future proofed against subclasses that have these features """
@@ -0,0 +1,245 @@
+""" Columnar storage for the systems of a space.
+
+A System holds a Uwp which holds a list of trade code strings, which
+adds up to hundreds of bytes per world. A SystemTable instead keeps one
+typed array per field (struct of arrays), at 19 bytes per world, and
+hands out System objects only when asked for them. Whole columns can be
+scanned at once, e.g. for all worlds of a Domain. """
+
+from array import array
+
+import ehex
+import system
+import trade_codes
+import uwp
+
+""" Column name and array typecode. Coordinates are signed so spaces can
+have negative origins. UWP fields (including the starport) are stored as
+ehex values. bases is NAVAL | SCOUT. pbg is the three digits of the PBG
+as a decimal number, e.g. 503, and trade_codes is a trade code mask. """
+columns = [
+        ("x", 'h'),
+        ("y", 'h'),
+        ("starport", 'B'),
+        ("size", 'B'),
+        ("atmosphere", 'B'),
+        ("hydrosphere", 'B'),
+        ("population", 'B'),
+        ("government", 'B'),
+        ("law_level", 'B'),
+        ("tech_level", 'B'),
+        ("bases", 'B'),
+        ("pbg", 'H'),
+        ("trade_codes", 'I')
+        ]
+
+NAVAL = 1
+SCOUT = 2
+
+_base_codes = [' ', 'N', 'S', 'B']
+
+""" The UWP fields trade codes depend on, in the order
+get_trade_code_mask_from_fields takes them """
+_trade_code_fields = ["size", "atmosphere", "hydrosphere", "population",
+                      "government", "law_level", "tech_level"]
+_editable = {name for name, typecode in columns} - {"trade_codes"}
+
+class SystemTable:
+    """ The systems of one space, one array per column.
+
+    Names are not stored as long as they follow the generated pattern
+    '<name_prefix> <n>' for row n-1. Once any other name is added the
+    table switches to keeping a list of names.
+
+    version goes up whenever rows are added or edited, so that text or
+    indexes made from the table are made again. Edit rows with
+    set_field(), which also keeps the trade codes right. Anything writing
+    to the columns or names directly has to call changed() afterwards. """
+
+    def __init__(self, name_prefix = None):
+        self.name_prefix = name_prefix
+        self.names = None
+        self.version = 0
+        for name, typecode in columns:
+            setattr(self, name, array(typecode))
+
+    def __len__(self):
+        return len(self.x)
+
+    def changed(self):
+        """ Records that rows have been edited in place """
+        self.version += 1
+
+    def set_field(self, index, name, value):
+        """ Sets one field of row index, a column name other than
+        trade_codes. The starport is a letter, as append() takes it; bases
+        and pbg are as stored. The row's trade codes are worked out again
+        from its UWP. """
+        if name not in _editable:
+            raise KeyError(f"No editable column '{name}'")
+        if name == "starport":
+            value = ehex.hex_to_int(value)
+        getattr(self, name)[index] = value
+        if name in _trade_code_fields:
+            self.trade_codes[index] = \
+                    trade_codes.get_trade_code_mask_from_fields(
+                        *(getattr(self, field)[index]
+                          for field in _trade_code_fields))
+        self.version += 1
+
+    def bytes_per_world(self):
+        """ Storage cost of one row, not counting stored names """
+        return sum(array(typecode).itemsize for name, typecode in columns)
+
+    def get_name(self, index):
+        if self.names is not None:
+            return self.names[index]
+        return f"{self.name_prefix} {index + 1}"
+
+    def _add_name(self, name):
+        index = len(self)
+        if self.names is None and name != f"{self.name_prefix} {index + 1}":
+            self.names = [self.get_name(i) for i in range(index)]
+        if self.names is not None:
+            self.names.append(name)
+
+    def append(self, name, coordinates, starport, size, atmosphere,
+               hydrosphere, population, government, law_level, tech_level,
+               naval = False, scout = False, population_multiplier = 1,
+               belts = 0, gas_giants = 0):
+        """ Adds a row. starport is a letter, the other UWP fields ints """
+        self.version += 1
+        self._add_name(name)
+        self.x.append(coordinates[0])
+        self.y.append(coordinates[1])
+        self.starport.append(ehex.hex_to_int(starport))
+        self.size.append(size)
+        self.atmosphere.append(atmosphere)
+        self.hydrosphere.append(hydrosphere)
+        self.population.append(population)
+        self.government.append(government)
+        self.law_level.append(law_level)
+        self.tech_level.append(tech_level)
+        self.bases.append((NAVAL if naval else 0) | (SCOUT if scout else 0))
+        self.pbg.append(population_multiplier * 100 + belts * 10 + gas_giants)
+        self.trade_codes.append(trade_codes.get_trade_code_mask_from_fields(
+            size, atmosphere, hydrosphere, population,
+            government, law_level, tech_level))
+
+    def extend(self, rows):
+        """ Adds many rows at once, a column at a time. Each row is a
+        tuple of every argument to append(), in order. """
+        rows = list(rows)
+        if not rows:
+            return
+        self.version += 1
+        names, coordinates, starports, sizes, atmospheres, hydrospheres, \
+                populations, governments, law_levels, tech_levels, \
+                navals, scouts, population_multipliers, belts, \
+                gas_giants = zip(*rows)
+        for name in names:
+            self._add_name(name)
+        self.x.extend([c[0] for c in coordinates])
+        self.y.extend([c[1] for c in coordinates])
+        self.starport.extend(map(ehex.hex_values.__getitem__, starports))
+        self.size.extend(sizes)
+        self.atmosphere.extend(atmospheres)
+        self.hydrosphere.extend(hydrospheres)
+        self.population.extend(populations)
+        self.government.extend(governments)
+        self.law_level.extend(law_levels)
+        self.tech_level.extend(tech_levels)
+        self.bases.extend([(NAVAL if naval else 0) | (SCOUT if scout else 0)
+                           for naval, scout in zip(navals, scouts)])
+        self.pbg.extend([p * 100 + b * 10 + g for p, b, g in
+                         zip(population_multipliers, belts, gas_giants)])
+        self.trade_codes.extend(map(
+            trade_codes.get_trade_code_mask_from_fields,
+            sizes, atmospheres, hydrospheres, populations,
+            governments, law_levels, tech_levels))
+
+    def append_system(self, s):
+        w = s.uwp
+        self.append(s.name, s.coordinates, w.starport, w.size, w.atmosphere,
+                    w.hydrosphere, w.population, w.government,
+                    w.law_level, w.tech_level, s.naval_base, s.scout_base,
+                    s.population_multiplier, s.belts, s.gas_giants)
+
+    @classmethod
+    def from_systems(cls, systems, name_prefix = None):
+        table = cls(name_prefix)
+        for s in systems:
+            table.append_system(s)
+        return table
+
+    @classmethod
+    def concatenate(cls, tables):
+        """ One table holding the rows of all tables, in order """
+        combined = cls()
+        combined.names = []
+        for table in tables:
+            for name, typecode in columns:
+                getattr(combined, name).extend(getattr(table, name))
+            combined.names += [table.get_name(i) for i in range(len(table))]
+        return combined
+
+    def get_uwp_string(self, index):
+        return ehex.int_to_hex(self.starport[index]) + \
+                ehex.int_to_hex(self.size[index]) + \
+                ehex.int_to_hex(self.atmosphere[index]) + \
+                ehex.int_to_hex(self.hydrosphere[index]) + \
+                ehex.int_to_hex(self.population[index]) + \
+                ehex.int_to_hex(self.government[index]) + \
+                ehex.int_to_hex(self.law_level[index]) + "-" + \
+                ehex.int_to_hex(self.tech_level[index])
+
+    def get_system(self, index):
+        """ Materializes row index as a System """
+        bases = self.bases[index]
+        s = system.System(self.get_name(index),
+                          (self.x[index], self.y[index]),
+                          uwp.Uwp.from_fields(
+                              ehex.int_to_hex(self.starport[index]),
+                              self.size[index], self.atmosphere[index],
+                              self.hydrosphere[index],
+                              self.population[index],
+                              self.government[index],
+                              self.law_level[index],
+                              self.tech_level[index]),
+                          bool(bases & NAVAL), bool(bases & SCOUT))
+        pbg = self.pbg[index]
+        s.population_multiplier = pbg // 100
+        s.belts = pbg // 10 % 10
+        s.gas_giants = pbg % 10
+        return s
+
+    def to_systems(self):
+        return [self.get_system(i) for i in range(len(self))]
+
+    def format_row(self, index):
+        """ The .sec line for row index, as System.__str__ gives it """
+        return f"{self.get_name(index):<20}" \
+                f"{self.x[index]:02d}{self.y[index]:02d} " \
+                f"{self.get_uwp_string(index)}  " \
+                f"{_base_codes[self.bases[index]]} " \
+                f"{trade_codes.mask_to_str(self.trade_codes[index]):<20}" \
+                "    " \
+                f"{self.pbg[index]:03d}" \
+                "    "
+
+    def iter_sec_lines(self):
+        for index in range(len(self)):
+            yield self.format_row(index)
+
+    def select(self, predicate, *column_names):
+        """ Indices of rows where predicate(*values of the named columns)
+        is true, e.g. select(lambda pop: pop >= 9, "population") """
+        values = [getattr(self, name) for name in column_names]
+        return [index for index, row in enumerate(zip(*values))
+                if predicate(*row)]
+
+    def with_trade_code(self, code):
+        """ Indices of rows that have the trade code """
+        bit = 1 << trade_codes.codes.index(code)
+        return [index for index, mask in enumerate(self.trade_codes)
+                if mask & bit]
@@ -0,0 +1,281 @@
+""" World Trade Numbers and the trade between worlds.
+
+Following GURPS Traveller: Far Trader, a world's World Trade Number
+(WTN) is half its population code, adjusted for its tech level and then
+for its starport, the starport mattering less the bigger the world
+already is. The Bilateral Trade Number (BTN) of two worlds is the sum
+of their WTNs, plus a bonus for each pair of trade codes that complement
+each other (see complementary_codes), less a modifier that grows with
+the distance between them, and never more than the smaller WTN + 5.
+Each step of BTN is roughly ten times the trade.
+
+Every modifier is a multiple of 0.5, so numbers are kept internally in
+half steps, as small ints. WTNs are worked out a column at a time from
+a SystemTable through a lookup table covering every (population, tech
+level, starport). BTNs are only worked out for pairs that could reach
+min_btn: each world's partners are found with a HexIndex radius search
+out to the furthest distance at which even the best partner would still
+make min_btn (and no further than max_distance), rather than pairing
+every world with every other.
+
+    trade = TradeMap.from_space(domain)
+    routes = trade.routes()         # {"major": [...], "minor": [...]}
+"""
+
+from array import array
+from bisect import bisect_left
+
+import ehex
+import hex_index
+import trade_codes
+
+""" Tech level modifier, in half steps, by the highest tech level it
+applies to """
+_tech_level_steps = [(1, -2), (5, -1), (8, 0), (11, 1), (14, 2)]
+_top_tech_level_modifier = 3
+
+""" Starport modifier in half steps, by the WTN so far: 0-1, 2-3, 4-5,
+6-7, 8-9 and 10 or more """
+starport_modifiers = {
+        "A": [6, 5, 4, 3, 2, 1],
+        "B": [4, 4, 3, 2, 1, 0],
+        "C": [4, 3, 2, 1, 0, -1],
+        "D": [3, 2, 1, 0, -1, -2],
+        "E": [2, 1, 0, -1, -2, -3],
+        "X": [0, 0, -5, -6, -7, -8]
+        }
+
+""" Distance modifier in half steps: up to _distance_limits[i] parsecs
+costs i half steps, and anything further the length of the list """
+_distance_limits = [1, 2, 5, 9, 19, 29, 59, 99, 199, 299, 599, 999]
+
+""" Pairs of trade codes where a world with one trades more with a world
+with the other: each pair found in either direction adds half a step.
+The first two are Far Trader's; rich worlds buying manufactured goods
+is a house rule. """
+complementary_codes = [("Ag", "Na"), ("In", "Ni"), ("Ri", "In")]
+
+""" How far above the smaller WTN a BTN can go, in half steps """
+_btn_cap = 10
+
+MAJOR_BTN = 12.0
+MINOR_BTN = 10.0
+
+""" Far Trader's distance modifier is gentle enough that big worlds
+trade right across a Domain; by default only pairs this close count """
+MAX_DISTANCE = 10
+
+def _tech_level_half_steps(tech_level):
+    for highest, modifier in _tech_level_steps:
+        if tech_level <= highest:
+            return modifier
+    return _top_tech_level_modifier
+
+def tech_level_modifier(tech_level):
+    return _tech_level_half_steps(tech_level) / 2
+
+def _distance_half_steps(distance):
+    return bisect_left(_distance_limits, distance)
+
+def distance_modifier(distance):
+    """ The (negative) BTN modifier for trade over distance parsecs """
+    return -_distance_half_steps(distance) / 2
+
+def _wtn_half_steps(population, tech_level, starport):
+    wtn = population + _tech_level_half_steps(tech_level)
+    column = min(max(wtn, 0) // 4, 5)
+    return max(wtn + starport_modifiers[starport][column], 0)
+
+_levels = len(ehex.hex_table)
+_wtn_table = None
+
+def _get_wtn_table():
+    """ WTN in half steps for every population, tech level and starport,
+    indexed by (population * levels + tech level) * levels + starport
+    (as ehex values), built on first use """
+    global _wtn_table
+    if _wtn_table is None:
+        _wtn_table = array('b', bytes(_levels ** 3))
+        for population in range(_levels):
+            for tech_level in range(_levels):
+                base = (population * _levels + tech_level) * _levels
+                for port in starport_modifiers:
+                    _wtn_table[base + ehex.hex_values[port]] = \
+                            _wtn_half_steps(population, tech_level, port)
+    return _wtn_table
+
+def world_trade_number(uwp):
+    """ The WTN of one Uwp """
+    return _wtn_half_steps(uwp.population, uwp.tech_level, uwp.starport) / 2
+
+def _table_wtn_half_steps(table):
+    wtn_table = _get_wtn_table()
+    levels = _levels
+    return array('b', [wtn_table[(population * levels + tech_level)
+                                 * levels + starport]
+                       for population, tech_level, starport in
+                       zip(table.population, table.tech_level,
+                           table.starport)])
+
+def world_trade_numbers(table):
+    """ The WTN of every row of a SystemTable """
+    return [wtn / 2 for wtn in _table_wtn_half_steps(table)]
+
+def _complement_masks():
+    """ (mask of the first code, mask of the second) for each pair """
+    return [(trade_codes.codes_to_mask([a]), trade_codes.codes_to_mask([b]))
+            for a, b in complementary_codes]
+
+class TradeMap:
+    """ Trade between the systems of a HexIndex (built from a table) """
+
+    def __init__(self, index, min_btn = MINOR_BTN,
+                 max_distance = MAX_DISTANCE):
+        """ min_btn: pairs trading less than this are never looked at
+        max_distance: how far to look, or None for as far as min_btn
+        allows """
+        self.index = index
+        self.table = index.table
+        self.min_btn = min_btn
+        self.max_distance = max_distance
+        self._wtn = _table_wtn_half_steps(self.table)
+        self._complements = _complement_masks()
+        self._pairs = None
+
+    @classmethod
+    def from_space(cls, space, **options):
+        return cls(hex_index.HexIndex.from_space(space), **options)
+
+    def wtn(self, row):
+        return self._wtn[row] / 2
+
+    def _bonus(self, row, other):
+        mask = self.table.trade_codes[row]
+        other_mask = self.table.trade_codes[other]
+        bonus = 0
+        for first, second in self._complements:
+            if (mask & first and other_mask & second) or \
+                    (mask & second and other_mask & first):
+                bonus += 1
+        return bonus
+
+    def _btn_half_steps(self, row, other, distance):
+        wtn = self._wtn[row]
+        other_wtn = self._wtn[other]
+        btn = wtn + other_wtn + self._bonus(row, other) - \
+                _distance_half_steps(distance)
+        return min(btn, min(wtn, other_wtn) + _btn_cap)
+
+    def btn(self, row, other):
+        """ The BTN between two rows """
+        distance = hex_index.distance(self.index.coordinates[row],
+                                      self.index.coordinates[other])
+        return self._btn_half_steps(row, other, distance) / 2
+
+    def _radius(self, wtn, best_wtn):
+        """ The furthest distance a world of wtn (half steps) can trade
+        at min_btn or better with a partner of at most best_wtn """
+        threshold = int(self.min_btn * 2)
+        if wtn + _btn_cap < threshold:
+            return -1
+        # The cap applies after distance, so only the sum limits the range
+        spare = wtn + best_wtn + len(self._complements) - threshold
+        if spare < 0:
+            return -1
+        if spare < len(_distance_limits):
+            radius = _distance_limits[spare]
+        else:
+            # Distance can't stop it: as far as the index reaches
+            min_x, min_y, max_x, max_y = self.index.bounds
+            radius = (max_x - min_x) + (max_y - min_y)
+        if self.max_distance is not None:
+            radius = min(radius, self.max_distance)
+        return radius
+
+    def pairs(self):
+        """ (BTN, distance, row, other row) for every pair of worlds
+        trading at min_btn or better, each pair once, highest BTN first """
+        if self._pairs is not None:
+            return self._pairs
+        wtn = self._wtn
+        best_wtn = max(wtn, default = 0)
+        threshold = int(self.min_btn * 2)
+        coordinates = self.index.coordinates
+        pairs = []
+        for row in range(len(wtn)):
+            radius = self._radius(wtn[row], best_wtn)
+            if radius < 1:
+                continue
+            for distance, other in self.index.within(coordinates[row],
+                                                     radius):
+                # Each pair is found from both ends; keep it from one
+                if other <= row:
+                    continue
+                btn = self._btn_half_steps(row, other, distance)
+                if btn >= threshold:
+                    pairs.append((btn / 2, distance, row, other))
+        pairs.sort(key = lambda pair: (-pair[0], pair[1], pair[2], pair[3]))
+        self._pairs = pairs
+        return pairs
+
+    def routes(self, major = MAJOR_BTN, minor = MINOR_BTN):
+        """ The pairs, split into major (BTN at least major) and minor
+        (at least minor) trade routes """
+        routes = {"major": [], "minor": []}
+        for pair in self.pairs():
+            if pair[0] >= major:
+                routes["major"].append(pair)
+            elif pair[0] >= minor:
+                routes["minor"].append(pair)
+        return routes
+
+    def describe_route(self, pair):
+        btn, distance, row, other = pair
+        return {"btn": btn, "distance": distance,
+                "from": self.table.get_name(row),
+                "to": self.table.get_name(other),
+                "from_coordinates": list(self.index.coordinates[row]),
+                "to_coordinates": list(self.index.coordinates[other])}
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    import space
+
+    parser = argparse.ArgumentParser(
+            description = "Trade routes of a space described by a JSON file")
+    parser.add_argument("filename")
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--major", type = float, default = MAJOR_BTN)
+    parser.add_argument("--minor", type = float, default = MINOR_BTN)
+    parser.add_argument("--max-distance", type = int,
+                        default = MAX_DISTANCE,
+                        help = "Only pair worlds this close, 0 for any "
+                        "distance")
+    parser.add_argument("--output", default = None,
+                        help = "Save the routes as JSON to this file")
+    args = parser.parse_args()
+
+    with open(args.filename) as fp:
+        descriptor = json.load(fp)
+    if args.seed is not None:
+        descriptor["Seed"] = args.seed
+    s = space.create_space_from_dict(descriptor)
+    s.generate()
+    start = time.perf_counter()
+    trade = TradeMap.from_space(s, min_btn = args.minor,
+                                max_distance = args.max_distance or None)
+    routes = trade.routes(args.major, args.minor)
+    seconds = time.perf_counter() - start
+    print(f"{len(trade.table)} worlds, {len(routes['major'])} major and "
+          f"{len(routes['minor'])} minor routes in {seconds:.2f}s")
+    for pair in routes["major"][:20]:
+        route = trade.describe_route(pair)
+        print(f"  {route['btn']:>4}  {route['from']} - {route['to']} "
+              f"({route['distance']} pc)")
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump({kind: [trade.describe_route(pair) for pair in pairs]
+                       for kind, pairs in routes.items()}, fp, indent = 4)
@@ -1,5 +1,9 @@
 """ Gets trade codes from a given UWP string """
 
+import sys
+from array import array
+from functools import lru_cache
+
 import ehex
 
 """ We're going to use these as indexes into the UWP string. """
@@ -12,155 +16,144 @@ GOV = 5
 LAW = 6
 TECH = 8
 
-def _get_is_agricultural(uwp):
-    if uwp[ATMO] in ['4', '5', '6', '7', '8', '9'] and \
-            uwp[HYDRO] in ['4', '5', '6', '7', '8'] and \
-            uwp[POP] in ['5', '6', '7']:
-                return True
-    return False
-
-def _get_is_asteroid(uwp):
-    if uwp[SIZE] == '0' and \
-            uwp[ATMO] == '0' and \
-            uwp[HYDRO] == '0':
-                return True
-    return False
-
-def _get_is_barren(uwp):
-    if uwp[POP] == '0' and \
-            uwp[GOV] == '0' and \
-            uwp[LAW] == '0':
-                return True
-    return False
-
-def _get_is_desert(uwp):
-    if uwp[ATMO] not in ['0', '1'] and \
-            uwp[HYDRO] == '0':
-                return True
-    return False
-
-def _get_is_fluid_oceans(uwp):
-    if uwp[ATMO] not in ['0', '1', '2', '3', '4', '5', '6', '7', '8', '9'] and \
-            uwp[HYDRO] != '0':
-                return True
-    return False
-
-def _get_is_garden(uwp):
-    if uwp[SIZE] in ['6', '7', '8'] and \
-            uwp[ATMO] in ['5', '6', '8'] and \
-            uwp[HYDRO] in ['5', '6', '7']:
-                return True
-    return False
-
-def _get_is_high_population(uwp):
-    if ehex.greater_than_or_equal_to(uwp[POP], '9'):
-        return True
-    return False
-
-def _get_is_high_tech(uwp):
-    if ehex.greater_than_or_equal_to(uwp[TECH], 'C'):
-        return True
-    return False
-
-def _get_is_ice_capped(uwp):
-    if uwp[ATMO] in ['0', '1'] and \
-            uwp[HYDRO] != '0':
-                return True
-    return False
-
-def _get_is_industrial(uwp):
-    if _get_is_high_population(uwp) and \
-            uwp[ATMO] in ['0', '1', '2', '4', '7', '9']:
-                return True
-    return False
-
-def _get_is_low_population(uwp):
-    if uwp[POP] in ['0', '1', '2', '3']:
-        return True
-    return False
-
-def _get_is_low_tech(uwp):
-    if uwp[TECH] in ['0', '1', '2', '3']:
-        return True
-    return False
-
-def _get_is_non_agricultural(uwp):
-    if uwp[ATMO] in ['0', '1', '2', '3'] and \
-            uwp[HYDRO] in ['0', '1', '2', '3'] and \
-            ehex.greater_than_or_equal_to(uwp[POP], '6'):
-                return True
-    return False
-
-def _get_is_non_industrial(uwp):
-    if uwp[POP] in ['0', '1', '2', '3', '4', '5', '6']:
-        return True
-    return False
-
-def _get_is_poor(uwp):
-    if uwp[ATMO] in ['2', '3', '4', '5'] and \
-            uwp[HYDRO] in ['0', '1', '2', '3']:
-                return True
-    return False
-
-def _get_is_rich(uwp):
-    if uwp[ATMO] in ['6', '8'] and \
-            uwp[POP] in ['6', '7', '8'] and \
-            uwp[GOV] in ['4', '5', '6', '7', '8', '9']:
-                return True
-    return False
-
-def _get_is_vacuum(uwp):
-    if uwp[ATMO] == '0':
-        return True
-    return False
-
-def _get_is_water_world(uwp):
-    if uwp[HYDRO] == 'A':
-        return True
-    return False
-
-
-trade_code_queries = [
-    {"check": _get_is_agricultural,     "code": "Ag"},
-    {"check": _get_is_asteroid,         "code": "As"},
-    {"check": _get_is_barren,           "code": "Ba"},
-    {"check": _get_is_desert,           "code": "De"},
-    {"check": _get_is_fluid_oceans,     "code": "Fl"},
-    {"check": _get_is_garden,           "code": "Ga"},
-    {"check": _get_is_high_population,  "code": "Hi"},
-    {"check": _get_is_high_tech,        "code": "Ht"},
-    {"check": _get_is_ice_capped,       "code": "Ic"},
-    {"check": _get_is_industrial,       "code": "In"},
-    {"check": _get_is_low_population,   "code": "Lo"},
-    {"check": _get_is_low_tech,         "code": "Lt"},
-    {"check": _get_is_non_agricultural, "code": "Na"},
-    {"check": _get_is_non_industrial,   "code": "Ni"},
-    {"check": _get_is_poor,             "code": "Po"},
-    {"check": _get_is_rich,             "code": "Ri"},
-    {"check": _get_is_vacuum,           "code": "Va"},
-    {"check": _get_is_water_world,      "code": "Wa"}
+""" Every trade code is a set of conditions on individual UWP fields, all
+of which must hold. Fields that aren't mentioned can take any value.
+Values are ehex ints, so e.g. range(9, 36) is '9' or greater. """
+ANY = range(len(ehex.hex_table))
+
+trade_code_requirements = [
+    ("Ag", {ATMO: range(4, 10), HYDRO: range(4, 9), POP: range(5, 8)}),
+    ("As", {SIZE: [0], ATMO: [0], HYDRO: [0]}),
+    ("Ba", {POP: [0], GOV: [0], LAW: [0]}),
+    ("De", {ATMO: range(2, 36), HYDRO: [0]}),
+    ("Fl", {ATMO: range(10, 36), HYDRO: range(1, 36)}),
+    ("Ga", {SIZE: range(6, 9), ATMO: [5, 6, 8], HYDRO: range(5, 8)}),
+    ("Hi", {POP: range(9, 36)}),
+    ("Ht", {TECH: range(12, 36)}),
+    ("Ic", {ATMO: [0, 1], HYDRO: range(1, 36)}),
+    ("In", {POP: range(9, 36), ATMO: [0, 1, 2, 4, 7, 9]}),
+    ("Lo", {POP: range(0, 4)}),
+    ("Lt", {TECH: range(0, 4)}),
+    ("Na", {ATMO: range(0, 4), HYDRO: range(0, 4), POP: range(6, 36)}),
+    ("Ni", {POP: range(0, 7)}),
+    ("Po", {ATMO: range(2, 6), HYDRO: range(0, 4)}),
+    ("Ri", {ATMO: [6, 8], POP: range(6, 9), GOV: range(4, 10)}),
+    ("Va", {ATMO: [0]}),
+    ("Wa", {HYDRO: [0xA]})
 ]
 
+""" Trade code i is bit i of a trade code mask """
+codes = [code for code, requirements in trade_code_requirements]
+ALL_CODES = (1 << len(codes)) - 1
+
+fields = [SIZE, ATMO, HYDRO, POP, GOV, LAW, TECH]
+
+def _build_field_masks():
+    """ For each field, a table from value to the mask of trade codes
+    that are still possible with the field at that value. A world's
+    trade codes are then the AND of one entry from each table. """
+    field_masks = {}
+    for field in fields:
+        masks = [ALL_CODES] * len(ANY)
+        for bit, (code, requirements) in enumerate(trade_code_requirements):
+            if field in requirements:
+                for value in ANY:
+                    if value not in requirements[field]:
+                        masks[value] &= ~(1 << bit)
+        field_masks[field] = masks
+    return field_masks
+
+field_masks = _build_field_masks()
+
+# The same tables keyed by the ehex character, for UWP strings
+field_masks_by_char = {
+        field: {ehex.int_to_hex(value): mask
+                for value, mask in enumerate(masks)}
+        for field, masks in field_masks.items()}
+
+_size_masks = field_masks_by_char[SIZE]
+_atmo_masks = field_masks_by_char[ATMO]
+_hydro_masks = field_masks_by_char[HYDRO]
+_pop_masks = field_masks_by_char[POP]
+_gov_masks = field_masks_by_char[GOV]
+_law_masks = field_masks_by_char[LAW]
+_tech_masks = field_masks_by_char[TECH]
+
+def get_trade_code_mask(uwp):
+    """ Trade code mask from a (valid) UWP string """
+    return _size_masks[uwp[SIZE]] & \
+            _atmo_masks[uwp[ATMO]] & \
+            _hydro_masks[uwp[HYDRO]] & \
+            _pop_masks[uwp[POP]] & \
+            _gov_masks[uwp[GOV]] & \
+            _law_masks[uwp[LAW]] & \
+            _tech_masks[uwp[TECH]]
+
+def get_trade_code_mask_from_fields(size, atmosphere, hydrosphere,
+                                    population, government, law_level,
+                                    tech_level):
+    """ Trade code mask from UWP field values as ints """
+    return field_masks[SIZE][size] & \
+            field_masks[ATMO][atmosphere] & \
+            field_masks[HYDRO][hydrosphere] & \
+            field_masks[POP][population] & \
+            field_masks[GOV][government] & \
+            field_masks[LAW][law_level] & \
+            field_masks[TECH][tech_level]
+
+""" For batches, each field's masks split into byte planes: translate
+tables from an ehex value to byte 0, 1 or 2 of its mask. Values off the
+end of the ehex table allow no trade codes. """
+_plane_count = (len(codes) + 7) // 8
+_field_planes = {
+        field: [bytes((masks[value] >> 8 * plane) & 0xFF
+                      if value < len(masks) else 0 for value in range(256))
+                for plane in range(_plane_count)]
+        for field, masks in field_masks.items()}
+
+# Column of each field in a matrix of packed UWP fields
+_matrix_columns = {SIZE: 1, ATMO: 2, HYDRO: 3, POP: 4, GOV: 5, LAW: 6,
+                   TECH: 7}
+
+def get_trade_code_masks(matrix):
+    """ The trade code masks of every row of a UWP matrix (see
+    uwp.to_matrix) as an array('I').
+
+    Each field's column is translated into each byte plane of its masks
+    and the planes of all fields are ANDed together as big ints, so the
+    work is done a column at a time rather than a world at a time. """
+    data = bytes(matrix)
+    n = len(data) // 8
+    interleaved = bytearray(4 * n)
+    for plane in range(_plane_count):
+        combined = -1
+        for field, column in _matrix_columns.items():
+            combined &= int.from_bytes(
+                    data[column::8].translate(_field_planes[field][plane]),
+                    "little")
+        interleaved[plane::4] = combined.to_bytes(n, "little")
+    masks = array('I')
+    masks.frombytes(interleaved)
+    if sys.byteorder == "big":
+        masks.byteswap()
+    return masks
+
+@lru_cache(maxsize=None)
+def mask_to_codes(mask):
+    """ The trade codes in a mask, as a tuple """
+    return tuple(code for bit, code in enumerate(codes) if mask & (1 << bit))
+
+@lru_cache(maxsize=None)
+def mask_to_str(mask):
+    """ The trade codes in a mask, sorted and space separated """
+    return " ".join(sorted(mask_to_codes(mask)))
+
+def codes_to_mask(trade_codes):
+    """ The mask for a list of trade code strings """
+    mask = 0
+    for code in trade_codes:
+        mask |= 1 << codes.index(code)
+    return mask
 
 def get_trade_codes(uwp):
-    trade_codes = []
-    for query in trade_code_queries:
-        if query["check"](uwp):
-            trade_codes.append(query["code"])
-    return trade_codes
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+    return list(mask_to_codes(get_trade_code_mask(uwp)))
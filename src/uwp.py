@@ -1,12 +1,18 @@
 """ Script for dealing with UWPs """
 
+import re
+import sys
+from array import array
+from functools import total_ordering
+
 import dice
 import ehex
 import uwp_generator
 import trade_codes
 
-def check_is_uwp_string_valid(uwp_string):
-    """ Checks if this is a well formed uwp_string with sane values
+def get_uwp_string_error(uwp_string):
+    """ Checks if this is a well formed uwp_string with sane values,
+    returning None if so, or else what is wrong with it.
 
         A valid UWP is of the form S123456-7 where
         S indicates Starport and can be A,B,C,D,E or X
@@ -15,63 +21,301 @@ def check_is_uwp_string_valid(uwp_string):
         be present. """
 
     if len(uwp_string) != 9:
-        print(f"uwp_string '{uwp_string}' incorrect length:" \
-                f"{len(uwp_string)}")
-        return False
+        return f"uwp_string '{uwp_string}' incorrect length:" \
+                f"{len(uwp_string)}"
 
     if uwp_string[-2] != '-':
-        print(f"uwp_string '{uwp_string}' second last character" \
-                f"is not '-': '{uwp_string[-2]}'")
-        return False
+        return f"uwp_string '{uwp_string}' second last character" \
+                f"is not '-': '{uwp_string[-2]}'"
 
     if uwp_string[0] not in ['A', 'B', 'C', 'D', 'E', 'X']:
-        print(f"uwp_string '{uwp_string}' invalid starport: {uwp_string[0]}")
-        return False
+        return f"uwp_string '{uwp_string}' invalid starport: {uwp_string[0]}"
 
     hexvalues = uwp_string[1:-2] + uwp_string[-1]
 
     for hexvalue in hexvalues:
         if not ehex.is_valid(hexvalue):
-            print(f"In uwp_string '{uwp_string}' Found character that is" \
-                    f" not a hex value: '{hexvalue}'")
-            return False
+            return f"In uwp_string '{uwp_string}' Found character that is" \
+                    f" not a hex value: '{hexvalue}'"
+
+    return None
 
+def check_is_uwp_string_valid(uwp_string):
+    """ As get_uwp_string_error, but prints the problem and returns
+    whether the string is valid """
+    error = get_uwp_string_error(uwp_string)
+    if error:
+        print(error)
+        return False
     return True
 
+""" Packed UWPs.
+
+A UWP packs into one int: eight bytes, starport first and tech level
+last, each byte the ehex value of that field (the starport included, so
+'A' is 10 and 'X' is 33). Any field is a shift and a mask away, and as
+the ehex table is in ASCII order, packed UWPs sort exactly as their
+strings do. Arrays of them are array('Q'), 8 bytes per world. """
+
+packed_fields = ["starport", "size", "atmosphere", "hydrosphere",
+                 "population", "government", "law_level", "tech_level"]
+
+packed_shifts = {field: 8 * (7 - i) for i, field in enumerate(packed_fields)}
+
+# bytes.translate tables between UWP characters and ehex values
+_to_ehex_bytes = bytes(ehex.hex_values.get(chr(c), 0xFF) for c in range(256))
+_from_ehex_bytes = bytes(ord(ehex.hex_table[c]) if c < len(ehex.hex_table)
+                         else ord('?') for c in range(256))
+
+def pack(starport, size, atmosphere, hydrosphere,
+         population, government, law_level, tech_level):
+    """ Packs UWP fields, starport as a letter, into an int """
+    return ehex.hex_values[starport] << 56 | size << 48 | \
+            atmosphere << 40 | hydrosphere << 32 | population << 24 | \
+            government << 16 | law_level << 8 | tech_level
+
+def pack_string(uwp_string):
+    """ Packs a (valid) UWP string into an int """
+    return int.from_bytes(
+            uwp_string.encode("ascii").translate(_to_ehex_bytes, b"-"), "big")
+
+def unpack(packed):
+    """ The fields of a packed UWP, starport as a letter, as a tuple """
+    fields = packed.to_bytes(8, "big")
+    return (ehex.hex_table[fields[0]],) + tuple(fields[1:])
+
+def unpack_string(packed):
+    """ The UWP string of a packed UWP """
+    chars = packed.to_bytes(8, "big").translate(_from_ehex_bytes).decode("ascii")
+    return chars[:7] + "-" + chars[7]
+
+def get_field(packed, field):
+    """ One field of a packed UWP as its ehex value, e.g.
+    get_field(packed, "tech_level") >= 0xC """
+    return (packed >> packed_shifts[field]) & 0xFF
+
+def _to_field_bytes(uwp_strings):
+    """ The ehex values of every field of every (valid) UWP string, 8
+    bytes per UWP, from a single translate over the joined strings """
+    joined = "".join(uwp_strings).encode("ascii")
+    if len(joined) != 9 * len(uwp_strings):
+        raise ValueError("UWP strings must be 9 characters long")
+    return joined.translate(_to_ehex_bytes, b"-")
+
+def pack_many(uwp_strings):
+    """ Packs a sequence of (valid) UWP strings into an array('Q'). The
+    whole batch is converted with a single translate over the joined
+    strings rather than string by string. """
+    packed = array('Q')
+    packed.frombytes(_to_field_bytes(uwp_strings))
+    if sys.byteorder == "little":
+        packed.byteswap()
+    return packed
+
+def unpack_many(packed):
+    """ The UWP strings for an array('Q') of packed UWPs """
+    big_endian = array('Q', packed)
+    if sys.byteorder == "little":
+        big_endian.byteswap()
+    fields = big_endian.tobytes().translate(_from_ehex_bytes)
+    n = len(big_endian)
+    chars = bytearray(9 * n)
+    for i in range(7):
+        chars[i::9] = fields[i::8]
+    chars[7::9] = b"-" * n
+    chars[8::9] = fields[7::8]
+    text = chars.decode("ascii")
+    return [text[i:i + 9] for i in range(0, 9 * n, 9)]
+
+""" UWP matrices.
+
+to_matrix() turns UWP strings into an N x 8 memoryview of bytes, row i
+holding the ehex values of UWP i in packed_fields order, so matrix[i, 7]
+is its tech level. Field j of every row is the column
+matrix.obj[j::8], which is what the batch functions here and
+trade_codes.get_trade_code_masks work on. """
+
+_bad_starport_bytes = bytes(0 if chr(c) in "ABCDEX" else 1 for c in range(256))
+_bad_hex_bytes = bytes(0 if chr(c) in ehex.hex_values else 1
+                       for c in range(256))
+_bad_dash_bytes = bytes(0 if chr(c) == "-" else 1 for c in range(256))
+_bad_row = re.compile(b"[^\x00]")
+
+def to_matrix(uwp_strings):
+    """ An N x 8 memoryview of the fields of (valid) UWP strings """
+    fields = bytearray(_to_field_bytes(uwp_strings))
+    if not fields:
+        # memoryview can't take a shape of (0, 8)
+        return memoryview(fields)
+    return memoryview(fields).cast('B', (len(uwp_strings), 8))
+
+def from_matrix(matrix):
+    """ The UWP strings for the rows of a matrix from to_matrix(), or of
+    any bytes holding 8 field values per UWP """
+    fields = bytes(matrix).translate(_from_ehex_bytes)
+    n = len(fields) // 8
+    chars = bytearray(9 * n)
+    for i in range(7):
+        chars[i::9] = fields[i::8]
+    chars[7::9] = b"-" * n
+    chars[8::9] = fields[7::8]
+    text = chars.decode("ascii")
+    return [text[i:i + 9] for i in range(0, 9 * n, 9)]
+
+def find_invalid(uwp_strings):
+    """ Indices of the strings that get_uwp_string_error would reject,
+    checked a column at a time across the whole batch """
+    uwp_strings = list(uwp_strings)
+    bad = [i for i, length in enumerate(map(len, uwp_strings))
+           if length != 9]
+    if bad:
+        wrong_length = set(bad)
+        rows = [i for i in range(len(uwp_strings)) if i not in wrong_length]
+        checked = [uwp_strings[i] for i in rows]
+    else:
+        rows = None
+        checked = uwp_strings
+    n = len(checked)
+    if not n:
+        return bad
+
+    chars = "".join(checked).encode("ascii", "replace")
+    flags = int.from_bytes(chars[0::9].translate(_bad_starport_bytes), "big")
+    flags |= int.from_bytes(chars[7::9].translate(_bad_dash_bytes), "big")
+    for i in (1, 2, 3, 4, 5, 6, 8):
+        flags |= int.from_bytes(chars[i::9].translate(_bad_hex_bytes), "big")
+    found = [match.start() for match in
+             _bad_row.finditer(flags.to_bytes(n, "big"))]
+    if rows is not None:
+        found = [rows[i] for i in found]
+    return sorted(bad + found)
+
+@total_ordering
 class Uwp:
+    """ A world's UWP.
+
+    Uwp(string) validates and parses a UWP string, and Uwp() generates a
+    new world. Uwp.from_fields() makes one straight from field values
+    already known to be good, such as the generator's or a SystemTable's,
+    skipping both the string and the validation. The string and trade
+    codes are only worked out when first asked for. """
+
+    fields = ("starport", "size", "atmosphere", "hydrosphere",
+              "population", "government", "law_level", "tech_level")
+
+    __slots__ = fields + ("_string", "_trade_code_mask")
 
     def __init__(self, uwp_string = None, maturity = "Standard", tech_cap = None):
         """ Creates the world from a given UWP, or generates a new one """
         if not uwp_string:
-            uwp_string = uwp_generator.generate_uwp(maturity, tech_cap)
+            self._set_fields(*uwp_generator.generate_uwp_fields(
+                maturity = maturity, tech_cap = tech_cap))
+            return
 
         if not check_is_uwp_string_valid(uwp_string):
             raise ValueError
 
-        self.starport = uwp_string[0]
-        self.size = ehex.hex_to_int(uwp_string[1])
-        self.atmosphere = ehex.hex_to_int(uwp_string[2])
-        self.hydrosphere = ehex.hex_to_int(uwp_string[3])
-        self.population = ehex.hex_to_int(uwp_string[4])
-        self.government = ehex.hex_to_int(uwp_string[5])
-        self.law_level = ehex.hex_to_int(uwp_string[6])
-        self.tech_level = ehex.hex_to_int(uwp_string[8])
+        hex_values = ehex.hex_values
+        self._set_fields(uwp_string[0],
+                         hex_values[uwp_string[1]],
+                         hex_values[uwp_string[2]],
+                         hex_values[uwp_string[3]],
+                         hex_values[uwp_string[4]],
+                         hex_values[uwp_string[5]],
+                         hex_values[uwp_string[6]],
+                         hex_values[uwp_string[8]])
+        self._string = uwp_string
+
+    def _set_fields(self, starport, size, atmosphere, hydrosphere,
+                    population, government, law_level, tech_level):
+        # Straight into the slots, past __setattr__
+        set_slot = object.__setattr__
+        set_slot(self, "starport", starport)
+        set_slot(self, "size", size)
+        set_slot(self, "atmosphere", atmosphere)
+        set_slot(self, "hydrosphere", hydrosphere)
+        set_slot(self, "population", population)
+        set_slot(self, "government", government)
+        set_slot(self, "law_level", law_level)
+        set_slot(self, "tech_level", tech_level)
+        set_slot(self, "_string", None)
+        set_slot(self, "_trade_code_mask", None)
 
-        self.trade_codes = trade_codes.get_trade_codes(uwp_string)
+    def __setattr__(self, name, value):
+        """ Changing a field forgets the string and trade codes worked
+        out from the old one """
+        object.__setattr__(self, name, value)
+        if name in _field_names:
+            object.__setattr__(self, "_string", None)
+            object.__setattr__(self, "_trade_code_mask", None)
+
+    @classmethod
+    def from_fields(cls, starport, size, atmosphere, hydrosphere,
+                    population, government, law_level, tech_level):
+        """ A Uwp from trusted field values: starport as a letter, the
+        rest as ints. Nothing is checked. """
+        w = cls.__new__(cls)
+        w._set_fields(starport, size, atmosphere, hydrosphere,
+                      population, government, law_level, tech_level)
+        return w
 
     def __str__(self):
-        return self.starport + \
-                ehex.int_to_hex(self.size) + \
-                ehex.int_to_hex(self.atmosphere) + \
-                ehex.int_to_hex(self.hydrosphere) + \
-                ehex.int_to_hex(self.population) + \
-                ehex.int_to_hex(self.government) + \
-                ehex.int_to_hex(self.law_level) + "-" +\
-                ehex.int_to_hex(self.tech_level)
+        if self._string is None:
+            self._string = self.starport + \
+                    ehex.int_to_hex(self.size) + \
+                    ehex.int_to_hex(self.atmosphere) + \
+                    ehex.int_to_hex(self.hydrosphere) + \
+                    ehex.int_to_hex(self.population) + \
+                    ehex.int_to_hex(self.government) + \
+                    ehex.int_to_hex(self.law_level) + "-" +\
+                    ehex.int_to_hex(self.tech_level)
+        return self._string
+
+    @property
+    def trade_code_mask(self):
+        if self._trade_code_mask is None:
+            self._trade_code_mask = \
+                    trade_codes.get_trade_code_mask_from_fields(
+                            self.size, self.atmosphere, self.hydrosphere,
+                            self.population, self.government,
+                            self.law_level, self.tech_level)
+        return self._trade_code_mask
+
+    @property
+    def trade_codes(self):
+        return list(trade_codes.mask_to_codes(self.trade_code_mask))
 
     def get_trade_codes(self):
         return self.trade_codes
 
+    @property
+    def packed(self):
+        return pack(self.starport, self.size, self.atmosphere,
+                    self.hydrosphere, self.population, self.government,
+                    self.law_level, self.tech_level)
+
+    @classmethod
+    def from_packed(cls, packed):
+        return cls.from_fields(*unpack(packed))
+
+    """ Uwps compare, order and hash by their packed value, so they can
+    be used as dict keys and in sets """
+
+    def __eq__(self, other):
+        if not isinstance(other, Uwp):
+            return NotImplemented
+        return self.packed == other.packed
+
+    def __lt__(self, other):
+        if not isinstance(other, Uwp):
+            return NotImplemented
+        return self.packed < other.packed
+
+    def __hash__(self):
+        return hash(self.packed)
+
+_field_names = frozenset(Uwp.fields)
+
 if __name__ == "__main__":
 
     for i in range(80):
@@ -16,11 +16,19 @@ starport_tables = {     # 0   1   2   3   4   5   6   7   8   9   10  11  12
         "Cluster":      ['X','X','X','E','D','D','C','C','B','B','A','A','A']
         }
 
+""" Each _generate_* function rolls its dice and hands the result to the
+matching _*_from_roll function, which applies the DMs and clamps. Keeping
+the rules apart from the rolling lets generate_uwp_batch apply exactly
+the same rules to whole columns of pre-rolled dice. """
+
+def _size_from_roll(roll):
+    return roll - 2
+
 def _generate_size():
-    return dice.roll(2, 6) - 2
+    return _size_from_roll(dice.roll(2, 6))
 
-def _generate_atmosphere(size, space_opera):
-    atmo = dice.roll(2, 6) + size - 7
+def _atmosphere_from_roll(roll, size, space_opera):
+    atmo = roll + size - 7
     if atmo < 0:
         return 0
 
@@ -36,8 +44,10 @@ def _generate_atmosphere(size, space_opera):
                 return 0xA            
     return atmo
 
-def _generate_temperature(atmosphere):
-    """ temperature is not part of the UWP but used as a modifier """
+def _generate_atmosphere(size, space_opera):
+    return _atmosphere_from_roll(dice.roll(2, 6), size, space_opera)
+
+def _temperature_from_roll(roll, atmosphere):
     if atmosphere in [2, 3]:
         dm = -2
     elif atmosphere in [4, 5, 0xE]:
@@ -51,7 +61,7 @@ def _generate_temperature(atmosphere):
     else:
         dm = 0
 
-    temp_roll = dice.roll(2, 6) + dm
+    temp_roll = roll + dm
     if temp_roll <= 2:
         return "Frozen"
     if temp_roll <= 4:
@@ -62,7 +72,11 @@ def _generate_temperature(atmosphere):
         return "Hot"
     return "Boiling"
 
-def _generate_hydrosphere(size, atmosphere, temperature, space_opera):
+def _generate_temperature(atmosphere):
+    """ temperature is not part of the UWP but used as a modifier """
+    return _temperature_from_roll(dice.roll(2, 6), atmosphere)
+
+def _hydrosphere_from_roll(roll, size, atmosphere, temperature, space_opera):
     dm = 0
 
     if size == 0 or size == 1:
@@ -85,7 +99,7 @@ def _generate_hydrosphere(size, atmosphere, temperature, space_opera):
         if atmosphere in [2, 3, 0xB, 0xC]:
             dm -= 4
 
-    hydro = dice.roll(2, 6) - 7 + size + dm
+    hydro = roll - 7 + size + dm
 
     if hydro < 0:
         return 0
@@ -93,7 +107,11 @@ def _generate_hydrosphere(size, atmosphere, temperature, space_opera):
         return 0xA
     return hydro
 
-def _generate_population(size, atmosphere, hard_science):
+def _generate_hydrosphere(size, atmosphere, temperature, space_opera):
+    return _hydrosphere_from_roll(dice.roll(2, 6), size, atmosphere,
+                                  temperature, space_opera)
+
+def _population_from_roll(roll, size, atmosphere, hard_science):
     dm = 0
     if hard_science:
         if size <= 2 or size >= 0xA:
@@ -102,33 +120,46 @@ def _generate_population(size, atmosphere, hard_science):
             dm += 1
         else:
             dm -= 1
-    pop = dice.roll(2, 6) + dm
+    pop = roll + dm
     if pop < 0:
         return 0
     if pop > 0xA:
         return 0xA
     return pop
 
-def _generate_government(population):
+def _generate_population(size, atmosphere, hard_science):
+    return _population_from_roll(dice.roll(2, 6), size,
+                                 atmosphere, hard_science)
+
+def _government_from_roll(roll, population):
     if population == 0:
         return 0
 
-    gov = dice.roll(2, 6) - 7 + population
+    gov = roll - 7 + population
     if gov < 0:
         return 0
     return gov
 
+def _generate_government(population):
+    if population == 0:
+        return 0
+    return _government_from_roll(dice.roll(2, 6), population)
 
-def _generate_law_level(population, government):
+def _law_level_from_roll(roll, population, government):
     if population == 0:
         return 0
 
-    law = dice.roll(2, 6) - 7 + government
+    law = roll - 7 + government
     if law < 0:
         return 0
     return law
 
-def _generate_starport(population, hard_science, maturity):
+def _generate_law_level(population, government):
+    if population == 0:
+        return 0
+    return _law_level_from_roll(dice.roll(2, 6), population, government)
+
+def _starport_from_roll(roll, population, hard_science, maturity):
 
     # MGT2e already has modifiers for starport based on population,
     # if much more subtle than pop-7. This result ends up in huge
@@ -154,13 +185,19 @@ def _generate_starport(population, hard_science, maturity):
         elif population >= 8:
             dm = 1
 
-    port_lookup = dice.roll(2, 6) + dm
+    port_lookup = roll + dm
     if port_lookup >= len(starport_table):
         return 'A'
     if port_lookup < 0:
         port_lookup = 0
     return starport_table[port_lookup]
 
+def _generate_starport(population, hard_science, maturity):
+    if population == 0:
+        return 'X'
+    return _starport_from_roll(dice.roll(2, 6), population,
+                               hard_science, maturity)
+
 def _get_starport_tech_dm(starport):
     if starport == 'X':
         return -4
@@ -209,12 +246,8 @@ def _get_government_tech_dm(government):
         return -2
     return 0
 
-def _generate_tech_level(starport, size, atmosphere,hydrosphere,
-                         population, government, tech_cap):
-
-    if population == 0:
-        return 0
-
+def _get_tech_dm(starport, size, atmosphere, hydrosphere,
+                 population, government):
     dm = 0
     dm += _get_starport_tech_dm(starport)
     dm += _get_size_tech_dm(size)
@@ -222,22 +255,56 @@ def _generate_tech_level(starport, size, atmosphere,hydrosphere,
     dm += _get_hydrosphere_tech_dm(hydrosphere)
     dm += _get_population_tech_dm(population)
     dm += _get_government_tech_dm(government)
+    return dm
 
+def _get_tech_die(dm, tech_cap):
+    """ Sides of the die rolled for tech level. 0 means no roll is
+    made: the world is already past the cap and gets dm + 1. """
     if tech_cap and dm+1 > tech_cap:
-        return dm + 1
+        return 0
     elif tech_cap and dm+6 > tech_cap:
-        diff = tech_cap - dm
-        tech = dice.roll(1, diff) + dm
-    else:
-        tech = dice.roll(1, 6) + dm
+        return tech_cap - dm
+    return 6
+
+def _tech_level_from_roll(roll, dm, sides):
+    if not sides:
+        return dm + 1
+    tech = roll + dm
     if tech < 0:
         return 0
     return tech
 
-def generate_uwp(space_opera = True, 
-                 hard_science = True, 
-                 maturity = "Standard",
-                 tech_cap = None):
+def _generate_tech_level(starport, size, atmosphere,hydrosphere,
+                         population, government, tech_cap):
+
+    if population == 0:
+        return 0
+
+    dm = _get_tech_dm(starport, size, atmosphere, hydrosphere,
+                      population, government)
+    sides = _get_tech_die(dm, tech_cap)
+    if not sides:
+        return _tech_level_from_roll(0, dm, sides)
+    return _tech_level_from_roll(dice.roll(1, sides), dm, sides)
+
+def format_uwp(starport, size, atmosphere, hydrosphere,
+               population, government, law_level, tech_level):
+    """ Formats UWP fields as a UWP string, e.g. A788899-C """
+    return f"{starport}" \
+          f"{ehex.int_to_hex(size)}" \
+          f"{ehex.int_to_hex(atmosphere)}" \
+          f"{ehex.int_to_hex(hydrosphere)}" \
+          f"{ehex.int_to_hex(population)}" \
+          f"{ehex.int_to_hex(government)}" \
+          f"{ehex.int_to_hex(law_level)}-" \
+          f"{ehex.int_to_hex(tech_level)}"
+
+def generate_uwp_fields(space_opera = True,
+                        hard_science = True,
+                        maturity = "Standard",
+                        tech_cap = None):
+    """ As generate_uwp, but returns the fields in UWP order (starport
+    as a letter, the rest as ints) instead of formatting them """
     size = _generate_size()
     atmosphere = _generate_atmosphere(size, space_opera)
     temperature = _generate_temperature(atmosphere)
@@ -251,16 +318,122 @@ def generate_uwp(space_opera = True,
             starport, size, atmosphere, hydrosphere, 
             population, government, tech_cap)
 
-    uwp = f"{starport}" \
-          f"{ehex.int_to_hex(size)}" \
-          f"{ehex.int_to_hex(atmosphere)}" \
-          f"{ehex.int_to_hex(hydrosphere)}" \
-          f"{ehex.int_to_hex(population)}" \
-          f"{ehex.int_to_hex(government)}" \
-          f"{ehex.int_to_hex(law_level)}-" \
-          f"{ehex.int_to_hex(tech_level)}"
+    return (starport, size, atmosphere, hydrosphere,
+            population, government, law_level, tech_level)
 
-    return uwp
+def generate_uwp(space_opera = True, 
+                 hard_science = True, 
+                 maturity = "Standard",
+                 tech_cap = None):
+    return format_uwp(*generate_uwp_fields(space_opera, hard_science,
+                                           maturity, tech_cap))
+
+def generate_uwp_batch(n,
+                       space_opera = True,
+                       hard_science = True,
+                       maturity = "Standard",
+                       tech_cap = None):
+    """ Generates n UWPs at once, returned as a dict of columns.
+
+    Each column is a list of n values, so row i of every column is one
+    world. The dice for each column are rolled in one go with
+    dice.roll_many and the same _*_from_roll rules as generate_uwp are
+    applied down the column, so the results have the same odds as
+    calling generate_uwp n times. Rolls that generate_uwp would skip
+    (e.g. government on an empty world) are made and ignored. """
+    space_opera = [space_opera] * n
+    hard_science = [hard_science] * n
+    maturity = [maturity] * n
+
+    size = _size_column(n)
+    atmosphere = _atmosphere_column(size, space_opera)
+    temperature = _temperature_column(atmosphere)
+    hydrosphere = _hydrosphere_column(size, atmosphere, temperature,
+                                      space_opera)
+    population = _population_column(size, atmosphere, hard_science)
+    government = _government_column(population)
+    law_level = _law_level_column(population, government)
+    starport = _starport_column(population, hard_science, maturity)
+    tech_level = _tech_level_column(starport, size, atmosphere, hydrosphere,
+                                    population, government, tech_cap)
+
+    return {
+            "starport": starport,
+            "size": size,
+            "atmosphere": atmosphere,
+            "temperature": temperature,
+            "hydrosphere": hydrosphere,
+            "population": population,
+            "government": government,
+            "law_level": law_level,
+            "tech_level": tech_level
+            }
+
+""" The stages of generate_uwp_batch, one column each. The other
+arguments are columns too, so every rule sees one row at a time. """
+
+def _size_column(n):
+    return [roll - 2 for roll in dice.roll_many(n, 2, 6)]
+
+def _atmosphere_column(size, space_opera):
+    return list(map(_atmosphere_from_roll,
+                    dice.roll_many(len(size), 2, 6), size, space_opera))
+
+def _temperature_column(atmosphere):
+    return list(map(_temperature_from_roll,
+                    dice.roll_many(len(atmosphere), 2, 6), atmosphere))
+
+def _hydrosphere_column(size, atmosphere, temperature, space_opera):
+    return list(map(_hydrosphere_from_roll,
+                    dice.roll_many(len(size), 2, 6), size, atmosphere,
+                    temperature, space_opera))
+
+def _population_column(size, atmosphere, hard_science):
+    return list(map(_population_from_roll,
+                    dice.roll_many(len(size), 2, 6), size, atmosphere,
+                    hard_science))
+
+def _government_column(population):
+    return list(map(_government_from_roll,
+                    dice.roll_many(len(population), 2, 6), population))
+
+def _law_level_column(population, government):
+    return list(map(_law_level_from_roll,
+                    dice.roll_many(len(population), 2, 6), population,
+                    government))
+
+def _starport_column(population, hard_science, maturity):
+    return list(map(_starport_from_roll,
+                    dice.roll_many(len(population), 2, 6), population,
+                    hard_science, maturity))
+
+def _tech_level_column(starport, size, atmosphere, hydrosphere, population,
+                       government, tech_cap):
+    tech_level = []
+    for row in range(len(population)):
+        if population[row] == 0:
+            tech_level.append(0)
+            continue
+        dm = _get_tech_dm(starport[row], size[row], atmosphere[row],
+                          hydrosphere[row], population[row],
+                          government[row])
+        sides = _get_tech_die(dm, tech_cap)
+        # The die depends on the row, so it is rolled row by row
+        roll = dice.roll(1, sides) if sides else 0
+        tech_level.append(_tech_level_from_roll(roll, dm, sides))
+    return tech_level
+
+def format_uwp_batch(columns):
+    """ Turns the columns from generate_uwp_batch into UWP strings """
+    return list(map(format_uwp,
+                    columns["starport"],
+                    columns["size"],
+                    columns["atmosphere"],
+                    columns["hydrosphere"],
+                    columns["population"],
+                    columns["government"],
+                    columns["law_level"],
+                    columns["tech_level"]))
 
 
 if __name__ == "__main__":
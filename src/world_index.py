@@ -0,0 +1,249 @@
+""" Inverted indexes over the systems of a generated space.
+
+Every hex of the space has an ordinal, numbered x-major as in sector
+files: the hex at (x, y) is (x - origin x - 1) * height + (y - origin y
+- 1). A bitmap is an int with bit n set for hex n, and the index keeps
+one for each trade code, each value of each UWP field, each base and
+each PBG digit. A query is then a few ANDs and ORs of ints, which Python
+does on the whole space at once.
+
+    index = WorldIndex.from_space(domain)
+    found = index.query(codes = ["Hi", "In"], starport = "AB",
+                        naval = True)
+    for s in index.get_systems(found): ...
+
+Bitmaps can also be combined by hand with &, | and index.without().
+When a leaf is regenerated, update(leaf) reindexes just its hexes. """
+
+import ehex
+import hex_index
+import trade_codes
+from system_table import NAVAL, SCOUT
+
+""" Fields with a bitmap per value, as named by SystemTable columns.
+starport values are letters, the rest ints. """
+fields = ["starport", "size", "atmosphere", "hydrosphere", "population",
+          "government", "law_level", "tech_level",
+          "population_multiplier", "belts", "gas_giants"]
+
+def count(bitmap):
+    """ The number of systems in a bitmap """
+    return bin(bitmap).count("1")
+
+def ordinals(bitmap):
+    """ The hex ordinals set in a bitmap, in order """
+    found = []
+    while bitmap:
+        low = bitmap & -bitmap
+        found.append(low.bit_length() - 1)
+        bitmap ^= low
+    return found
+
+class WorldIndex:
+    """ Bitmaps over the hexes of a space with the given origin and size """
+
+    def __init__(self, origin, size):
+        self.origin = tuple(origin)
+        self.size = tuple(size)
+        self.occupied = 0
+        self.naval = 0
+        self.scout = 0
+        self.codes = {code: 0 for code in trade_codes.codes}
+        self.values = {field: {} for field in fields}
+        # Hex ordinal -> (leaf origin, row of that leaf's table)
+        self.locations = {}
+        # Leaf origin -> (leaf size, table)
+        self.leaves = {}
+
+    @classmethod
+    def from_space(cls, space):
+        index = cls(space.origin, space.size)
+        index.add_leaves([(leaf.origin, leaf.size, leaf.table)
+                          for leaf in space.leaves()])
+        return index
+
+    def ordinal(self, coordinates):
+        x = coordinates[0] - self.origin[0] - 1
+        y = coordinates[1] - self.origin[1] - 1
+        if not (0 <= x < self.size[0] and 0 <= y < self.size[1]):
+            return None
+        return x * self.size[1] + y
+
+    def coordinates(self, ordinal):
+        x, y = divmod(ordinal, self.size[1])
+        return (x + self.origin[0] + 1, y + self.origin[1] + 1)
+
+    def rectangle(self, origin, size):
+        """ Bitmap of every hex from origin + (1, 1) to origin + size """
+        height = self.size[1]
+        y_first = max(origin[1] + 1, self.origin[1] + 1)
+        y_last = min(origin[1] + size[1], self.origin[1] + height)
+        if y_first > y_last:
+            return 0
+        column = ((1 << (y_last - y_first + 1)) - 1) << \
+                (y_first - self.origin[1] - 1)
+        bitmap = 0
+        for x in range(max(origin[0] + 1, self.origin[0] + 1),
+                       min(origin[0] + size[0], self.origin[0] + self.size[0])
+                       + 1):
+            bitmap |= column << (x - self.origin[0] - 1) * height
+        return bitmap
+
+    def within(self, centre, radius):
+        """ Bitmap of every hex within radius of centre """
+        bitmap = 0
+        for coordinates in hex_index.hexes_within(centre, radius):
+            ordinal = self.ordinal(coordinates)
+            if ordinal is not None:
+                bitmap |= 1 << ordinal
+        return bitmap
+
+    def add_leaf(self, origin, size, table):
+        """ Indexes the systems of one leaf """
+        self.add_leaves([(origin, size, table)])
+
+    def add_leaves(self, leaves):
+        """ Indexes the systems of each (origin, size, table) of leaves.
+
+        Bits are first set in a bytearray per bitmap, and each bytearray
+        is made into an int and ORed in once at the end, so the work is
+        linear in the size of the space rather than an int operation
+        over the whole space for every system. """
+        length = (self.size[0] * self.size[1] + 7) // 8
+        occupied = bytearray(length)
+        naval = bytearray(length)
+        scout = bytearray(length)
+        code_bits = {}
+        value_bits = {field: {} for field in fields}
+        codes = [(1 << i, code) for i, code in enumerate(trade_codes.codes)]
+
+        def bits_for(bitmaps, key):
+            bits = bitmaps.get(key)
+            if bits is None:
+                bits = bitmaps[key] = bytearray(length)
+            return bits
+
+        for origin, size, table in leaves:
+            origin = tuple(origin)
+            self.leaves[origin] = (tuple(size), table)
+            for row in range(len(table)):
+                ordinal = self.ordinal((table.x[row], table.y[row]))
+                if ordinal is None:
+                    raise ValueError(f"System '{table.get_name(row)}' is "
+                                     "outside the space")
+                byte = ordinal >> 3
+                bit = 1 << (ordinal & 7)
+                self.locations[ordinal] = (origin, row)
+                occupied[byte] |= bit
+                if table.bases[row] & NAVAL:
+                    naval[byte] |= bit
+                if table.bases[row] & SCOUT:
+                    scout[byte] |= bit
+                mask = table.trade_codes[row]
+                for code_bit, code in codes:
+                    if mask & code_bit:
+                        bits_for(code_bits, code)[byte] |= bit
+                pbg = table.pbg[row]
+                for field, value in (
+                        ("starport", ehex.int_to_hex(table.starport[row])),
+                        ("size", table.size[row]),
+                        ("atmosphere", table.atmosphere[row]),
+                        ("hydrosphere", table.hydrosphere[row]),
+                        ("population", table.population[row]),
+                        ("government", table.government[row]),
+                        ("law_level", table.law_level[row]),
+                        ("tech_level", table.tech_level[row]),
+                        ("population_multiplier", pbg // 100),
+                        ("belts", pbg // 10 % 10),
+                        ("gas_giants", pbg % 10)):
+                    bits_for(value_bits[field], value)[byte] |= bit
+
+        def to_int(bits):
+            return int.from_bytes(bits, "little")
+
+        self.occupied |= to_int(occupied)
+        self.naval |= to_int(naval)
+        self.scout |= to_int(scout)
+        for code, bits in code_bits.items():
+            self.codes[code] |= to_int(bits)
+        for field, bitmaps in value_bits.items():
+            values = self.values[field]
+            for value, bits in bitmaps.items():
+                values[value] = values.get(value, 0) | to_int(bits)
+
+    def remove_leaf(self, origin):
+        """ Drops the systems of one leaf from every bitmap """
+        origin = tuple(origin)
+        size, table = self.leaves.pop(origin)
+        area = self.rectangle(origin, size)
+        for ordinal in ordinals(self.occupied & area):
+            del self.locations[ordinal]
+        keep = ~area
+        self.occupied &= keep
+        self.naval &= keep
+        self.scout &= keep
+        for code in self.codes:
+            self.codes[code] &= keep
+        for values in self.values.values():
+            for value in list(values):
+                values[value] &= keep
+                if not values[value]:
+                    del values[value]
+
+    def update(self, leaf):
+        """ Reindexes a leaf space after it has been regenerated """
+        self.remove_leaf(leaf.origin)
+        self.add_leaf(leaf.origin, leaf.size, leaf.table)
+
+    def value(self, field, values):
+        """ Bitmap of systems whose field is any of values, which can be
+        a range, e.g. value("population", range(9, 16)), or for the
+        starport a string of letters """
+        bitmap = 0
+        for value, found in self.values[field].items():
+            if value in values:
+                bitmap |= found
+        return bitmap
+
+    def without(self, bitmap):
+        """ Bitmap of the occupied hexes not in bitmap """
+        return self.occupied & ~bitmap
+
+    def query(self, codes = (), without_codes = (), naval = None,
+              scout = None, region = None, **field_values):
+        """ Bitmap of the systems matching every condition given:
+        codes: trade codes they must all have
+        without_codes: trade codes they must not have
+        naval, scout: True or False for whether they have the base
+        region: a bitmap (see rectangle() and within()) to search in
+        field_values: values as for value(), e.g. starport = "AB" """
+        bitmap = self.occupied
+        for code in codes:
+            bitmap &= self.codes[code]
+        for code in without_codes:
+            bitmap &= ~self.codes[code]
+        if naval is not None:
+            bitmap &= self.naval if naval else ~self.naval
+        if scout is not None:
+            bitmap &= self.scout if scout else ~self.scout
+        if region is not None:
+            bitmap &= region
+        for field, values in field_values.items():
+            if field not in self.values:
+                raise ValueError(f"Unknown field '{field}'")
+            bitmap &= self.value(field, values)
+        return bitmap
+
+    def rows(self, bitmap):
+        """ (table, row) of each system in bitmap, in hex order """
+        rows = []
+        for ordinal in ordinals(bitmap):
+            origin, row = self.locations[ordinal]
+            rows.append((self.leaves[origin][1], row))
+        return rows
+
+    def get_systems(self, bitmap):
+        return [table.get_system(row) for table, row in self.rows(bitmap)]
+
+    def get_coordinates(self, bitmap):
+        return [self.coordinates(ordinal) for ordinal in ordinals(bitmap)]
@@ -0,0 +1,347 @@
+""" Counting what generation produces, over any number of worlds.
+
+A WorldStats holds a fixed set of counters: a histogram of every UWP
+field (by ehex value, the starport included), how often each trade code
+and each pair of trade codes turns up, how often each combination of
+bases does and a histogram of each PBG digit. Its size never depends on
+how many worlds it has seen, and two can be merged by adding their
+counters, so worlds can be counted in chunks, in worker processes, and
+the results combined.
+
+Worlds can be added one at a time (add_uwp, add_system), a SystemTable
+at a time (add_table) or from .sec files (add_sec). generate() counts
+fresh worlds a chunk at a time without ever keeping them.
+
+Run from src to compare maturities (see uwp_generator.starport_tables),
+or .sec files:
+
+    python world_stats.py [--worlds 1000000] [--workers N]
+                          [--maturity Standard Mature ...]
+                          [--sec a.sec b.sec ...] [--output stats.json]
+"""
+
+import argparse
+import json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import dice
+import ehex
+import sec_parser
+import system
+import system_table
+import trade_codes
+import uwp
+import uwp_generator
+
+""" UWP fields counted, in UWP order """
+fields = ["starport", "size", "atmosphere", "hydrosphere", "population",
+          "government", "law_level", "tech_level"]
+pbg_fields = ["population_multiplier", "belts", "gas_giants"]
+
+""" Worlds generated per chunk by generate() """
+CHUNK_SIZE = 65536
+
+_code_count = len(trade_codes.codes)
+
+@lru_cache(maxsize = None)
+def _mask_indices(mask):
+    return [i for i in range(_code_count) if mask >> i & 1]
+
+class WorldStats:
+    """ Counts over worlds, mergeable with merge() """
+
+    def __init__(self):
+        self.worlds = 0
+        self.values = {field: [0] * len(ehex.hex_table) for field in fields}
+        # code_pairs[i * _code_count + j]: worlds with codes i and j. The
+        # diagonal is how many have each code.
+        self.code_pairs = [0] * (_code_count * _code_count)
+        # Indexed by NAVAL | SCOUT; only systems, not bare UWPs, count
+        self.bases = [0] * 4
+        self.pbg = {field: [0] * 10 for field in pbg_fields}
+
+    def merge(self, other):
+        """ Adds other's counts to these, returning self """
+        self.worlds += other.worlds
+        for field in fields:
+            self.values[field] = [a + b for a, b in zip(self.values[field],
+                                                        other.values[field])]
+        self.code_pairs = [a + b for a, b in zip(self.code_pairs,
+                                                 other.code_pairs)]
+        self.bases = [a + b for a, b in zip(self.bases, other.bases)]
+        for field in pbg_fields:
+            self.pbg[field] = [a + b for a, b in zip(self.pbg[field],
+                                                     other.pbg[field])]
+        return self
+
+    """ Adding worlds. The bulk methods count each column with a Counter
+    and add the counts, so the per world work is done in C. """
+
+    def _add_counts(self, counters, counts):
+        for value, count in counts.items():
+            counters[value] += count
+
+    def _add_masks(self, counts):
+        pairs = self.code_pairs
+        for mask, count in counts.items():
+            indices = _mask_indices(mask)
+            for i in indices:
+                row = i * _code_count
+                for j in indices:
+                    pairs[row + j] += count
+
+    def add_uwp_fields(self, starport, size, atmosphere, hydrosphere,
+                       population, government, law_level, tech_level):
+        """ Counts one UWP given as fields, the starport as a letter """
+        values = (ehex.hex_values[starport], size, atmosphere, hydrosphere,
+                  population, government, law_level, tech_level)
+        for field, value in zip(fields, values):
+            self.values[field][value] += 1
+        self._add_masks({trade_codes.get_trade_code_mask_from_fields(
+                size, atmosphere, hydrosphere, population, government,
+                law_level, tech_level): 1})
+        self.worlds += 1
+
+    def add_uwp(self, uwp_string):
+        """ Counts one UWP string, as generate_uwp gives """
+        self.add_uwp_fields(*uwp.unpack(uwp.pack_string(uwp_string)))
+
+    def _add_bases_and_pbg(self, naval, scout, population_multiplier,
+                           belts, gas_giants):
+        self.bases[(system_table.NAVAL if naval else 0) |
+                   (system_table.SCOUT if scout else 0)] += 1
+        self.pbg["population_multiplier"][population_multiplier] += 1
+        self.pbg["belts"][belts] += 1
+        self.pbg["gas_giants"][gas_giants] += 1
+
+    def add_system(self, s):
+        w = s.uwp
+        self.add_uwp_fields(w.starport, w.size, w.atmosphere, w.hydrosphere,
+                            w.population, w.government, w.law_level,
+                            w.tech_level)
+        self._add_bases_and_pbg(s.naval_base, s.scout_base,
+                                s.population_multiplier, s.belts,
+                                s.gas_giants)
+
+    def add_table(self, table):
+        """ Counts every system of a SystemTable """
+        for field in fields:
+            self._add_counts(self.values[field],
+                             Counter(getattr(table, field)))
+        self._add_masks(Counter(table.trade_codes))
+        self._add_counts(self.bases, Counter(table.bases))
+        pbg = Counter(table.pbg)
+        for value, count in pbg.items():
+            self.pbg["population_multiplier"][value // 100] += count
+            self.pbg["belts"][value // 10 % 10] += count
+            self.pbg["gas_giants"][value % 10] += count
+        self.worlds += len(table)
+
+    def add_columns(self, columns):
+        """ Counts UWPs given as columns, as generate_uwp_batch gives """
+        for field in fields:
+            counts = Counter(columns[field])
+            if field == "starport":
+                counts = {ehex.hex_values[port]: count
+                          for port, count in counts.items()}
+            self._add_counts(self.values[field], counts)
+        self._add_masks(Counter(map(
+                trade_codes.get_trade_code_mask_from_fields,
+                columns["size"], columns["atmosphere"],
+                columns["hydrosphere"], columns["population"],
+                columns["government"], columns["law_level"],
+                columns["tech_level"])))
+        self.worlds += len(columns["size"])
+
+    def add_sec(self, fp, errors = None):
+        """ Counts every system of a .sec file, a chunk at a time """
+        table = system_table.SystemTable("")
+        for item in sec_parser.iter_sec(fp, errors):
+            if isinstance(item, sec_parser.Header):
+                continue
+            table.append(*sec_parser.row_to_table_row(item))
+            if len(table) == sec_parser.CHUNK_SIZE:
+                self.add_table(table)
+                table = system_table.SystemTable("")
+        self.add_table(table)
+
+    """ Results """
+
+    def systems(self):
+        """ How many worlds were counted with their bases and PBG """
+        return sum(self.bases)
+
+    def frequencies(self, field):
+        """ The fraction of worlds with each value of a UWP or PBG field,
+        starports by letter and the rest by int """
+        counts = self.pbg[field] if field in self.pbg else self.values[field]
+        total = sum(counts)
+        if field == "starport":
+            return {ehex.int_to_hex(value): count / total
+                    for value, count in enumerate(counts) if count}
+        return {value: count / total for value, count in enumerate(counts)
+                if count}
+
+    def mean(self, field):
+        counts = self.pbg[field] if field in self.pbg else self.values[field]
+        total = sum(counts)
+        return sum(value * count for value, count in enumerate(counts)) / \
+                total if total else 0.0
+
+    def code_count(self, code, other = None):
+        """ How many worlds have code, and other too if given """
+        i = trade_codes.codes.index(code)
+        j = i if other is None else trade_codes.codes.index(other)
+        return self.code_pairs[i * _code_count + j]
+
+    def code_frequencies(self):
+        return {code: self.code_count(code) / self.worlds if self.worlds
+                else 0.0 for code in trade_codes.codes}
+
+    def co_occurrence(self):
+        """ {(code, other code): worlds with both} for every pair that
+        turned up, each pair once """
+        pairs = {}
+        for i, code in enumerate(trade_codes.codes):
+            for j in range(i + 1, _code_count):
+                count = self.code_pairs[i * _code_count + j]
+                if count:
+                    pairs[(code, trade_codes.codes[j])] = count
+        return pairs
+
+    def base_rates(self):
+        """ The fraction of systems with each kind of base """
+        total = self.systems()
+        if not total:
+            return {"naval": 0.0, "scout": 0.0, "both": 0.0}
+        naval = self.bases[system_table.NAVAL] + self.bases[3]
+        scout = self.bases[system_table.SCOUT] + self.bases[3]
+        return {"naval": naval / total, "scout": scout / total,
+                "both": self.bases[3] / total}
+
+    def to_dict(self):
+        return {
+                "worlds": self.worlds,
+                "systems": self.systems(),
+                "values": {field: {ehex.int_to_hex(value): count
+                                   for value, count in enumerate(counts)
+                                   if count}
+                           for field, counts in self.values.items()},
+                "trade_codes": {code: self.code_count(code)
+                                for code in trade_codes.codes},
+                "trade_code_pairs": {f"{a} {b}": count for (a, b), count
+                                     in self.co_occurrence().items()},
+                "bases": {"none": self.bases[0],
+                          "naval": self.bases[system_table.NAVAL],
+                          "scout": self.bases[system_table.SCOUT],
+                          "both": self.bases[3]},
+                "pbg": self.pbg
+                }
+
+def _generate_chunk(job):
+    """ Worker for generate: counts one chunk of new systems """
+    n, space_opera, hard_science, maturity, tech_cap = job
+    stats = WorldStats()
+    columns = uwp_generator.generate_uwp_batch(n, space_opera, hard_science,
+                                               maturity, tech_cap)
+    stats.add_columns(columns)
+    for starport in columns["starport"]:
+        stats._add_bases_and_pbg(*system.roll_bases(starport),
+                                 *system.roll_pbg())
+    return stats
+
+def generate(worlds, space_opera = True, hard_science = True,
+             maturity = "Standard", tech_cap = None, workers = None,
+             chunk_size = CHUNK_SIZE):
+    """ WorldStats for worlds newly generated systems. Only one chunk of
+    chunk_size systems is held at a time (per worker, with workers). """
+    jobs = []
+    for start in range(0, worlds, chunk_size):
+        jobs.append((min(chunk_size, worlds - start), space_opera,
+                     hard_science, maturity, tech_cap))
+    stats = WorldStats()
+    if workers is None:
+        for job in jobs:
+            stats.merge(_generate_chunk(job))
+        return stats
+
+    import space
+    with ProcessPoolExecutor(max_workers = workers,
+                             initializer = space._reseed_worker,
+                             initargs = (dice.source_name(),)) as executor:
+        for result in executor.map(_generate_chunk, jobs):
+            stats.merge(result)
+    return stats
+
+def compare(stats_by_name):
+    """ A table setting several WorldStats side by side, e.g. one per
+    maturity """
+    names = list(stats_by_name)
+    width = max([12] + [len(name) + 2 for name in names])
+
+    def row(label, values, form = "{:.4f}"):
+        return f"{label:<24}" + "".join(
+                f"{form.format(value):>{width}}" for value in values)
+
+    lines = [f"{'':<24}" + "".join(f"{name:>{width}}" for name in names),
+             row("worlds", [stats_by_name[name].worlds for name in names],
+                 "{}")]
+    lines.append("starport")
+    frequencies = [stats_by_name[name].frequencies("starport")
+                   for name in names]
+    for port in "ABCDEX":
+        lines.append(row(f"  {port}", [f.get(port, 0.0)
+                                       for f in frequencies]))
+    lines.append("mean")
+    for field in fields[1:] + pbg_fields:
+        lines.append(row(f"  {field}", [stats_by_name[name].mean(field)
+                                        for name in names], "{:.3f}"))
+    lines.append("bases")
+    rates = [stats_by_name[name].base_rates() for name in names]
+    for base in ["naval", "scout", "both"]:
+        lines.append(row(f"  {base}", [r[base] for r in rates]))
+    lines.append("trade codes")
+    codes = [stats_by_name[name].code_frequencies() for name in names]
+    for code in trade_codes.codes:
+        lines.append(row(f"  {code}", [c[code] for c in codes]))
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+            description = "Compare the worlds generated with different "
+            "maturities, or found in .sec files")
+    parser.add_argument("--worlds", type = int, default = 1000000,
+                        help = "Worlds to generate for each maturity")
+    parser.add_argument("--maturity", nargs = "+",
+                        choices = list(uwp_generator.starport_tables),
+                        default = list(uwp_generator.starport_tables))
+    parser.add_argument("--tech-cap", type = int, default = None)
+    parser.add_argument("--workers", type = int, default = None,
+                        help = "Generate in this many processes")
+    parser.add_argument("--chunk-size", type = int, default = CHUNK_SIZE)
+    parser.add_argument("--sec", nargs = "+", default = None,
+                        metavar = "FILE",
+                        help = "Count these files instead of generating")
+    parser.add_argument("--output", default = None,
+                        help = "Save the counts as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    if args.sec:
+        for filename in args.sec:
+            results[filename] = WorldStats()
+            with open(filename) as fp:
+                results[filename].add_sec(fp)
+    else:
+        for maturity in args.maturity:
+            results[maturity] = generate(
+                    args.worlds, maturity = maturity,
+                    tech_cap = args.tech_cap, workers = args.workers,
+                    chunk_size = args.chunk_size)
+    print(compare(results))
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump({name: stats.to_dict()
+                       for name, stats in results.items()}, fp, indent = 4)
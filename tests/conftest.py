@@ -0,0 +1,23 @@
+""" The modules live in src/ and import each other as top-level modules """
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, "src"))
+
+import space
+
+@pytest.fixture(scope = "session")
+def generated_space():
+    """ generated_space(kind, seed) builds a space of the class named kind
+    (e.g. "Sector"), named by its first letter unless name is given,
+    generates it and returns it. Other options go to the class. Every
+    call builds a new space, so tests may edit what they get. """
+    def build(kind, seed = None, name = None, **options):
+        s = getattr(space, kind)(name or kind[0], seed = seed, **options)
+        s.generate()
+        return s
+    return build
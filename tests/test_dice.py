@@ -0,0 +1,44 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import dice
+import space
+
+def test_roll_range():
+    for sides in (2, 6, 20):
+        rolls = [dice.roll(2, sides) for i in range(500)]
+        assert min(rolls) >= 2 and max(rolls) <= 2 * sides
+
+def test_roll_many_matches_totals():
+    rolls = dice.roll_many(1000, 2, 6)
+    assert len(rolls) == 1000
+    assert all(2 <= roll <= 12 for roll in rolls)
+
+def test_hex_stream_is_deterministic():
+    def rolls(stream):
+        with dice.rolling_with(dice.HexStream(5, (3, 4), stream)):
+            return [dice.roll(2, 6) for i in range(20)]
+    assert rolls(dice.SYSTEM_STREAM) == rolls(dice.SYSTEM_STREAM)
+    assert rolls(dice.SYSTEM_STREAM) != rolls(dice.OCCUPANCY_STREAM)
+
+@pytest.mark.parametrize("name", ["random", "pool"])
+def test_source_names_round_trip(name):
+    assert dice.source_name(dice.create_source(name)) == name
+
+def test_stream_has_no_name():
+    assert dice.source_name(dice.HexStream(1, (1, 1), 0)) is None
+
+def test_spawned_workers_use_the_parents_source():
+    previous = dice.set_source(dice.create_source("pool"))
+    try:
+        with ProcessPoolExecutor(
+                max_workers = 2,
+                mp_context = multiprocessing.get_context("spawn"),
+                initializer = space._reseed_worker,
+                initargs = (dice.source_name(),)) as executor:
+            names = list(executor.map(dice.source_name, [None] * 4))
+    finally:
+        dice.set_source(previous)
+    assert names == ["pool"] * 4
@@ -0,0 +1,60 @@
+import random
+from fractions import Fraction
+
+import pytest
+
+import dice
+import distributions
+import trade_codes
+import uwp
+import uwp_generator
+
+@pytest.mark.parametrize("settings", [
+        {},
+        {"space_opera": False, "hard_science": False},
+        {"maturity": "Mature", "tech_cap": 9},
+        ])
+def test_marginals_sum_to_one(settings):
+    for field in distributions.outcome_fields:
+        distribution = distributions.marginal(field, exact = True,
+                                              **settings)
+        assert sum(distribution.values()) == 1
+        assert all(p > 0 for p in distribution.values())
+    joint = distributions.joint(["population", "starport", "tech_level"],
+                                exact = True, **settings)
+    assert sum(joint.values()) == 1
+
+def test_size_is_2d6_minus_2():
+    assert distributions.marginal("size", exact = True) == {
+            total - 2: Fraction(6 - abs(total - 7), 36)
+            for total in range(2, 13)}
+    assert distributions.dice_weights(2, 6) == [
+            (total, 6 - abs(total - 7)) for total in range(2, 13)]
+
+def test_joint_agrees_with_marginals():
+    joint = distributions.joint(["population", "starport"], exact = True)
+    starports = {}
+    for (population, starport), p in joint.items():
+        starports[starport] = starports.get(starport, 0) + p
+    assert starports == distributions.marginal("starport", exact = True)
+
+def test_matches_sampled_worlds():
+    samples = 20000
+    starports = {}
+    code_counts = dict.fromkeys(trade_codes.codes, 0)
+    with dice.rolling_with(random.Random(2024)):
+        for i in range(samples):
+            fields = uwp.unpack(uwp.pack_string(uwp_generator.generate_uwp()))
+            starports[fields[0]] = starports.get(fields[0], 0) + 1
+            mask = trade_codes.get_trade_code_mask_from_fields(*fields[1:])
+            for code in trade_codes.mask_to_codes(mask):
+                code_counts[code] += 1
+
+    # About four standard deviations at this many samples
+    tolerance = 0.015
+    expected = distributions.marginal("starport")
+    assert set(starports) <= set(expected)
+    for starport, p in expected.items():
+        assert abs(starports.get(starport, 0) / samples - p) < tolerance
+    for code, p in distributions.trade_code_probabilities().items():
+        assert abs(code_counts[code] / samples - p) < tolerance
@@ -0,0 +1,75 @@
+import io
+
+import pytest
+
+import space
+
+def render(s):
+    fp = io.StringIO()
+    s.write_sec(fp)
+    return fp.getvalue()
+
+@pytest.fixture(scope = "module")
+def reference(generated_space):
+    """ A seeded Domain generated in this process, in order """
+    return render(generated_space("Domain", 9))
+
+@pytest.mark.parametrize("chunk", ["subsector", "sector"])
+def test_seeded_workers_match_serial(reference, chunk):
+    d = space.Domain("D", seed = 9)
+    d.generate(workers = 2, chunk = chunk)
+    assert render(d) == reference
+
+def test_seeded_leaves_are_order_independent(reference):
+    d = space.Domain("D", seed = 9)
+    for leaf in reversed(d.leaves()):
+        leaf.generate()
+    assert render(d) == reference
+
+def test_seeded_leaf_alone_matches_its_place_in_a_domain(generated_space):
+    d = generated_space("Domain", 9)
+    leaf = d.leaves()[37]
+    alone = space.Space(**leaf.get_parameters())
+    alone.generate()
+    assert alone.render_systems() == leaf.render_systems()
+
+def test_unseeded_workers_fill_every_leaf(generated_space):
+    d = space.Sector("S")
+    d.generate(workers = 2)
+    serial = generated_space("Sector")
+    assert [leaf.name for leaf in d.leaves()] == \
+            [leaf.name for leaf in serial.leaves()]
+    assert all(len(leaf.table) > 10 for leaf in d.leaves())
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_streaming_matches_holding_the_space(reference, workers):
+    d = space.Domain("D", seed = 9)
+    fp = io.StringIO()
+    d.generate_and_write(fp, workers = workers)
+    assert fp.getvalue() == reference
+    # Nothing is held once written
+    assert all(len(leaf.table) == 0 for leaf in d.leaves())
+
+def test_streaming_a_region_matches_holding_it(generated_space):
+    held = generated_space("Region", 4, bases = [2, 2])
+    streamed = space.Region("R", [2, 2], seed = 4)
+    fp = io.StringIO()
+    streamed.generate_and_write(fp)
+    assert fp.getvalue() == render(held)
+    assert fp.getvalue() == "".join(line + "\n"
+                                    for line in held.iter_sec_lines())
+
+def test_workers_only_take_a_few_chunks_ahead():
+    d = space.Domain("D", seed = 9)
+    taken = []
+    def chunks():
+        for leaf in d.leaves():
+            taken.append(leaf)
+            yield [leaf]
+
+    stream = space._generate_in_workers(chunks(), 2)
+    leaf, table = next(stream)
+    assert leaf is taken[0]
+    assert len(taken) <= 5
+    names = [leaf.name] + [leaf.name for leaf, table in stream]
+    assert names == [leaf.name for leaf in d.leaves()]
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+import hex_index
+
+@pytest.fixture(scope = "module")
+def index(generated_space):
+    return hex_index.HexIndex.from_space(generated_space("Sector", 13))
+
+def neighbours(coordinates):
+    """ The six hexes touching coordinates: even columns sit half a hex
+    lower, so their diagonal neighbours are a row further down """
+    x, y = coordinates
+    dy = 0 if x & 1 else 1
+    return [(x, y - 1), (x, y + 1),
+            (x - 1, y - 1 + dy), (x - 1, y + dy),
+            (x + 1, y - 1 + dy), (x + 1, y + dy)]
+
+def test_distance_matches_stepping_between_neighbours():
+    assert hex_index.distance((1, 1), (2, 1)) == 1
+    assert hex_index.distance((1, 1), (2, 2)) == 2
+    assert hex_index.distance((2, 1), (1, 2)) == 1
+    distances = {(5, 6): 0}
+    frontier = [(5, 6)]
+    for step in range(1, 7):
+        frontier = [n for c in frontier for n in neighbours(c)
+                    if n not in distances]
+        for c in frontier:
+            distances.setdefault(c, step)
+    for c, d in distances.items():
+        assert hex_index.distance((5, 6), c) == d
+        assert hex_index.distance(c, (5, 6)) == d
+    assert sorted(hex_index.hexes_within((5, 6), 6)) == sorted(distances)
+
+def brute_force_within(index, centre, radius):
+    return sorted((hex_index.distance(centre, c), row)
+                  for row, c in enumerate(index.coordinates)
+                  if hex_index.distance(centre, c) <= radius)
+
+@pytest.mark.parametrize("radius", [0, 1, 2, 3, 6, 10, 11, 15, 30])
+def test_within_matches_brute_force(index, radius):
+    rng = random.Random(radius)
+    for i in range(20):
+        centre = (rng.randint(-3, 36), rng.randint(-3, 44))
+        found = index.within(centre, radius)
+        assert sorted(found) == brute_force_within(index, centre, radius)
+        assert [d for d, row in found] == sorted(d for d, row in found)
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_nearest_matches_brute_force(index, k):
+    rng = random.Random(k)
+    for i in range(20):
+        centre = index.coordinates[rng.randrange(len(index))]
+        found = index.nearest(centre, k)
+        expected = [d for d, row in brute_force_within(index, centre, 200)
+                    if d][:k]
+        assert [d for d, row in found] == expected
+        assert all(hex_index.distance(centre, index.coordinates[row]) == d
+                   for d, row in found)
+
+def test_at(index):
+    for row in range(0, len(index), 17):
+        assert index.at(index.coordinates[row]) == row
+    assert index.at((0, 0)) is None
@@ -0,0 +1,31 @@
+import instrumentation
+import space
+
+def test_unseeded_batch_stages_are_counted():
+    s = space.Sector("U")
+    with instrumentation.instrumented(space.Space) as report:
+        s.generate()
+    for stage in ["size", "atmosphere", "hydrosphere", "population",
+                  "starport", "tech_level"]:
+        assert report.calls[f"uwp_generator._{stage}_column"] == 16
+    assert report.calls["uwp_generator.generate_uwp_batch"] == 16
+    assert report.dice > 0
+    assert len(report.leaves) == 16
+    assert sum(leaf["systems"] for leaf in report.leaves) == len(s.table)
+
+def test_seeded_stages_are_counted():
+    s = space.Subsector("S", seed = 3)
+    with instrumentation.instrumented(space.Space) as report:
+        s.generate()
+    systems = len(s.table)
+    assert report.calls["uwp_generator._generate_size"] == systems
+    assert report.calls["uwp_generator._generate_tech_level"] == systems
+    assert report.calls["System.generate"] >= systems
+
+def test_disable_restores_originals():
+    generate = space.Space.generate
+    roll = instrumentation.dice.roll
+    with instrumentation.instrumented(space.Space):
+        assert space.Space.generate is not generate
+    assert space.Space.generate is generate
+    assert instrumentation.dice.roll is roll
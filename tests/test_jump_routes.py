@@ -0,0 +1,95 @@
+import heapq
+import random
+
+import pytest
+
+import hex_index
+import jump_routes
+
+@pytest.fixture(scope = "module")
+def sector(generated_space):
+    return generated_space("Sector", 17)
+
+def path_cost(routes, path):
+    return sum(routes.weight(hex_index.distance(a, b))
+               for a, b in zip(path, path[1:]))
+
+def brute_force_neighbours(routes):
+    """ For every row, the rows within a jump, found by checking the
+    distance to every other system """
+    coordinates = routes.index.coordinates
+    neighbours = []
+    for row, here in enumerate(coordinates):
+        neighbours.append([(d, other) for other, d in enumerate(
+                hex_index.distance(here, there) for there in coordinates)
+                           if 0 < d <= routes.jump])
+    return neighbours
+
+def reference_cost(routes, neighbours, origin, destination):
+    """ Plain Dijkstra, searching afresh for every pair """
+    start = routes.index.at(origin)
+    target = routes.index.at(destination)
+    costs = {start: 0}
+    frontier = [(0, start)]
+    done = set()
+    while frontier:
+        cost, row = heapq.heappop(frontier)
+        if row == target:
+            return cost
+        if row in done:
+            continue
+        done.add(row)
+        if row != start and not routes.can_pass(row):
+            continue
+        for d, other in neighbours[row]:
+            new_cost = cost + routes.weight(d)
+            if new_cost < costs.get(other, new_cost + 1):
+                costs[other] = new_cost
+                heapq.heappush(frontier, (new_cost, other))
+    return None
+
+@pytest.mark.parametrize("jump, refuel, cost", [
+        (1, False, "jumps"), (2, False, "jumps"), (2, True, "jumps"),
+        (2, False, "parsecs"), (3, True, "parsecs")])
+def test_dijkstra_and_astar_agree(sector, jump, refuel, cost):
+    routes = jump_routes.JumpRoutes.from_space(sector, jump,
+                                               refuel = refuel, cost = cost,
+                                               cache_size = 4)
+    coordinates = routes.index.coordinates
+    neighbours = brute_force_neighbours(routes)
+    rng = random.Random(jump)
+    pairs = [(rng.choice(coordinates), rng.choice(coordinates))
+             for i in range(40)]
+    for (origin, destination), route in zip(pairs, routes.routes(pairs)):
+        expected = reference_cost(routes, neighbours, origin,
+                                  destination)
+        assert routes.route_cost(origin, destination) == expected
+        astar = routes.astar(origin, destination)
+        if expected is None:
+            assert route is None and astar is None
+            continue
+        for path in (route, astar):
+            assert path[0] == origin and path[-1] == destination
+            assert path_cost(routes, path) == expected
+            for a, b in zip(path, path[1:]):
+                assert 0 < hex_index.distance(a, b) <= jump
+            for stop in path[1:-1]:
+                assert routes.can_pass(routes.index.at(stop))
+
+def test_reverse_search_is_reused(sector):
+    routes = jump_routes.JumpRoutes.from_space(sector, 2)
+    coordinates = routes.index.coordinates
+    a, b = coordinates[0], coordinates[-1]
+    forward = routes.route(a, b)
+    searches = len(routes.searches)
+    backward = routes.route(b, a)
+    assert len(routes.searches) == searches
+    if forward is None:
+        assert backward is None
+    else:
+        assert backward == list(reversed(forward))
+
+def test_unknown_system(sector):
+    routes = jump_routes.JumpRoutes.from_space(sector, 2)
+    with pytest.raises(KeyError):
+        routes.route((0, 0), routes.index.coordinates[0])
@@ -0,0 +1,86 @@
+import pytest
+
+import space
+
+def test_lazy_leaves_match_eager_space(generated_space):
+    eager = generated_space("Domain", 21)
+    lazy = space.Domain("D", seed = 21)
+    lazy.make_lazy(capacity = 16)
+    assert lazy.generated == 0
+
+    leaves = lazy.leaves_in((10, 15), (20, 30))
+    assert sorted(leaf.name for leaf in leaves) == sorted(
+            leaf.name for leaf in eager.leaves()
+            if leaf.origin[0] < 30 and 10 < leaf.origin[0] + 8 and
+            leaf.origin[1] < 45 and 15 < leaf.origin[1] + 10)
+    by_name = {leaf.name: leaf for leaf in eager.leaves()}
+    assert len(leaves) == 12
+    for leaf in leaves:
+        assert leaf in lazy.held and len(leaf.table) > 0
+        assert leaf.render() == by_name[leaf.name].render()
+
+def test_lazy_view_larger_than_capacity(generated_space):
+    eager = generated_space("Domain", 21)
+    lazy = space.Domain("D", seed = 21)
+    lazy.make_lazy(capacity = 4)
+    with pytest.raises(ValueError):
+        lazy.leaves_in((10, 15), (20, 30))
+
+    lines = list(lazy.iter_sec_lines_in((10, 15), (20, 30)))
+    expected = []
+    for leaf in eager.leaves():
+        if (leaf.origin[0] < 30 and 10 < leaf.origin[0] + 8 and
+                leaf.origin[1] < 45 and 15 < leaf.origin[1] + 10):
+            expected.extend(leaf.iter_sec_lines())
+    assert sorted(lines) == sorted(expected)
+    assert len(lazy.held) == 4
+
+def test_lazy_capacity_drops_least_recently_used():
+    lazy = space.Sector("S", seed = 2)
+    lazy.make_lazy(capacity = 2)
+    first = lazy.get_leaf((1, 1))
+    text = first.render()
+    lazy.get_leaf((9, 1))
+    lazy.get_leaf((1, 1))
+    lazy.get_leaf((17, 1))
+    assert first in lazy.held and len(lazy.held) == 2
+    lazy.get_leaf((25, 1))
+    lazy.get_leaf((9, 11))
+    assert first not in lazy.held
+    assert first.table is not None and len(first.table) == 0
+    assert lazy.get_leaf((3, 4)).render() == text
+    assert lazy.generated == 6
+
+def test_lazy_get_system_matches_eager(generated_space):
+    eager = generated_space("Region", 8, bases = [2, 4])
+    lazy = space.Region("R", [2, 4], seed = 8)
+    lazy.make_lazy(capacity = 1)
+    for coordinates in [(1, 1), (5, 7), (17, 33), (40, 80), (64, 80)]:
+        expected = eager.get_system(coordinates)
+        found = lazy.get_system(coordinates)
+        assert (found is None) == (expected is None)
+        if found is not None:
+            assert str(found) == str(expected)
+    # Single hexes are generated without holding their leaves
+    assert lazy.generated == 0
+    lazy.get_leaf((40, 80))
+    for y in range(71, 81):
+        expected = eager.get_system((40, y))
+        assert str(lazy.get_system((40, y))) == str(expected)
+
+def test_lazy_needs_no_seed():
+    lazy = space.Quadrant("Q")
+    lazy.make_lazy()
+    assert lazy.seed is not None
+    text = lazy.get_leaf((1, 1)).render()
+    lazy.held.clear()
+    lazy.get_leaf((1, 1)).invalidate()
+    assert lazy.get_leaf((1, 1)).render() == text
+
+def test_leaf_at_and_outside():
+    d = space.Domain("D")
+    assert d.leaf_at((33, 41)).name == "D D A"
+    assert d.leaf_at((64, 80)).name == "D D P"
+    with pytest.raises(KeyError):
+        d.leaf_at((65, 1))
+    assert d.leaves_in((100, 100), (10, 10)) == []
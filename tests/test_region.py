@@ -0,0 +1,85 @@
+import pytest
+
+import space
+
+def test_region_renders_as_a_domain(generated_space):
+    region = generated_space("Region", 19, bases = [2, 4])
+    domain = generated_space("Domain", 19, name = "R")
+    assert [leaf.name for leaf in region.leaves()] == \
+            [leaf.name for leaf in domain.leaves()]
+    assert region.render() == domain.render()
+
+def test_nested_fields_broadcast_to_leaves():
+    alternating = ["Dense", "Sparse"] * 8
+    density = ["Dense", "Sparse", alternating, "Standard"]
+    maturity = [["Mature"] * 16, "Standard", "Backwater", "Standard"]
+    region = space.Region("R", [2, 4], density = density,
+                          maturity = maturity, tech_cap = 12)
+    leaves = region.leaves()
+    assert [leaf.density for leaf in leaves] == \
+            ["Dense"] * 16 + ["Sparse"] * 16 + alternating + \
+            ["Standard"] * 16
+    assert [leaf.maturity for leaf in leaves] == \
+            ["Mature"] * 16 + ["Standard"] * 16 + ["Backwater"] * 16 + \
+            ["Standard"] * 16
+    assert all(leaf.tech_cap == 12 for leaf in leaves)
+
+    domain = space.Domain("R", density = density, maturity = maturity)
+    assert [leaf.density for leaf in domain.leaves()] == \
+            [leaf.density for leaf in leaves]
+    assert [leaf.maturity for leaf in domain.leaves()] == \
+            [leaf.maturity for leaf in leaves]
+
+    per_leaf = [f"{i}" for i in range(64)]
+    assert space.Region("R", [2, 4], tech_cap = per_leaf).tech_cap == \
+            per_leaf
+
+@pytest.mark.parametrize("density", [
+        ["Dense"] * 3,
+        ["Dense", "Sparse", ["Dense"] * 15, "Standard"],
+        ["Dense"] * 63,
+        ])
+def test_wrong_field_counts_raise(density):
+    with pytest.raises(ValueError):
+        space.Region("R", [2, 4], density = density)
+
+def test_leaf_names():
+    names = [f"Leaf {i}" for i in range(16)]
+    region = space.Region("R", [4], leaf_names = names)
+    assert [leaf.name for leaf in region.leaves()] == names
+    for count in [15, 17]:
+        with pytest.raises(ValueError):
+            space.Region("R", [4], leaf_names = names[:1] * count)
+
+def test_leaf_at_agrees_with_a_scan():
+    region = space.Region("R", [3, 2], origin = (-5, 7))
+    leaves = region.leaves()
+    width, height = region.size
+
+    def scan(x, y):
+        found = [leaf for leaf in leaves
+                 if leaf.origin[0] < x <= leaf.origin[0] + leaf.size[0] and
+                 leaf.origin[1] < y <= leaf.origin[1] + leaf.size[1]]
+        assert len(found) == 1
+        return found[0]
+
+    xs = set()
+    ys = set()
+    for leaf in leaves:
+        xs.update([leaf.origin[0] + 1, leaf.origin[0] + leaf.size[0]])
+        ys.update([leaf.origin[1] + 1, leaf.origin[1] + leaf.size[1]])
+    for x in xs:
+        for y in ys:
+            assert region.leaf_at((x, y)) is scan(x, y)
+
+    for outside in [(-5, 8), (-4, 7), (-5 + width + 1, 8),
+                    (-4, 7 + height + 1)]:
+        with pytest.raises(KeyError):
+            region.leaf_at(outside)
+
+def test_unnamed_leaves_follow_each_space_name():
+    names = []
+    space.Domain("A", subspace_names = names)
+    assert names == []
+    assert space.Domain("A").leaves()[0].name == "A A A"
+    assert space.Domain("B").leaves()[0].name == "B A A"
@@ -0,0 +1,42 @@
+import io
+
+import pytest
+
+import sec_parser
+
+@pytest.fixture(scope = "module")
+def domain(generated_space):
+    return generated_space("Domain", 12)
+
+def test_parsed_sec_matches_space(domain):
+    hierarchy, tables = sec_parser.read_sec(io.StringIO(domain.render()))
+    assert hierarchy == domain.describe()
+    leaves = domain.leaves()
+    assert len(tables) == len(leaves)
+    for table, leaf in zip(tables, leaves):
+        assert list(table.iter_sec_lines()) == \
+                list(leaf.table.iter_sec_lines())
+
+def test_parser_reports_bad_lines():
+    text = "# Subsector 'S' at '0,0'\n" \
+           "S 1                 0101 A788899-C    Ht Ri                   803    \n" \
+           "S 2                 0102 A78_899-C    Ri                      803    \n"
+    with pytest.raises(ValueError):
+        sec_parser.read_sec(io.StringIO(text))
+    errors = []
+    hierarchy, tables = sec_parser.read_sec(io.StringIO(text), errors)
+    assert [number for number, message in errors] == [3]
+    assert len(tables[0]) == 1
+
+def test_file_without_headers(generated_space):
+    s = generated_space("Space", 3, name = "Plain", size = (4, 6),
+                        origin = (10, 20))
+    hierarchy, tables = sec_parser.read_sec(io.StringIO(s.render()))
+    assert hierarchy["header"] is None
+    assert list(tables[0].iter_sec_lines()) == list(s.table.iter_sec_lines())
+
+def test_systems_parse_back(generated_space):
+    s = generated_space("Subsector", 5)
+    parsed = list(sec_parser.iter_systems(io.StringIO(s.render())))
+    assert [str(system) for system in parsed] == \
+            [str(system) for system in s.systems]
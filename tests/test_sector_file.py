@@ -0,0 +1,62 @@
+import pytest
+
+import sector_file
+import uwp
+
+@pytest.fixture(scope = "module")
+def domain(generated_space):
+    """ .sec coordinates only have two digits, so keep to 1-99 """
+    return generated_space("Domain", 12)
+
+@pytest.fixture(scope = "module")
+def far_domain(generated_space):
+    return generated_space("Domain", 12, origin = (320, -400))
+
+def test_space_round_trip(domain, tmp_path):
+    path = tmp_path / "d.uwps"
+    sector_file.save_space(domain, path)
+    with sector_file.SectorFile(path) as f:
+        assert "".join(line + "\n" for line in f.iter_sec_lines()) == \
+                domain.render()
+        for s in domain.systems[::50]:
+            found = f.get_system(s.coordinates)
+            assert str(found) == str(s)
+
+def test_far_space_round_trip(far_domain, tmp_path):
+    path = tmp_path / "far.uwps"
+    sector_file.save_space(far_domain, path)
+    with sector_file.SectorFile(path) as f:
+        assert (f.origin_x, f.origin_y) == (320, -400)
+        for s in far_domain.systems[::40]:
+            assert str(f.get_system(s.coordinates).uwp) == str(s.uwp)
+        for leaf, expected in zip(f.hierarchy["subspaces"][0]["subspaces"],
+                                  far_domain.leaves()):
+            assert list(f.read_leaf_table(leaf).iter_sec_lines()) == \
+                    list(expected.table.iter_sec_lines())
+
+def test_empty_hexes(domain, tmp_path):
+    path = tmp_path / "d.uwps"
+    sector_file.save_space(domain, path)
+    occupied = {s.coordinates for s in domain.systems}
+    with sector_file.SectorFile(path) as f:
+        for leaf in domain.leaves()[:4]:
+            for coordinates in leaf.hexes():
+                assert (f.get_record(coordinates) is not None) == \
+                        (coordinates in occupied)
+        with pytest.raises(KeyError):
+            f.get_record((65, 1))
+
+def test_sec_round_trip(domain, tmp_path):
+    sec = tmp_path / "d.sec"
+    sec.write_text(domain.render())
+    binary = tmp_path / "d.uwps"
+    sector_file.sec_to_sector_file(sec, binary)
+    back = tmp_path / "back.sec"
+    sector_file.sector_file_to_sec(binary, back)
+    assert back.read_text() == domain.render()
+
+def test_packed_uwps_round_trip(domain):
+    strings = [str(s.uwp) for s in domain.systems]
+    assert uwp.from_matrix(uwp.to_matrix(strings)) == strings
+    for string in strings[::25]:
+        assert str(uwp.Uwp.from_packed(uwp.pack_string(string))) == string
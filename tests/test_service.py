@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import pytest
+
+import service
+
+def descriptor(seed = 3, name = "S"):
+    return {"Name": name, "Size": "Sector", "Origin": [0, 0],
+            "Density": "Standard", "Maturity": "Standard", "Tech cap": None,
+            "Subspace names": [], "Seed": seed}
+
+def body(seed = 3, name = "S"):
+    return json.dumps(descriptor(seed, name)).encode("utf-8")
+
+@pytest.fixture
+def generation_service():
+    s = service.GenerationService(workers = 2, cache_size = 2)
+    yield s
+    s.close()
+
+def respond(s, method, target, content = b""):
+    return asyncio.run(s.respond(method, target, content))
+
+def test_identical_requests_are_generated_once(generation_service):
+    async def requests():
+        return await asyncio.gather(*[
+                generation_service.respond("POST", "/space", body())
+                for i in range(5)])
+    responses = asyncio.run(requests())
+    assert all(response == responses[0] for response in responses)
+    status, content_type, content = responses[0]
+    assert status == 200 and content_type == service.formats["sec"]
+    assert content.startswith("# Sector 'S'")
+    assert generation_service.stats["generated"] == 1
+    assert generation_service.stats["coalesced"] == 4
+    assert not generation_service.pending
+
+def test_cache_hits_and_eviction(generation_service):
+    first = respond(generation_service, "POST", "/space", body(1))
+    assert respond(generation_service, "POST", "/space", body(1)) == first
+    assert generation_service.stats["hits"] == 1
+    assert generation_service.stats["generated"] == 1
+
+    respond(generation_service, "POST", "/space", body(2))
+    # Using seed 1 makes seed 2 the least recently used
+    respond(generation_service, "POST", "/space", body(1))
+    respond(generation_service, "POST", "/space", body(3))
+    assert len(generation_service.cache) == 2
+    assert generation_service.stats["hits"] == 2
+    assert generation_service.stats["generated"] == 3
+
+    respond(generation_service, "POST", "/space", body(1))
+    assert generation_service.stats["hits"] == 3
+    respond(generation_service, "POST", "/space", body(2))
+    assert generation_service.stats["generated"] == 4
+
+    status, content_type, content = respond(generation_service, "GET",
+                                            "/stats")
+    assert status == 200 and content_type == service.formats["json"]
+    stats = json.loads(content)
+    assert stats["cached"] == 2 and stats["pending"] == 0
+    assert stats["generated"] == 4
+
+def test_subsector_matches_its_part_of_the_space(generation_service):
+    _, _, whole = respond(generation_service, "POST", "/space", body())
+    lines = whole.splitlines()
+    start = lines.index("# Subsector 'S D' at '0,30'") + 1
+    end = start
+    while end < len(lines) and not lines[end].startswith("#"):
+        end += 1
+
+    status, _, leaf = respond(generation_service, "POST",
+                              "/subsector?index=3", body())
+    assert status == 200
+    assert [line for line in leaf.splitlines()
+            if not line.startswith("#")] == lines[start:end]
+
+    _, content_type, leaf_json = respond(
+            generation_service, "POST", "/subsector?index=3&format=json",
+            body())
+    assert content_type == service.formats["json"]
+    systems = json.loads(leaf_json)["systems"]
+    assert len(systems) == end - start
+    assert all(system["name"].startswith("S D ") for system in systems)
+
+@pytest.mark.parametrize("method, target, content, status", [
+        ("GET", "/nowhere", b"", 404),
+        ("GET", "/space", b"", 405),
+        ("POST", "/stats", b"", 405),
+        ("POST", "/space?format=xml", body(), 400),
+        ("POST", "/subsector", body(), 400),
+        ("POST", "/subsector?index=three", body(), 400),
+        ("POST", "/space", b"{not json", 400),
+        ("POST", "/space", b"[1, 2]", 400),
+        ("POST", "/space", b"{\"Size\": \"Sector\"}", 400),
+        ("POST", "/subsector?index=16", body(), 404),
+        ])
+def test_request_errors(generation_service, method, target, content,
+                        status):
+    with pytest.raises(service.RequestError) as error:
+        respond(generation_service, method, target, content)
+    assert error.value.status == status
+    assert generation_service.stats["generated"] == 0
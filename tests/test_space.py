@@ -0,0 +1,142 @@
+import io
+
+import pytest
+
+import space
+import trade_codes
+from uwp import Uwp
+
+def test_edits_to_systems_are_rendered(generated_space):
+    s = generated_space("Sector", 5)
+    leaf = s.leaves()[0]
+    before = leaf.render()
+    w = leaf.systems[0].uwp
+    w.tech_level = 1 if w.tech_level != 1 else 2
+    after = leaf.render()
+    assert after != before
+    assert str(w) in after
+    # Still there once packed back into a table
+    leaf.table
+    assert leaf.render() == after
+
+def test_rendered_text_not_kept_by_default(generated_space):
+    s = generated_space("Sector", 5)
+    s.render()
+    assert all(leaf._rendered is None for leaf in s.leaves())
+
+def test_kept_rendered_text_follows_table_changes(generated_space):
+    s = generated_space("Sector", 5)
+    s.keep_rendered = True
+    first = s.render()
+    assert all(leaf._rendered is not None for leaf in s.leaves())
+    assert s.render() == first
+
+    leaf = s.leaves()[2]
+    table = leaf.table
+    table.set_field(0, "tech_level", (table.tech_level[0] + 1) % 16)
+    assert s.render() != first
+    expected = "".join(line + "\n" for line in s.iter_sec_lines())
+    assert s.render() == expected
+
+def test_set_field_updates_trade_codes_and_lookups(generated_space):
+    s = generated_space("Sector", 5)
+    leaf = s.leaves()[0]
+    table = leaf.table
+    coordinates = (table.x[0], table.y[0])
+    assert str(leaf.get_system(coordinates)) == str(table.get_system(0))
+
+    table.set_field(0, "starport", "A")
+    table.set_field(0, "population", 9)
+    table.set_field(0, "tech_level", 15)
+    w = table.get_system(0).uwp
+    assert str(w).startswith("A") and str(w).endswith("-F")
+    assert trade_codes.mask_to_codes(table.trade_codes[0]) == \
+            tuple(Uwp(str(w)).trade_codes)
+    assert str(leaf.get_system(coordinates)) == str(table.get_system(0))
+
+    empty = next((x, y) for x in range(1, 9) for y in range(1, 11)
+                 if leaf.get_system((x, y)) is None)
+    table.set_field(0, "x", empty[0])
+    table.set_field(0, "y", empty[1])
+    assert leaf.get_system(coordinates) is None
+    assert str(leaf.get_system(empty)) == str(table.get_system(0))
+
+    with pytest.raises(KeyError):
+        table.set_field(0, "trade_codes", 0)
+
+def test_render_matches_write_sec_and_lines(generated_space):
+    s = generated_space("Sector", 5)
+    fp = io.StringIO()
+    s.write_sec(fp)
+    assert fp.getvalue() == s.render()
+    assert fp.getvalue() == "".join(line + "\n"
+                                    for line in s.iter_sec_lines())
+
+def test_generate_rerolls_every_leaf_of_an_unseeded_container(generated_space):
+    s = generated_space("Sector", name = "U")
+    first = [leaf.render() for leaf in s.leaves()]
+    s.generate()
+    second = [leaf.render() for leaf in s.leaves()]
+    # Sixteen unseeded subsectors coming out the same is all but impossible
+    assert sum(a != b for a, b in zip(first, second)) > 8
+
+def test_regenerate_dirty_only_touches_dirty_leaves(generated_space):
+    s = generated_space("Sector", name = "U")
+    before = [leaf.render() for leaf in s.leaves()]
+    assert s.dirty_leaves() == []
+    s.regenerate_dirty()
+    assert [leaf.render() for leaf in s.leaves()] == before
+
+    densities = ["Standard"] * 16
+    densities[5] = "Dense"
+    s.reconfigure(densities, "Standard", None)
+    assert s.dirty_leaves() == [s.leaves()[5]]
+    s.regenerate_dirty()
+    after = [leaf.render() for leaf in s.leaves()]
+    assert after[:5] == before[:5] and after[6:] == before[6:]
+    assert s.dirty_leaves() == []
+
+def test_seeded_regenerate_dirty_matches_fresh_space(generated_space):
+    s = generated_space("Sector", 11)
+    densities = ["Standard"] * 16
+    densities[3] = "Rift"
+    s.reconfigure(densities, "Standard", None)
+    s.regenerate_dirty()
+    fresh = generated_space("Sector", 11, density = densities)
+    assert s.render() == fresh.render()
+
+def test_regenerate_dirty_keeps_edits(generated_space):
+    s = generated_space("Sector", 5)
+    s.leaves()[0].systems[0].name = "Edited"
+    s.regenerate_dirty()
+    assert "Edited" in s.render()
+    s.generate()
+    assert "Edited" not in s.render()
+
+def test_generate_hex_matches_generate(generated_space):
+    s = generated_space("Subsector", 7, origin = (8, 20), density = "Dense")
+    expected = {system.coordinates: str(system) for system in s.systems}
+    for coordinates in s.hexes():
+        system = s.generate_hex(coordinates)
+        if system is None:
+            assert coordinates not in expected
+        else:
+            assert str(system) == expected[coordinates]
+
+def test_generate_hex_follows_density():
+    s = space.Subsector("S", seed = 7)
+    s.generate_hex((1, 1))
+    s.reconfigure("Rift", "Standard", None)
+    s.generate()
+    for system in s.systems:
+        assert str(s.generate_hex(system.coordinates)) == str(system)
+
+def test_container_systems_are_the_leaves_own(generated_space):
+    s = generated_space("Sector", 5)
+    table = s.table
+    systems = s.systems
+    assert [str(system) for system in systems] == \
+            [table.format_row(row) for row in range(len(table))]
+    systems[-1].name = "Edited"
+    assert "Edited" in s.render()
+    assert s.leaves()[-1].systems[-1].name == "Edited"
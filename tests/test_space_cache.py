@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+import space
+import space_cache
+
+def test_second_generation_loads_every_leaf(tmp_path):
+    cache = space_cache.SpaceCache(tmp_path)
+    first = space.Domain("D", seed = 14)
+    cache.generate(first)
+    assert (cache.hits, cache.misses) == (0, 64)
+    assert len(cache.entries()) == 64
+
+    second = space.Domain("D", seed = 14)
+    cache.generate(second)
+    assert (cache.hits, cache.misses) == (64, 64)
+    assert not second.dirty_leaves()
+    assert second.render() == first.render()
+
+def test_only_the_reconfigured_leaf_is_generated(tmp_path):
+    cache = space_cache.SpaceCache(tmp_path)
+    cache.generate(space.Domain("D", seed = 14))
+
+    domain = space.Domain("D", seed = 14)
+    leaf = domain.leaf_at((20, 25))
+    leaf.reconfigure("Dense", leaf.maturity, leaf.tech_cap)
+    cache.generate(domain)
+    assert (cache.hits, cache.misses) == (63, 65)
+    assert len(cache.entries()) == 65
+
+    alone = space.Subsector(leaf.name, origin = leaf.origin,
+                            density = "Dense", seed = leaf.seed)
+    alone.generate()
+    assert leaf.render_systems() == alone.render_systems()
+
+    # The same domain again only reconfigures and generates that leaf
+    leaf.reconfigure("Sparse", leaf.maturity, leaf.tech_cap)
+    assert domain.dirty_leaves() == [leaf]
+    cache.generate(domain)
+    assert (cache.hits, cache.misses) == (63, 66)
+
+@pytest.mark.parametrize("damage", [
+        lambda data: data[:len(data) // 2],
+        lambda data: data[:5],
+        lambda data: b"",
+        lambda data: data + b"\0",
+        lambda data: b"XXXX" + data[4:],
+        ])
+def test_damaged_files_are_misses(tmp_path, damage):
+    cache = space_cache.SpaceCache(tmp_path)
+    leaf = space.Subsector("S", seed = 3)
+    cache.generate(leaf)
+    text = leaf.render()
+    [(used, size, path)] = cache.entries()
+    with open(path, "rb") as fp:
+        data = fp.read()
+    with open(path, "wb") as fp:
+        fp.write(damage(data))
+
+    again = space.Subsector("S", seed = 3)
+    assert cache.load(again) is None
+    cache.generate(again)
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert again.render() == text
+    with open(path, "rb") as fp:
+        assert fp.read() == data
+
+def test_unseeded_leaves_are_not_stored(tmp_path):
+    cache = space_cache.SpaceCache(tmp_path)
+    sector = space.Sector("S")
+    cache.generate(sector)
+    assert cache.misses == 16
+    assert cache.entries() == []
+    assert all(len(leaf.table) > 0 for leaf in sector.leaves())
+    assert cache.load(sector.leaves()[0]) is None
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = space_cache.SpaceCache(tmp_path)
+    leaves = space.Sector("S", seed = 5).leaves()
+    for used, leaf in enumerate(leaves):
+        leaf.generate()
+        cache.store(leaf, leaf.table)
+        path = cache.path(cache.key(leaf))
+        os.utime(path, (1000 + used, 1000 + used))
+    # Loading touches the oldest file, making it the newest
+    assert cache.load(leaves[0]) is not None
+
+    sizes = [os.path.getsize(cache.path(cache.key(leaf)))
+             for leaf in leaves]
+    cache.max_bytes = sizes[0] + sum(sizes[-5:])
+    cache.evict()
+    kept = [leaf for leaf in leaves
+            if os.path.exists(cache.path(cache.key(leaf)))]
+    assert kept == [leaves[0]] + leaves[-5:]
+    assert cache.size() <= cache.max_bytes
+
+    cache.max_bytes = 0
+    cache.evict()
+    assert cache.entries() == []
+
+def test_table_bytes_round_trip(generated_space):
+    domain = generated_space("Domain", 8)
+    for leaf in domain.leaves()[:8]:
+        table = space_cache.table_from_bytes(
+                space_cache.table_to_bytes(leaf.table))
+        assert len(table) == len(leaf.table)
+        assert table.name_prefix == leaf.table.name_prefix
+        assert table.names == leaf.table.names
+        for row in range(len(table)):
+            assert str(table.get_system(row)) == \
+                    str(leaf.table.get_system(row))
+        assert space_cache.table_to_bytes(table) == \
+                space_cache.table_to_bytes(leaf.table)
@@ -0,0 +1,57 @@
+import pytest
+
+import hex_index
+import trade
+import uwp
+
+@pytest.fixture(scope = "module")
+def sector(generated_space):
+    return generated_space("Sector", 4)
+
+def brute_force_pairs(t):
+    """ Every pair of rows, checked one by one """
+    coordinates = t.index.coordinates
+    pairs = []
+    for a in range(len(coordinates)):
+        for b in range(a + 1, len(coordinates)):
+            d = hex_index.distance(coordinates[a], coordinates[b])
+            if t.max_distance is not None and d > t.max_distance:
+                continue
+            btn = t.btn(a, b)
+            if btn >= t.min_btn:
+                pairs.append((btn, d, a, b))
+    pairs.sort(key = lambda pair: (-pair[0], pair[1], pair[2], pair[3]))
+    return pairs
+
+@pytest.mark.parametrize("min_btn, max_distance", [
+        (10.0, 10), (9.0, 4), (11.5, None), (8.0, 2)])
+def test_pairs_match_brute_force(sector, min_btn, max_distance):
+    t = trade.TradeMap.from_space(sector, min_btn = min_btn,
+                                  max_distance = max_distance)
+    assert t.pairs() == brute_force_pairs(t)
+
+def test_routes_split_pairs(sector):
+    t = trade.TradeMap.from_space(sector, min_btn = 9.0)
+    routes = t.routes(major = 11.0, minor = 9.0)
+    assert all(pair[0] >= 11.0 for pair in routes["major"])
+    assert all(9.0 <= pair[0] < 11.0 for pair in routes["minor"])
+    assert len(routes["major"]) + len(routes["minor"]) == len(t.pairs())
+
+def test_table_wtns_match_single_worlds(sector):
+    table = sector.table
+    wtns = trade.world_trade_numbers(table)
+    for row in range(len(table)):
+        w = uwp.Uwp(table.get_uwp_string(row))
+        assert wtns[row] == trade.world_trade_number(w)
+
+def test_btn_is_capped_and_symmetric(sector):
+    t = trade.TradeMap.from_space(sector)
+    for a, b in [(0, 1), (3, 40), (10, 200), (5, 5 + len(t.table) // 2)]:
+        assert t.btn(a, b) == t.btn(b, a)
+        assert t.btn(a, b) <= min(t.wtn(a), t.wtn(b)) + 5
+
+def test_distance_modifier():
+    assert trade.distance_modifier(1) == 0
+    assert trade.distance_modifier(2) == -0.5
+    assert trade.distance_modifier(3) == -1
+    assert trade.distance_modifier(10) == -2
@@ -0,0 +1,88 @@
+import itertools
+import random
+
+import ehex
+import trade_codes
+import uwp
+
+""" The trade code checks as they were before they became per-field
+tables, kept here as the reference the tables must agree with """
+
+def _at_least(value, minimum):
+    return ehex.greater_than_or_equal_to(value, minimum)
+
+def _digits(text):
+    return list(text)
+
+reference_checks = [
+    ("Ag", lambda u: u[2] in _digits("456789") and
+     u[3] in _digits("45678") and u[4] in _digits("567")),
+    ("As", lambda u: u[1] == "0" and u[2] == "0" and u[3] == "0"),
+    ("Ba", lambda u: u[4] == "0" and u[5] == "0" and u[6] == "0"),
+    ("De", lambda u: u[2] not in _digits("01") and u[3] == "0"),
+    ("Fl", lambda u: u[2] not in _digits("0123456789") and u[3] != "0"),
+    ("Ga", lambda u: u[1] in _digits("678") and u[2] in _digits("568") and
+     u[3] in _digits("567")),
+    ("Hi", lambda u: _at_least(u[4], "9")),
+    ("Ht", lambda u: _at_least(u[8], "C")),
+    ("Ic", lambda u: u[2] in _digits("01") and u[3] != "0"),
+    ("In", lambda u: _at_least(u[4], "9") and u[2] in _digits("012479")),
+    ("Lo", lambda u: u[4] in _digits("0123")),
+    ("Lt", lambda u: u[8] in _digits("0123")),
+    ("Na", lambda u: u[2] in _digits("0123") and u[3] in _digits("0123")
+     and _at_least(u[4], "6")),
+    ("Ni", lambda u: u[4] in _digits("0123456")),
+    ("Po", lambda u: u[2] in _digits("2345") and u[3] in _digits("0123")),
+    ("Ri", lambda u: u[2] in _digits("68") and u[4] in _digits("678") and
+     u[5] in _digits("456789")),
+    ("Va", lambda u: u[2] == "0"),
+    ("Wa", lambda u: u[3] == "A")
+    ]
+
+def reference_codes(uwp_string):
+    return [code for code, check in reference_checks if check(uwp_string)]
+
+def uwp_string(size, atmosphere, hydrosphere, population, government,
+               law_level, tech_level, starport = "A"):
+    return starport + "".join(ehex.int_to_hex(value) for value in
+                              (size, atmosphere, hydrosphere, population,
+                               government, law_level)) + "-" + \
+            ehex.int_to_hex(tech_level)
+
+def sample_fields():
+    """ Every size, atmosphere, hydrosphere and population up to F, with
+    the other fields cycling through their edge values, then random
+    worlds over the whole ehex range """
+    governments = [0, 3, 4, 9, 10, 15]
+    law_levels = [0, 1, 9]
+    tech_levels = [0, 3, 4, 11, 12, 20]
+    for i, (size, atmosphere, hydrosphere, population) in enumerate(
+            itertools.product(range(16), repeat = 4)):
+        yield (size, atmosphere, hydrosphere, population,
+               governments[i % 6], law_levels[i % 7 % 3],
+               tech_levels[i % 11 % 6])
+    rng = random.Random(1)
+    top = len(ehex.hex_table) - 1
+    for i in range(5000):
+        yield tuple(rng.randint(0, top) for field in range(7))
+
+def test_codes_match_reference_checks():
+    strings = []
+    for fields in sample_fields():
+        string = uwp_string(*fields)
+        expected = reference_codes(string)
+        assert trade_codes.get_trade_codes(string) == expected, string
+        assert list(trade_codes.mask_to_codes(
+                trade_codes.get_trade_code_mask_from_fields(*fields))) == \
+                expected, string
+        strings.append(string)
+
+    masks = trade_codes.get_trade_code_masks(uwp.to_matrix(strings))
+    assert [list(trade_codes.mask_to_codes(mask)) for mask in masks] == \
+            [reference_codes(string) for string in strings]
+
+def test_mask_conversions():
+    for codes in ([], ["Ag"], ["Hi", "In", "Ht"], trade_codes.codes):
+        mask = trade_codes.codes_to_mask(codes)
+        assert sorted(trade_codes.mask_to_codes(mask)) == sorted(codes)
+        assert trade_codes.mask_to_str(mask) == " ".join(sorted(codes))
@@ -0,0 +1,53 @@
+import uwp
+from uwp import Uwp
+
+def test_string_round_trip():
+    for string in ["A788899-C", "X000000-0", "E9A5A7B-F"]:
+        assert str(Uwp(string)) == string
+
+def test_from_fields_matches_parsed():
+    w = Uwp("B564753-8")
+    assert Uwp.from_fields("B", 5, 6, 4, 7, 5, 3, 8) == w
+    assert str(Uwp.from_fields("B", 5, 6, 4, 7, 5, 3, 8)) == "B564753-8"
+
+def test_invalid_string():
+    for string in ["A788899C", "Q788899-C", "A78889-9C", "A788899_C"]:
+        assert not uwp.check_is_uwp_string_valid(string)
+
+def test_editing_a_field_updates_string_and_trade_codes():
+    w = Uwp("A788899-C")
+    assert str(w) == "A788899-C"
+    assert w.trade_codes == ["Ht", "Ri"]
+    w.tech_level = 3
+    w.population = 2
+    assert str(w) == "A788299-3"
+    assert w.trade_codes == Uwp("A788299-3").trade_codes
+    assert "Ht" not in w.trade_codes
+    assert w == Uwp("A788299-3")
+    assert hash(w) == hash(Uwp("A788299-3"))
+
+def test_editing_before_first_use():
+    w = Uwp.from_fields("C", 4, 1, 0, 6, 7, 4, 13)
+    w.starport = "A"
+    assert str(w) == "A410674-D"
+    assert w.trade_codes == Uwp("A410674-D").trade_codes
+
+def test_packed_round_trip():
+    w = Uwp("A788899-C")
+    assert Uwp.from_packed(w.packed) == w
+    assert str(Uwp.from_packed(w.packed)) == "A788899-C"
+
+def test_find_invalid_matches_string_errors():
+    strings = ["A788899-C", "A788899C", "Q788899-C", "A78_899-C",
+               "A788899-CC", "", "X000000-0", "A788899_C", "B564753-8",
+               "E9A5A7B-F", "a788899-c", "A78889-9C", "A7888é9-C",
+               "A788899-Z", "C410674-D", "A788 99-C", "-788899-A",
+               "A788899-z", "A78~899-C", "A788899-\0", "A78I899-C"]
+    strings += strings[::-1] * 3
+    expected = [i for i, string in enumerate(strings)
+                if uwp.get_uwp_string_error(string) is not None]
+    assert uwp.find_invalid(strings) == expected
+    assert uwp.find_invalid(iter(strings)) == expected
+    assert uwp.find_invalid(["A788899-C"] * 10) == []
+    assert uwp.find_invalid([]) == []
+    assert uwp.find_invalid(["A788899-C", "short"]) == [1]
@@ -0,0 +1,63 @@
+import world_index
+from system_table import NAVAL
+
+def brute_force(d, predicate):
+    """ Coordinates of every system of d, in hex order, matching
+    predicate(table, row) """
+    found = []
+    for leaf in d.leaves():
+        table = leaf.table
+        for row in range(len(table)):
+            if predicate(table, row):
+                found.append((table.x[row], table.y[row]))
+    return sorted(found)
+
+def test_queries_match_brute_force(generated_space):
+    d = generated_space("Domain", 6)
+    index = world_index.WorldIndex.from_space(d)
+    assert world_index.count(index.occupied) == len(d.table)
+
+    hi = 1 << world_index.trade_codes.codes.index("Hi")
+    found = index.query(codes = ["Hi"], starport = "AB", naval = True)
+    assert index.get_coordinates(found) == brute_force(
+            d, lambda t, r: t.trade_codes[r] & hi and
+            t.starport[r] in (10, 11) and t.bases[r] & NAVAL)
+
+    found = index.query(population = range(9, 16),
+                        without_codes = ["In"], gas_giants = [0])
+    in_ = 1 << world_index.trade_codes.codes.index("In")
+    assert index.get_coordinates(found) == brute_force(
+            d, lambda t, r: t.population[r] >= 9 and
+            not t.trade_codes[r] & in_ and t.pbg[r] % 10 == 0)
+
+    region = index.rectangle((10, 20), (15, 15))
+    found = index.query(region = region, tech_level = range(10, 34))
+    assert index.get_coordinates(found) == brute_force(
+            d, lambda t, r: 10 < t.x[r] <= 25 and 20 < t.y[r] <= 35 and
+            t.tech_level[r] >= 10)
+
+def test_systems_come_back_from_rows(generated_space):
+    d = generated_space("Domain", 6)
+    index = world_index.WorldIndex.from_space(d)
+    found = index.query(starport = "A")
+    systems = index.get_systems(found)
+    assert systems and all(s.uwp.starport == "A" for s in systems)
+    assert [s.coordinates for s in systems] == index.get_coordinates(found)
+
+def test_update_matches_fresh_index(generated_space):
+    d = generated_space("Domain", 6)
+    index = world_index.WorldIndex.from_space(d)
+    densities = [["Standard"] * 16 for sector in range(4)]
+    densities[2][7] = "Dense"
+    d.reconfigure(densities, "Standard", None)
+    changed = d.dirty_leaves()
+    assert len(changed) == 1
+    d.regenerate_dirty()
+    index.update(changed[0])
+
+    fresh = world_index.WorldIndex.from_space(d)
+    assert index.occupied == fresh.occupied
+    assert index.naval == fresh.naval and index.scout == fresh.scout
+    assert index.codes == fresh.codes
+    assert index.values == fresh.values
+    assert sorted(index.locations) == sorted(fresh.locations)
@@ -0,0 +1,60 @@
+import io
+
+import space
+import world_stats
+
+def systems_of(s):
+    return [leaf.table.get_system(row) for leaf in s.leaves()
+            for row in range(len(leaf.table))]
+
+def sec_file(s):
+    return io.StringIO("".join(line + "\n" for line in s.iter_sec_lines()))
+
+def test_ways_of_adding_agree(generated_space):
+    sector = generated_space("Sector", 30)
+
+    by_table = world_stats.WorldStats()
+    for leaf in sector.leaves():
+        by_table.add_table(leaf.table)
+    by_system = world_stats.WorldStats()
+    for s in systems_of(sector):
+        by_system.add_system(s)
+    by_sec = world_stats.WorldStats()
+    errors = []
+    by_sec.add_sec(sec_file(sector), errors)
+    assert errors == []
+
+    assert by_table.worlds == len(systems_of(sector)) > 0
+    assert by_table.systems() == by_table.worlds
+    assert by_system.to_dict() == by_table.to_dict()
+    assert by_sec.to_dict() == by_table.to_dict()
+
+def test_merge_equals_adding_both(generated_space):
+    a_space = generated_space("Sector", 31, name = "A")
+    b_space = generated_space("Sector", 32, name = "B", density = "Dense")
+
+    a = world_stats.WorldStats()
+    a.add_sec(sec_file(a_space))
+    a.add_uwp("A788899-C")
+    b = world_stats.WorldStats()
+    for leaf in b_space.leaves():
+        b.add_table(leaf.table)
+    both = world_stats.WorldStats()
+    both.add_sec(sec_file(a_space))
+    both.add_uwp("A788899-C")
+    for leaf in b_space.leaves():
+        both.add_table(leaf.table)
+
+    assert a.merge(b).to_dict() == both.to_dict()
+    assert a.worlds == both.worlds
+    assert a.systems() == both.systems() == a.worlds - 1
+
+def test_generate_counts_every_world():
+    stats = world_stats.generate(5000, workers = 2, chunk_size = 1200)
+    assert stats.worlds == 5000
+    assert stats.systems() == 5000
+    for field in world_stats.fields:
+        assert sum(stats.values[field]) == 5000
+    for field in world_stats.pbg_fields:
+        assert sum(stats.pbg[field]) == 5000
+    assert world_stats.generate(1000, chunk_size = 300).worlds == 1000